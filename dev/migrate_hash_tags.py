@@ -0,0 +1,72 @@
+"""
+Переименование ключей пользователей в формат с хэш-тегом: user_state:42 -> user_state:{42}.
+
+    python dev/migrate_hash_tags.py --dry-run
+    python dev/migrate_hash_tags.py
+
+Нужен один раз при обновлении бота до ключей с {user_id}, при остановленном боте и до перехода
+на Redis Cluster: RENAMENX между слотами кластер не выполнит. TTL ключей сохраняется.
+Если ключ с новым именем уже есть (его создал обновлённый бот), старый ключ остаётся на месте.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.redis_client import REDIS_MODE, redis_client  # noqa: E402
+from src.services.state_layout import USER_HASH_KEY  # noqa: E402
+from src.services.state_manager import (  # noqa: E402
+    ADMIN_REPLYING_KEY, BLOCKED_USER_KEY, FEEDBACK_LOCK_KEY, FEEDBACK_TYPE_KEY, NAV_STACK_KEY, USER_STATE_KEY
+)
+
+TEMPLATES = [
+    USER_STATE_KEY, FEEDBACK_TYPE_KEY, FEEDBACK_LOCK_KEY, BLOCKED_USER_KEY, ADMIN_REPLYING_KEY, NAV_STACK_KEY,
+    USER_HASH_KEY,
+]
+
+
+async def rename_chunk(pairs: list, args, totals: dict) -> None:
+    if args.dry_run:
+        totals["renamed"] += len(pairs)
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for old, new in pairs:
+            pipe.renamenx(old, new)
+        for (old, new), renamed in zip(pairs, await pipe.execute(raise_on_error=False)):
+            if renamed is True or renamed == 1:
+                totals["renamed"] += 1
+            else:
+                totals["kept"] += 1
+                print(f"kept {old}: {new} already exists" if renamed == 0 else f"kept {old}: {renamed}")
+
+
+async def main(args) -> None:
+    if REDIS_MODE == "cluster":
+        print("run this before switching to REDIS_MODE=cluster: RENAMENX cannot move keys between slots")
+        return
+
+    totals = {"renamed": 0, "kept": 0}
+    for template in TEMPLATES:
+        prefix = template.split("{")[0]
+        pairs = []
+        async for key in redis_client.scan_iter(match=f"{prefix}*", count=1000):
+            user_id = key[len(prefix):]
+            if not user_id.lstrip("-").isdigit():
+                continue  # уже с хэш-тегом или чужой ключ
+            pairs.append((key, f"{prefix}{{{user_id}}}"))
+        for start in range(0, len(pairs), args.batch):
+            await rename_chunk(pairs[start:start + args.batch], args, totals)
+        print(f"{prefix}*: {len(pairs)} keys without a hash tag")
+
+    action = "would rename" if args.dry_run else "renamed"
+    print(f"{action} {totals['renamed']} keys, kept {totals['kept']} because the new name already exists")
+    await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rename per-user Redis keys to the {user_id} hash-tag format")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не переименовывать")
+    parser.add_argument("--batch", type=int, default=500, help="ключей на один pipeline")
+    asyncio.run(main(parser.parse_args()))
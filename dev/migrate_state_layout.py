@@ -0,0 +1,141 @@
+"""
+Перенос данных пользователей из отдельных ключей в сводный хэш user:{id} (STATE_LAYOUT=hash).
+
+    python dev/migrate_state_layout.py --dry-run
+    python dev/migrate_state_layout.py --delete-old
+
+Запускать при остановленном боте (после dev/migrate_hash_tags.py), затем включить STATE_LAYOUT=hash.
+Ключи находятся через SCAN, оставшийся TTL каждого ключа переносится в TTL поля
+(HEXPIRE или эмуляция — как определит UserHashLayout). Пользователи, у которых сводный хэш уже есть, пропускаются (--force — перезаписать).
+Блокировки (blocked:{id}) и цели ответа админов (admin_replying:{id}) не переносятся:
+они и при STATE_LAYOUT=hash остаются отдельными ключами.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.redis_client import redis_client  # noqa: E402
+from src.services.redis_scripts import load_scripts  # noqa: E402
+from src.services.state_layout import (  # noqa: E402
+    FEEDBACK_LOCK_FIELD, FEEDBACK_TYPE_FIELD, NAV_FIELD, USER_HASH_KEY, UserHashLayout
+)
+from src.services.state_manager import (  # noqa: E402
+    FEEDBACK_LOCK_KEY, FEEDBACK_TYPE_KEY, NAV_STACK_KEY, USER_STATE_KEY
+)
+from src.utils import config  # noqa: E402
+
+# Отдельные ключи со строковым значением и поле сводного хэша, куда оно переезжает.
+# blocked:{id} и admin_replying:{id} остаются ключами и в сводной раскладке
+SLOTS = [
+    (FEEDBACK_TYPE_KEY, FEEDBACK_TYPE_FIELD),
+    (FEEDBACK_LOCK_KEY, FEEDBACK_LOCK_FIELD),
+]
+OLD_KEYS = [USER_STATE_KEY, NAV_STACK_KEY] + [key for key, _ in SLOTS]
+
+
+def old_key(template: str, user_id: int) -> str:
+    return template.format(user_id=user_id)
+
+
+async def find_users() -> set:
+    users = set()
+    for template in OLD_KEYS:
+        prefix = template.split("{")[0]
+        async for key in redis_client.scan_iter(match=f"{prefix}*", count=1000):
+            # Ключи без хэш-тега (user_state:42) сначала переименовывает dev/migrate_hash_tags.py
+            user_id = key[len(prefix):]
+            if user_id.startswith("{") and user_id.endswith("}") and user_id[1:-1].lstrip("-").isdigit():
+                users.add(int(user_id[1:-1]))
+    return users
+
+
+def parse_nav(raw) -> list:
+    """Список JSON-записей (или стек старого формата, при котором LRANGE вернёт ошибку) -> записи"""
+    if not isinstance(raw, list):
+        return []
+    entries = []
+    for item in raw:
+        try:
+            entries.append(json.loads(item))
+        except json.JSONDecodeError:
+            continue
+    return entries
+
+
+async def migrate_chunk(layout: UserHashLayout, users: list, args, totals: dict) -> None:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_id in users:
+            pipe.exists(USER_HASH_KEY.format(user_id=user_id))
+            pipe.hgetall(old_key(USER_STATE_KEY, user_id))
+            for template, _ in SLOTS:
+                pipe.get(old_key(template, user_id))
+                pipe.ttl(old_key(template, user_id))
+            pipe.lrange(old_key(NAV_STACK_KEY, user_id), 0, -1)
+            pipe.ttl(old_key(NAV_STACK_KEY, user_id))
+        results = iter(await pipe.execute(raise_on_error=False))
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_id in users:
+            exists, state = next(results), next(results)
+            slots = [(field, next(results), next(results)) for _, field in SLOTS]
+            nav, nav_ttl = parse_nav(next(results)), next(results)
+
+            if exists and not args.force:
+                # Хэш уже есть (перенесён раньше или его создал бот) — старые ключи не трогаем
+                totals["skipped"] += 1
+                continue
+            state = state if isinstance(state, dict) else {}
+            slots = [(field, value, ttl) for field, value, ttl in slots if value is not None]
+            totals["users"] += 1
+            totals["state_fields"] += len(state)
+            totals["slots"] += len(slots)
+            if args.dry_run:
+                continue
+
+            key = USER_HASH_KEY.format(user_id=user_id)
+            if state:
+                pipe.hset(key, mapping=state)
+            for field, value, ttl in slots:
+                layout.set_field(pipe, key, field, value, ttl if ttl > 0 else None)
+            if nav:
+                layout.set_field(pipe, key, NAV_FIELD, json.dumps(nav), nav_ttl if nav_ttl > 0 else config.NAV_STACK_TTL)
+            pipe.expire(key, config.USER_STATE_TTL)
+            if args.delete_old:
+                pipe.delete(*(old_key(template, user_id) for template in OLD_KEYS))
+        if not args.dry_run:
+            await pipe.execute()
+
+
+async def main(args) -> None:
+    layout = UserHashLayout(config.STATE_FIELD_TTL)
+    await layout.detect()
+    await load_scripts()  # эмулированный TTL полей пишет скрипт hash_set
+
+    users = sorted(await find_users())
+    print(f"users with old keys: {len(users)}, field TTL: {'HEXPIRE' if layout.native else 'emulated'}")
+
+    totals = {"users": 0, "skipped": 0, "state_fields": 0, "slots": 0}
+    for start in range(0, len(users), args.batch):
+        await migrate_chunk(layout, users[start:start + args.batch], args, totals)
+
+    action = "would migrate" if args.dry_run else "migrated"
+    print(
+        f"{action} {totals['users']} users ({totals['state_fields']} state fields, {totals['slots']} flags), "
+        f"skipped {totals['skipped']} with an existing user hash (--force merges them)"
+    )
+    if not args.delete_old and not args.dry_run:
+        print("old keys were kept; rerun with --delete-old to remove them")
+    await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move per-user Redis keys into one user:{id} hash")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не писать")
+    parser.add_argument("--delete-old", action="store_true", help="удалить старые ключи после переноса")
+    parser.add_argument("--force", action="store_true", help="перезаписать уже существующие хэши user:{id}")
+    parser.add_argument("--batch", type=int, default=200, help="пользователей на один pipeline")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,206 @@
+"""
+Бенчмарк фильтра мата: сборка словаря, задержка проверки сообщений и память.
+
+    python dev/profanity_benchmark.py
+    python dev/profanity_benchmark.py --sizes 1000 5000 --length 2000 --max-p99-us near-miss=30000 leet=60000
+
+Для каждого размера словаря (случайные слова + badwords.txt) замеряет время сборки, загрузки
+собранного фильтра из кэша (cache_dir) и память (tracemalloc), затем для каждого вида сообщений — задержку первой проверки на пустом автомате
+и p50/p95/p99 по --messages сообщениям длиной около --length символов. Виды сообщений:
+обычный текст, текст со словом из словаря в обфускации, длинные цепочки разделителей,
+почти-совпадения (начала слов через разделители) и ReDoS-подобные строки, неоднозначные
+символы (3, 4, b, h, @ ...). Где ответ фильтра известен заранее, он тоже проверяется:
+слово из словаря в обфускации находится, а разделители, почти-совпадения и ReDoS-строки
+собраны из начал слов, которые фильтр не считает словом (clean_prefixes), и чисты.
+
+Если что-то превышает пороги --max-*, печатает FAIL и завершается с кодом 1 — так бенчмарк
+можно запускать в CI как проверку на регрессии. Порог p99 свой у каждого вида сообщений
+(P99_LIMITS_US, переопределяется через --max-p99-us вид=мкс): около трёх худших p99 из замеров
+на одном ядре с --seed 1–4 — почти-совпадения на 5000 словах дают до 3 мс, leet до 5.5 мс,
+остальные виды меньше 1 мс. Для другой длины сообщений или своей машины их стоит подобрать заново.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует переменные окружения бота — для бенчмарка подойдут заглушки
+for name, value in {
+    "BOT_TOKEN": "0:benchmark", "GROUP_CHAT_ID": "0", "SUPPORT_THREAD_ID": "0",
+    "SERVICE_ACCOUNT": "-", "SPREADSHEET_ID": "-",
+}.items():
+    os.environ.setdefault(name, value)
+
+from src.utils.filter_profanity import ProfanityFilter  # noqa: E402
+
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщыьэюя"
+# Только настоящие разделители: "|" изображает букву "и" и есть в LEET
+SEPARATORS = " ._-*/~"
+LEET = "3b4h0@|!$%'iecpxy"
+# Порог p99 по видам сообщений, мкс (см. описание модуля)
+P99_LIMITS_US = {
+    "clean": 1000, "hit": 2500, "separators": 2000, "near-miss": 10000, "redos": 2500, "leet": 15000,
+}
+CLEAN_WORDS = ["сегодня", "хорошая", "погода", "привет", "как", "дела", "спасибо", "за", "ответ", "вопрос"]
+
+
+def dictionary(size: int, rng: random.Random) -> list:
+    words = ProfanityFilter._load_default_badwords()
+    while len(words) < size:
+        words.append("".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 9))))
+    return words
+
+
+def fill(length: int, piece) -> str:
+    """Склеить куски до нужной длины, не разрезая последний"""
+    parts, total = [], 0
+    while total < length:
+        parts.append(piece())
+        total += len(parts[-1]) + 1
+    return " ".join(parts)
+
+
+def obfuscate(word: str, rng: random.Random) -> str:
+    chars = [rng.choice(ProfanityFilter.CHAR_MAP.get(c, c)) for c in word]
+    return "".join(c + rng.choice(["", "", ".", "_", "*"]) for c in chars).rstrip("._*")
+
+
+def clean_prefixes(profanity_filter: ProfanityFilter, words: list, joiner: str, ending: str = "") -> list:
+    """
+    Начала слов, которые фильтр не считает словом даже с разделителями joiner между буквами:
+    от каждого слова берётся самое длинное (до 3 букв) такое начало. Цепочки разделителей
+    любой длины автомат проходит так же, как одну, поэтому ответ на короткой строке
+    совпадает с ответом на длинной.
+    """
+    prefixes = []
+    for word in words:
+        for size in (3, 2, 1):
+            if not profanity_filter.contains_profanity(joiner.join(word[:size]) + ending):
+                prefixes.append(word[:size])
+                break
+    return prefixes
+
+
+def shapes(profanity_filter: ProfanityFilter, words: list, length: int, rng: random.Random) -> dict:
+    """Вид сообщения -> (генератор сообщения, ожидаемый ответ фильтра или None)"""
+    vowel_words = [w for w in words if w[-1] in ProfanityFilter.VOWELS] or words
+    run = "._-*" * (length // 16)
+    redos_prefixes = clean_prefixes(profanity_filter, vowel_words, "._-*", "._-*ъ")
+    near_prefixes = clean_prefixes(profanity_filter, words, ".")
+
+    def redos():
+        # Начало слова с длинными цепочками разделителей между буквами и буквой, которая его обрывает
+        return run.join(rng.choice(redos_prefixes)) + run + "ъ"
+
+    def near_miss():
+        # Пробел тоже разделитель, и соседние начала сложились бы в слово. Цифра 2 не изображает
+        # ни одной буквы и обрывает совпадение, так что ответ — как у каждого начала по отдельности
+        return fill(length, lambda: ".".join(rng.choice(near_prefixes)) + " 2")
+
+    return {
+        "clean": (lambda: fill(length, lambda: rng.choice(CLEAN_WORDS)), None),
+        "hit": (lambda: fill(length - 20, lambda: rng.choice(CLEAN_WORDS)) + " " + obfuscate(rng.choice(words), rng),
+                True),
+        "separators": (lambda: rng.choice(words)[0] + "".join(rng.choice(SEPARATORS) for _ in range(length)), False),
+        "near-miss": (near_miss, False),
+        "redos": (redos, False),
+        "leet": (lambda: "".join(rng.choice(LEET + SEPARATORS) for _ in range(length)), None),
+    }
+
+
+def build(words: list) -> tuple:
+    gc.collect()
+    started = time.perf_counter()
+    profanity_filter = ProfanityFilter(badwords=words)
+    seconds = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    retained = ProfanityFilter(badwords=words)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del retained
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        ProfanityFilter(badwords=words, cache_dir=cache_dir)
+        started = time.perf_counter()
+        ProfanityFilter(badwords=words, cache_dir=cache_dir)
+        cached = time.perf_counter() - started
+    return profanity_filter, seconds, cached, memory
+
+
+def percentile(values: list, share: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def p99_limit(value: str) -> tuple:
+    shape, _, limit = value.partition("=")
+    if shape not in P99_LIMITS_US:
+        raise argparse.ArgumentTypeError(f"unknown shape {shape!r}, expected one of {', '.join(P99_LIMITS_US)}")
+    return shape, float(limit)
+
+
+def main(args) -> int:
+    rng = random.Random(args.seed)
+    failures = []
+    max_p99_us = {**P99_LIMITS_US, **args.max_p99_us}
+    print(f"messages={args.messages} length~{args.length}")
+    print(f"{'words':>6} {'compile,ms':>10} {'cached,ms':>9} {'memory,MB':>9}  {'shape':>10} {'first,us':>9} "
+          f"{'p50,us':>8} {'p95,us':>8} {'p99,us':>8} {'states':>6}")
+
+    for size in args.sizes:
+        words = dictionary(size, rng)
+        profanity_filter, seconds, cached, memory = build(words)
+        compile_ms, memory_mb = seconds * 1000, memory / 2 ** 20
+        if compile_ms > args.max_compile_ms * size / 1000:
+            failures.append(f"{size} words: compile {compile_ms:.0f} ms > {args.max_compile_ms * size / 1000:.0f} ms")
+        if memory_mb > args.max_memory_mb * size / 1000:
+            failures.append(f"{size} words: memory {memory_mb:.1f} MB > {args.max_memory_mb * size / 1000:.1f} MB")
+
+        for shape, (generate, expected) in shapes(profanity_filter, words, args.length, rng).items():
+            messages = [generate() for _ in range(args.messages)]
+            profanity_filter._reset_automaton()
+            latencies = []
+            for text in messages:
+                started = time.perf_counter()
+                found = profanity_filter.contains_profanity(text)
+                latencies.append(time.perf_counter() - started)
+                if expected is not None and found != expected:
+                    failures.append(f"{size} words, {shape}: expected {expected} for {text[:60]!r}")
+                    expected = None  # одной ошибки на вид сообщений достаточно
+            first = latencies[0] * 1e6
+            latencies = sorted(latencies)
+            p50, p95, p99 = (percentile(latencies, share) * 1e6 for share in (0.5, 0.95, 0.99))
+            print(f"{size:>6} {compile_ms:>10.0f} {cached * 1000:>9.1f} {memory_mb:>9.1f}  {shape:>10} {first:>9.0f} "
+                  f"{p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {len(profanity_filter._states):>6}")
+
+            if first > args.max_first_us:
+                failures.append(f"{size} words, {shape}: first check {first:.0f} us > {args.max_first_us} us")
+            if p99 > max_p99_us[shape]:
+                failures.append(f"{size} words, {shape}: p99 {p99:.0f} us > {max_p99_us[shape]:.0f} us")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ProfanityFilter and fail on performance regressions")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 5000], help="размеры словаря")
+    parser.add_argument("--messages", type=int, default=300, help="сообщений каждого вида")
+    parser.add_argument("--length", type=int, default=500, help="примерная длина сообщения")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-compile-ms", type=float, default=500, help="порог сборки на 1000 слов")
+    parser.add_argument("--max-memory-mb", type=float, default=2, help="порог памяти на 1000 слов")
+    parser.add_argument("--max-first-us", type=float, default=20000, help="порог первой проверки на пустом автомате")
+    parser.add_argument("--max-p99-us", nargs="+", type=p99_limit, default=[], metavar="SHAPE=US",
+                        help="порог p99 задержки проверки для вида сообщений, например near-miss=20000")
+    args = parser.parse_args()
+    args.max_p99_us = dict(args.max_p99_us)
+    sys.exit(main(args))
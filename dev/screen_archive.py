@@ -0,0 +1,71 @@
+"""
+Проверка выгрузки таблицы обращений на слова из словаря (например, после его обновления).
+
+    python dev/screen_archive.py export.csv
+    python dev/screen_archive.py export.csv --words badwords.txt --workers 4 --output flagged.csv
+
+export.csv — лист, скачанный из Google Sheets как CSV (первая строка — заголовок SHEET_HEADER).
+Тексты из колонки --column проверяются ProfanityFilter.screen_many пачками в пуле процессов.
+Скрипт печатает найденные строки с найденными фрагментами и итог, а с --output сохраняет
+эти строки в CSV с дополнительной колонкой «Найдено».
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует переменные окружения бота — для скрипта подойдут заглушки
+for name, value in {
+    "BOT_TOKEN": "0:screen", "GROUP_CHAT_ID": "0", "SUPPORT_THREAD_ID": "0",
+    "SERVICE_ACCOUNT": "-", "SPREADSHEET_ID": "-",
+}.items():
+    os.environ.setdefault(name, value)
+
+from src.utils.filter_profanity import ProfanityFilter  # noqa: E402
+
+
+def main(args) -> None:
+    with open(args.words, encoding="utf-8") as f:
+        profanity_filter = ProfanityFilter([line.strip() for line in f if line.strip()], cache_dir=args.cache_dir)
+
+    with open(args.export, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if args.column not in header:
+            sys.exit(f"no column {args.column!r} in {args.export}: {header}")
+        rows = list(reader)
+    column = header.index(args.column)
+    texts = (row[column] if len(row) > column else "" for row in rows)
+
+    started = time.perf_counter()
+    flagged = []
+    for result in profanity_filter.screen_many(texts, workers=args.workers, chunk_size=args.chunk_size):
+        if result.matched:
+            row = rows[result.index]
+            fragments = [row[column][start:end] for start, end in result.spans]
+            flagged.append(row + ["; ".join(fragments)])
+            # +2: строки листа считаются с 1, первая — заголовок
+            print(f"row {result.index + 2}: {', '.join(fragments)}")
+    elapsed = time.perf_counter() - started
+
+    print(f"screened {len(rows)} rows in {elapsed:.1f}s, flagged {len(flagged)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header + ["Найдено"])
+            writer.writerows(flagged)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen a feedback sheet CSV export with ProfanityFilter")
+    parser.add_argument("export", help="CSV-выгрузка листа с обращениями")
+    parser.add_argument("--column", default="Сообщение", help="колонка с текстом")
+    parser.add_argument("--words", default="badwords.txt", help="словарь, по слову в строке")
+    parser.add_argument("--cache-dir", default=None, help="каталог кэша собранного фильтра")
+    parser.add_argument("--workers", type=int, default=None, help="процессов в пуле (0 — без пула)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="текстов в одной пачке для процесса")
+    parser.add_argument("--output", help="куда сохранить найденные строки (CSV)")
+    main(parser.parse_args())
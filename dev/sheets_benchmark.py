@@ -0,0 +1,95 @@
+"""
+Бенчмарк записи в Google Sheets на фейковой таблице (без сети и Redis).
+
+    python dev/sheets_benchmark.py --tickets 200 --latency 0.05 --error-rate 0.05
+
+Для каждого размера пачки открывает и закрывает --tickets обращений через
+SheetsWriteQueue и печатает время, число вызовов API, вызовы на операцию и число 429.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует переменные окружения бота — для бенчмарка подойдут заглушки
+for name, value in {
+    "BOT_TOKEN": "0:benchmark", "GROUP_CHAT_ID": "0", "SUPPORT_THREAD_ID": "0",
+    "SERVICE_ACCOUNT": "-", "SPREADSHEET_ID": "-",
+}.items():
+    os.environ.setdefault(name, value)
+
+import src.services.google_sheets as gs  # noqa: E402
+from src.services.sheets_fake import FakeSpreadsheet  # noqa: E402
+from src.services.sheets_outbox import SheetsOutbox  # noqa: E402
+from src.services.state_backend import MemoryBackend  # noqa: E402
+from src.utils.rate_limiter import TokenBucket  # noqa: E402
+
+
+async def run_scenario(args, batch_size: int, workdir: str) -> dict:
+    spreadsheet = FakeSpreadsheet(
+        latency=args.latency, error_rate=args.error_rate,
+        quota_per_minute=args.quota, seed=args.seed
+    )
+    gs.redis_client = MemoryBackend()
+    gs.connection = gs.SheetsConnection()
+    gs.connection.use(spreadsheet)
+    gs.partitions = gs.SheetPartitions(mode="month")
+    gs.stats = gs.SheetsStats()
+    gs.rate_limiter = TokenBucket(rate_per_minute=args.rate, capacity=args.burst)
+    gs.write_queue = gs.SheetsWriteQueue(
+        SheetsOutbox(os.path.join(workdir, f"outbox-{batch_size}.sqlite3")),
+        flush_interval=args.flush_interval, max_batch=batch_size, max_retry_delay=1.0
+    )
+
+    started = time.perf_counter()
+    gs.write_queue.start()
+    for user_id in range(args.tickets):
+        await gs.append_feedback_to_sheet(user_id, "student", "Обратная связь", "Текст обращения")
+    for user_id in range(args.tickets):
+        await gs.update_feedback_in_sheet(user_id, "Ответ", 1, "admin")
+    while gs.write_queue.depth:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await gs.write_queue.stop()
+
+    return {
+        "batch": batch_size,
+        "seconds": elapsed,
+        "api_calls": spreadsheet.total_calls,
+        "per_op": gs.stats.calls_per_ticket,
+        "throttled": spreadsheet.throttled,
+        "ops_per_sec": 2 * args.tickets / elapsed,
+    }
+
+
+async def main(args) -> None:
+    print(
+        f"tickets={args.tickets} latency={args.latency}s error_rate={args.error_rate} "
+        f"quota={args.quota} rate={args.rate}/min"
+    )
+    print(f"{'batch':>6} {'seconds':>8} {'api_calls':>10} {'per_op':>7} {'429':>5} {'ops/s':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for batch_size in args.batch_sizes:
+            r = await run_scenario(args, batch_size, workdir)
+            print(
+                f"{r['batch']:>6} {r['seconds']:>8.2f} {r['api_calls']:>10} "
+                f"{r['per_op']:>7.2f} {r['throttled']:>5} {r['ops_per_sec']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Google Sheets write path against a fake spreadsheet")
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка одного вызова API, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля вызовов, падающих с 429")
+    parser.add_argument("--quota", type=int, default=None, help="квота вызовов в минуту у фейковой таблицы")
+    parser.add_argument("--rate", type=float, default=60_000, help="лимит token bucket, запросов в минуту")
+    parser.add_argument("--burst", type=float, default=None, help="ёмкость token bucket")
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
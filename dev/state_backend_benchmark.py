@@ -0,0 +1,125 @@
+"""
+Задержка операций StateManager на разных хранилищах: MemoryBackend и Redis.
+
+    python dev/state_backend_benchmark.py --ops 2000
+    REDIS_TEST_URL=redis://localhost:6379/15 python dev/state_backend_benchmark.py --backends memory redis
+
+Для каждого хранилища и раскладки данных (keys, hash) бенчмарк прогоняет каждую операцию
+--ops раз на пользователях с id от --first-id и печатает среднее, p50 и p95 в микросекундах.
+Redis берётся из REDIS_TEST_URL (по умолчанию redis://localhost:6379/15); свои ключи бенчмарк удаляет.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует переменные окружения бота — для бенчмарка подойдут заглушки
+for name, value in {
+    "BOT_TOKEN": "0:benchmark", "GROUP_CHAT_ID": "0", "SUPPORT_THREAD_ID": "0",
+    "SERVICE_ACCOUNT": "-", "SPREADSHEET_ID": "-",
+}.items():
+    os.environ.setdefault(name, value)
+
+import redis.asyncio as redis  # noqa: E402
+
+import src.services.state_layout as state_layout  # noqa: E402
+import src.services.state_manager as state_manager  # noqa: E402
+from src.services import redis_scripts  # noqa: E402
+from src.services.state_backend import MemoryBackend  # noqa: E402
+from src.services.state_layout import UserHashLayout  # noqa: E402
+from src.services.state_manager import StateManager, state_cache  # noqa: E402
+
+# Операции: имя -> корутина от StateManager и номера итерации
+OPERATIONS = {
+    "save_state": lambda sm, n: sm.save_state(menu_message_id=n, last_image="menu"),
+    "get_state": lambda sm, n: sm.get_state(),
+    "admit": lambda sm, n: sm.admit(),
+    "is_blocked": lambda sm, n: sm.is_blocked(),
+    "push_nav": lambda sm, n: sm.push_nav("screen", {"n": n % 3}),
+    "pop_nav": lambda sm, n: sm.pop_nav(),
+    "batch(4 reads)": lambda sm, n: (
+        sm.batch().get_state().get_feedback_type().is_blocked().can_create_feedback().execute()
+    ),
+}
+
+
+async def typical_update(sm: StateManager, n: int):
+    async with state_cache():
+        await sm.touch()
+        await sm.admit()
+        await sm.get_state()
+        await sm.save_state(menu_message_id=n)
+        await sm.push_nav("screen", {"n": n % 3})
+
+OPERATIONS["typical update"] = typical_update
+
+
+def install(client) -> None:
+    """Переключить StateManager и скрипты на другое хранилище"""
+    state_manager.redis_client = client
+    state_layout.redis_client = client
+    redis_scripts.redis_client = client
+    for name, script in list(redis_scripts.SCRIPTS.items()):
+        setattr(redis_scripts, name, client.register_script(script.script))
+
+
+async def run(client, layout_name: str, args) -> list:
+    state_manager.layout = UserHashLayout(args.field_ttl) if layout_name == "hash" else None
+    if state_manager.layout:
+        await state_manager.layout.detect()
+    rows = []
+    for op, call in OPERATIONS.items():
+        latencies = []
+        for n in range(args.ops):
+            sm = StateManager(args.first_id + n % args.users)
+            started = time.perf_counter()
+            await call(sm, n)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        rows.append((op, statistics.mean(latencies) * 1e6, latencies[len(latencies) // 2] * 1e6,
+                     latencies[int(len(latencies) * 0.95)] * 1e6))
+    return rows
+
+
+async def cleanup(client, args) -> None:
+    keys = []
+    for user_id in range(args.first_id, args.first_id + args.users):
+        sm = StateManager(user_id)
+        keys += [sm.user_key, sm.state_key, sm.feedback_type_key, sm.lock_key, sm.blocked_key,
+                 sm.admin_replying_key, sm.nav_stack_key]
+    for start in range(0, len(keys), 500):
+        await client.delete(*keys[start:start + 500])
+
+
+async def main(args) -> None:
+    logging.disable(logging.INFO)  # StateManager пишет в лог каждую операцию
+    print(f"ops={args.ops} users={args.users}")
+    print(f"{'backend':>8} {'layout':>6} {'operation':>16} {'mean,us':>9} {'p50,us':>9} {'p95,us':>9}")
+    for backend in args.backends:
+        client = MemoryBackend() if backend == "memory" else redis.Redis.from_url(args.redis_url, decode_responses=True)
+        install(client)
+        await redis_scripts.load_scripts()
+        try:
+            for layout_name in args.layouts:
+                for op, mean, p50, p95 in await run(client, layout_name, args):
+                    print(f"{backend:>8} {layout_name:>6} {op:>16} {mean:>9.1f} {p50:>9.1f} {p95:>9.1f}")
+        finally:
+            await cleanup(client, args)
+            await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-operation StateManager latency across storage backends")
+    parser.add_argument("--backends", nargs="+", default=["memory"], choices=["memory", "redis"])
+    parser.add_argument("--layouts", nargs="+", default=["keys", "hash"], choices=["keys", "hash"])
+    parser.add_argument("--field-ttl", default="auto", choices=["auto", "native", "emulated"])
+    parser.add_argument("--ops", type=int, default=1000, help="сколько раз выполнить каждую операцию")
+    parser.add_argument("--users", type=int, default=100, help="на скольких пользователях")
+    parser.add_argument("--first-id", type=int, default=9_000_000_000, help="id первого тестового пользователя")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15"))
+    asyncio.run(main(parser.parse_args()))
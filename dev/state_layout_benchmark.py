@@ -0,0 +1,154 @@
+"""
+Сравнение раскладок состояния в Redis: отдельные ключи (keys) и сводный хэш user:{id} (hash).
+
+    REDIS_DB=15 python dev/state_layout_benchmark.py --users 5000 --updates 2000
+
+Нужен настоящий Redis, лучше отдельная база (REDIS_DB). Для каждой раскладки бенчмарк заводит
+--users пользователей с id от --first-id, замеряет память (MEMORY USAGE всех их ключей), число
+ключей и задержку типичного апдейта (touch, admit, get_state, save_state, push_nav внутри
+StateCache), а в конце удаляет свои ключи.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует переменные окружения бота — для бенчмарка подойдут заглушки
+for name, value in {
+    "BOT_TOKEN": "0:benchmark", "GROUP_CHAT_ID": "0", "SUPPORT_THREAD_ID": "0",
+    "SERVICE_ACCOUNT": "-", "SPREADSHEET_ID": "-",
+}.items():
+    os.environ.setdefault(name, value)
+
+import src.services.state_manager as state_manager  # noqa: E402
+from src.services.redis_client import redis_client  # noqa: E402
+from src.services.redis_scripts import load_scripts  # noqa: E402
+from src.services.state_layout import USER_HASH_KEY, UserHashLayout  # noqa: E402
+from src.services.state_manager import StateManager, state_cache  # noqa: E402
+from src.utils.fingerprint import fingerprint  # noqa: E402
+
+OLD_KEYS = [
+    state_manager.USER_STATE_KEY, state_manager.FEEDBACK_TYPE_KEY, state_manager.FEEDBACK_LOCK_KEY,
+    state_manager.BLOCKED_USER_KEY, state_manager.ADMIN_REPLYING_KEY, state_manager.NAV_STACK_KEY,
+]
+
+
+def user_keys(layout, user_id: int) -> list:
+    if layout:
+        return [USER_HASH_KEY.format(user_id=user_id)]
+    return [template.format(user_id=user_id, admin_id=user_id) for template in OLD_KEYS]
+
+
+async def populate(users: range, rng: random.Random) -> None:
+    """Типичный след пользователя: состояние меню, стек из двух экранов, у части — флаги"""
+    for start in range(users.start, users.stop, 100):
+        batch = StateManager(start).batch(transaction=False)
+        for user_id in range(start, min(start + 100, users.stop)):
+            b = batch.user(user_id)
+            b.save_state(
+                menu_message_id=rng.randint(1, 10**6), last_text=fingerprint(f"screen {user_id}"),
+                last_image="main_menu", last_keyboard=fingerprint(f"keyboard {user_id}")
+            )
+            b.reset_nav().push_nav("feedback", {"category": "Другое"})
+            if rng.random() < 0.2:
+                b.set_feedback_type("Другое").save_state(type="Другое", is_named=True)
+            if rng.random() < 0.1:
+                b.lock_user()
+            if rng.random() < 0.02:
+                b.block_user(3600)
+        await batch.execute()
+
+
+async def measure_memory(layout, users: range) -> tuple:
+    total, keys = 0, 0
+    for start in range(users.start, users.stop, 500):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id in range(start, min(start + 500, users.stop)):
+                for key in user_keys(layout, user_id):
+                    pipe.memory_usage(key)
+            for size in await pipe.execute():
+                if size is not None:
+                    total += size
+                    keys += 1
+    return total, keys
+
+
+async def typical_update(user_id: int, n: int) -> float:
+    started = time.perf_counter()
+    async with state_cache():
+        sm = StateManager(user_id)
+        await sm.touch()
+        await sm.admit()
+        await sm.get_state()
+        await sm.save_state(menu_message_id=n, last_text=fingerprint(f"text {n}"))
+        await sm.push_nav("screen", {"n": n % 3})
+    return time.perf_counter() - started
+
+
+async def cleanup(users: range) -> None:
+    for start in range(users.start, users.stop, 500):
+        keys = [key for user_id in range(start, min(start + 500, users.stop)) for layout in (None, True)
+                for key in user_keys(layout, user_id)]
+        await redis_client.delete(*keys)
+
+
+async def run_layout(name: str, args) -> dict:
+    layout = UserHashLayout(args.field_ttl) if name == "hash" else None
+    if layout:
+        await layout.detect()
+    state_manager.layout = layout
+
+    users = range(args.first_id, args.first_id + args.users)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    await populate(users, rng)
+    populate_seconds = time.perf_counter() - started
+
+    memory, keys = await measure_memory(layout, users)
+    latencies = [await typical_update(rng.choice(users), n) for n in range(args.updates)]
+    latencies.sort()
+    await cleanup(users)
+
+    return {
+        "layout": name if not layout else f"hash/{'native' if layout.native else 'emulated'}",
+        "keys": keys / args.users,
+        "bytes": memory / args.users,
+        "populate": populate_seconds,
+        "mean": statistics.mean(latencies) * 1000,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+async def main(args) -> None:
+    logging.disable(logging.INFO)  # StateManager пишет в лог каждую операцию
+    await load_scripts()
+    print(f"users={args.users} updates={args.updates} redis_db={os.getenv('REDIS_DB', 0)}")
+    print(f"{'layout':>16} {'keys/user':>10} {'bytes/user':>11} {'populate,s':>11} {'mean,ms':>8} {'p50,ms':>7} {'p95,ms':>7}")
+    try:
+        for name in args.layouts:
+            r = await run_layout(name, args)
+            print(
+                f"{r['layout']:>16} {r['keys']:>10.2f} {r['bytes']:>11.0f} {r['populate']:>11.2f} "
+                f"{r['mean']:>8.2f} {r['p50']:>7.2f} {r['p95']:>7.2f}"
+            )
+    finally:
+        await cleanup(range(args.first_id, args.first_id + args.users))
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory and latency of the keys and hash state layouts")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=1000, help="сколько типичных апдейтов замерить")
+    parser.add_argument("--layouts", nargs="+", default=["keys", "hash"], choices=["keys", "hash"])
+    parser.add_argument("--field-ttl", default="auto", choices=["auto", "native", "emulated"])
+    parser.add_argument("--first-id", type=int, default=9_000_000_000, help="id первого тестового пользователя")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
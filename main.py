@@ -1,11 +1,33 @@
 import asyncio
 import sys
+import time
+from contextlib import contextmanager
 
-from src.bot import dp, bot, register_handlers, redis_client
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+startup_timings = {}
+
+@contextmanager
+def timed(stage: str):
+    """Замерить длительность этапа запуска"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[stage] = time.perf_counter() - started
+
+with timed("import"):
+    from src.bot import dp, bot, register_handlers, register_lifecycle, redis_client
+    from src.services.redis_scripts import load_scripts
+    from src.services.state_layout import layout as state_layout
+    from src.utils.filter_profanity import profanity_filter
+
+def log_startup_report():
+    report = ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in startup_timings.items())
+    logger.info(f"Время запуска: {report}")
+
 async def check_redis():
     try:
         pong = await redis_client.ping()
@@ -19,9 +41,24 @@ async def check_redis():
         sys.exit(1)
 
 async def main():
-    await check_redis()  
+    with timed("redis_check"):
+        await check_redis()
+
+    with timed("redis_scripts"):
+        await load_scripts()
+
+    if state_layout:
+        with timed("state_layout"):
+            await state_layout.detect()
+
+    with timed("profanity_filter"):
+        profanity_filter.get()
+
+    with timed("register_handlers"):
+        register_handlers(dp)
+        register_lifecycle(dp)
 
-    register_handlers(dp)  
+    log_startup_report()
 
     logger.info("Бот запущен и ждёт команды.")
     await dp.start_polling(bot)
@@ -1,6 +1,5 @@
 from aiogram.filters import Command
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.types import Message
 from aiogram.filters import Filter
 from src.handlers.back_handler import back_handler
@@ -12,20 +11,28 @@ from src.handlers.callback_handler import callback_handler
 from src.handlers.feedback_handler import feedback_message_handler
 from src.handlers.admin_handler import admin_reply_text_handler  
 from src.services.redis_client import redis_client
-from src.handlers.admin_commands import block_user_handler, unblock_user_handler
+from src.handlers.admin_commands import (
+    block_user_handler, unblock_user_handler, sheets_status_handler, archive_sheets_handler, redis_memory_handler,
+    rescreen_handler
+)
+from src.services.google_sheets import connection as sheets_connection, sheets_sync, write_queue
+from src.services.redis_sweeper import redis_sweeper
+from src.services.flag_cache import flag_cache
+from src.middlewares.state_cache import StateCacheMiddleware
+from src.services.state_manager import StateManager
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-storage = RedisStorage(redis=redis_client)
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(bot=bot, storage=storage)
+# FSM aiogram не используется — состояние живёт в StateManager, хранилище по умолчанию (в памяти)
+dp = Dispatcher(bot=bot)
 
 class IsAdminReplying(Filter):
     async def __call__(self, message: Message) -> bool:
-        result = await redis_client.exists(f"admin_replying:{message.from_user.id}")
-        logger.debug(f"IsAdminReplying filter: user_id={message.from_user.id} result={bool(result)}")
-        return bool(result)
+        result = await StateManager(message.from_user.id, logger=logger).get_admin_reply_target() is not None
+        logger.debug(f"IsAdminReplying filter: user_id={message.from_user.id} result={result}")
+        return result
 
 async def chat_info_handler(message: Message):
     """Обработчик команды /chat_info с выводом ID подтемы, если есть"""
@@ -52,12 +59,42 @@ async def chat_info_handler(message: Message):
 
 
 def register_handlers(dp: Dispatcher):
+    # Один снимок состояния пользователя на апдейт, записи — одним pipeline в конце
+    dp.update.outer_middleware(StateCacheMiddleware())
+
     # Основные обработчики
     dp.message.register(start_handler, Command(commands=["start"]))
     dp.message.register(block_user_handler, Command(commands=["block_user"]))
     dp.message.register(unblock_user_handler, Command(commands=["unblock_user"]))
     dp.message.register(chat_info_handler, Command(commands=["chat_info"]))  # Новая команда
+    dp.message.register(sheets_status_handler, Command(commands=["sheets_status"]))
+    dp.message.register(archive_sheets_handler, Command(commands=["archive_sheets"]))
+    dp.message.register(redis_memory_handler, Command(commands=["redis_memory"]))
+    dp.message.register(rescreen_handler, Command(commands=["rescreen"]))
     dp.callback_query.register(callback_handler)
     dp.callback_query.register(back_handler, lambda c: c.data == "back")  # <-- тут
     dp.message.register(admin_reply_text_handler, IsAdminReplying())
-    dp.message.register(feedback_message_handler)
\ No newline at end of file
+    dp.message.register(feedback_message_handler)
+
+
+async def on_startup():
+    # Подключение к Google Sheets идёт в фоне и не задерживает polling
+    sheets_connection.start()
+    write_queue.start()
+    sheets_sync.start()
+    redis_sweeper.start()
+    await flag_cache.start()
+
+
+async def on_shutdown():
+    # Дописываем в таблицу всё, что осталось в очереди
+    await flag_cache.stop()
+    await redis_sweeper.stop()
+    await sheets_sync.stop()
+    await write_queue.stop()
+    await sheets_connection.stop()
+
+
+def register_lifecycle(dp: Dispatcher):
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
@@ -1,10 +1,25 @@
+import asyncio
+import time
+
 from aiogram import types
 from src.utils.config import GROUP_CHAT_ID
+from src.utils.filter_profanity import profanity_filter
 from src.services.redis_client import redis_client
+from src.services.google_sheets import (
+    MESSAGE_COL, USER_ID_COL, outbox, partitions, rate_limiter, read_feedback_rows, write_queue,
+    stats as sheets_stats
+)
+from src.services.redis_sweeper import redis_sweeper
+from src.services.flag_cache import flag_cache
+from src.services.state_manager import StateManager
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Меньше обращений проверять в одном процессе: запуск пула дольше самой проверки
+RESCREEN_POOL_MIN_TEXTS = 5000
+RESCREEN_LIST_LIMIT = 20
+
 async def block_user_handler(message: types.Message):
     if message.chat.id != GROUP_CHAT_ID:
         await message.answer("❌ Команда доступна только в группе админов.")
@@ -20,7 +35,7 @@ async def block_user_handler(message: types.Message):
     if len(args) == 3 and args[2].isdigit():
         block_minutes = int(args[2])
 
-    await redis_client.set(f"blocked:{user_id}", "1", ex=block_minutes * 60)
+    await StateManager(user_id).block_user(expire=block_minutes * 60)
     logger.info(f"User {user_id} заблокирован на {block_minutes} минут (команда в группе {GROUP_CHAT_ID})")
     await message.answer(f"Пользователь {user_id} заблокирован на {block_minutes} минут.")
 
@@ -35,6 +50,121 @@ async def unblock_user_handler(message: types.Message):
         return
 
     user_id = int(args[1])
-    await redis_client.delete(f"blocked:{user_id}")
+    await StateManager(user_id).unblock_user()
     logger.info(f"User {user_id} разблокирован (команда в группе {GROUP_CHAT_ID})")
     await message.answer(f"Пользователь {user_id} разблокирован.")
+
+async def sheets_status_handler(message: types.Message):
+    if message.chat.id != GROUP_CHAT_ID:
+        await message.answer("❌ Команда доступна только в группе админов.")
+        return
+
+    backlog = await outbox.stats()
+    oldest = f"{backlog.oldest_age / 60:.0f} мин" if backlog.oldest_age is not None else "—"
+
+    text = (
+        f"Очередь записи в Google Sheets: {write_queue.depth} операций.\n"
+        f"Самая старая ждёт: {oldest}, с неудачными попытками: {backlog.failed_attempts}.\n"
+        f"Размер журнала: {backlog.size_bytes / 1024:.0f} КБ.\n"
+        f"Вызовов Sheets API: {sheets_stats.api_calls} "
+        f"(добавлено строк: {sheets_stats.rows_appended}, закрыто: {sheets_stats.rows_closed}, "
+        f"в среднем {sheets_stats.calls_per_ticket:.2f} на операцию).\n"
+        f"Закрыто вручную в таблице: {sheets_stats.manual_closes}.\n"
+        f"Лимитер: ждали {rate_limiter.stats.waited} раз "
+        f"(в среднем {rate_limiter.stats.avg_wait:.1f} с, максимум {rate_limiter.stats.max_wait:.1f} с), "
+        f"отклонено: {rate_limiter.stats.rejected}, ответов 429: {sheets_stats.throttled}."
+    )
+    if backlog.last_error:
+        text += f"\nПоследняя ошибка: {backlog.last_error}"
+
+    await message.answer(text)
+
+async def archive_sheets_handler(message: types.Message):
+    if message.chat.id != GROUP_CHAT_ID:
+        await message.answer("❌ Команда доступна только в группе админов.")
+        return
+
+    args = message.text.split()
+    if len(args) > 2 or (len(args) == 2 and not args[1].isdigit()):
+        await message.answer("Использование: /archive_sheets [сколько_последних_листов_оставить]")
+        return
+
+    keep = int(args[1]) if len(args) == 2 else 2
+    try:
+        frozen = await partitions.archive(keep=keep)
+    except Exception as e:
+        logger.error(f"Failed to archive sheet partitions: {e}")
+        await message.answer(f"Не удалось заархивировать листы: {e}")
+        return
+
+    if frozen:
+        await message.answer("Заархивированы листы:\n" + "\n".join(f"• {title}" for title in frozen))
+    else:
+        await message.answer("Нет листов для архивации.")
+
+async def redis_memory_handler(message: types.Message):
+    if message.chat.id != GROUP_CHAT_ID:
+        await message.answer("❌ Команда доступна только в группе админов.")
+        return
+
+    try:
+        memory = await redis_client.info("memory")
+        report = await redis_sweeper.sweep()
+    except Exception as e:
+        logger.error(f"Failed to sweep Redis: {e}")
+        await message.answer(f"Не удалось обойти Redis: {e}")
+        return
+
+    lines = [
+        f"Redis занимает {memory.get('used_memory_human', '?')} "
+        f"(пик {memory.get('used_memory_peak_human', '?')}).",
+        f"Ключей: {report.scanned}, обход занял {report.seconds:.1f} с.",
+    ]
+    for name, usage in sorted(report.families.items(), key=lambda item: -item[1].estimated_bytes):
+        line = f"• {name}: {usage.keys} ключей, ~{usage.estimated_bytes / 1024:.0f} КБ"
+        if usage.no_ttl:
+            line += f", без TTL: {usage.no_ttl} (выставлено: {usage.expired})"
+        lines.append(line)
+
+    stats = flag_cache.stats
+    lines.append(
+        f"Кэш флагов: {'включён' if flag_cache.enabled else 'выключен'}, записей {len(flag_cache)}, "
+        f"попаданий {stats.hits}, промахов {stats.misses}, инвалидаций {stats.invalidations}"
+    )
+
+    await message.answer("\n".join(lines))
+
+async def rescreen_handler(message: types.Message):
+    if message.chat.id != GROUP_CHAT_ID:
+        await message.answer("❌ Команда доступна только в группе админов.")
+        return
+
+    try:
+        rows = await read_feedback_rows()
+    except Exception as e:
+        logger.error(f"Failed to read feedback rows for rescreen: {e}")
+        await message.answer(f"Не удалось прочитать таблицу: {e}")
+        return
+
+    texts = [row[MESSAGE_COL] if len(row) > MESSAGE_COL else "" for _, _, row in rows]
+    workers = 0 if len(texts) < RESCREEN_POOL_MIN_TEXTS else None
+    started = time.monotonic()
+    # Генератор создаётся здесь (свой экземпляр фильтра), а проверка идёт в отдельном потоке
+    results = profanity_filter.screen_many(texts, workers=workers)
+    flagged = await asyncio.to_thread(lambda: [result for result in results if result.matched])
+    seconds = time.monotonic() - started
+    logger.info(f"[profanity] Rescreened {len(texts)} feedback rows in {seconds:.1f}s: {len(flagged)} flagged")
+
+    lines = [
+        f"Проверено обращений: {len(texts)} за {seconds:.1f} с, "
+        f"с запрещёнными словами: {len(flagged)}."
+    ]
+    for result in flagged[:RESCREEN_LIST_LIMIT]:
+        title, row_number, row = rows[result.index]
+        start, end = result.spans[0]
+        user_id = row[USER_ID_COL] if len(row) > USER_ID_COL else "?"
+        lines.append(f"• {title}!{row_number}, user_id {user_id}: «{texts[result.index][start:end]}»")
+    if len(flagged) > RESCREEN_LIST_LIMIT:
+        lines.append(f"…и ещё {len(flagged) - RESCREEN_LIST_LIMIT}.")
+
+    await message.answer("\n".join(lines))
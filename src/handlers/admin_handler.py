@@ -3,7 +3,6 @@ from src.services.state_manager import StateManager
 from src.utils.logger import setup_logger
 from src.services.google_sheets import update_feedback_in_sheet
 from src.services.redis_client import redis_client
-import asyncio
 
 logger = setup_logger(__name__)
 
@@ -14,8 +13,9 @@ async def handle_admin_reply(callback: CallbackQuery, data: str):
         state_manager = StateManager(admin_id)
         
         # Сохраняем цель и чат, откуда был ответ
-        await state_manager.set_admin_reply_target(target_user_id, expire=1800)
-        await state_manager.save_state(admin_replying_from_chat=callback.message.chat.id)
+        async with state_manager.batch() as batch:
+            batch.set_admin_reply_target(target_user_id, expire=1800)
+            batch.save_state(admin_replying_from_chat=callback.message.chat.id)
 
         # Определяем, есть ли текст или медиа с подписью
         current_text = callback.message.text
@@ -68,7 +68,7 @@ async def handle_admin_reply(callback: CallbackQuery, data: str):
 
 async def admin_reply_text_handler(message: Message):
     admin_id = message.from_user.id
-    lock_key = f"admin_reply_lock:{admin_id}"
+    lock_key = f"admin_reply_lock:{{{admin_id}}}"
 
     locked = await redis_client.set(lock_key, "1", ex=10, nx=True)
     if not locked:
@@ -78,8 +78,14 @@ async def admin_reply_text_handler(message: Message):
     state_manager = StateManager(admin_id)
 
     try:
-        user_id = await state_manager.get_admin_reply_target()
-        chat_id = await state_manager.get_state_field("admin_replying_from_chat")
+        reply = await (
+            state_manager.batch()
+            .get_admin_reply_target()
+            .get_state_field("admin_replying_from_chat")
+            .execute()
+        )
+        user_id = reply["admin_reply_target"]
+        chat_id = reply["admin_replying_from_chat"]
 
         # Проверка, что сообщение пришло из того же чата
         if user_id is None or chat_id is None or message.chat.id != int(chat_id):
@@ -130,22 +136,21 @@ async def admin_reply_text_handler(message: Message):
 
         # --- обновление в Google Sheets ---
         admin_username = message.from_user.username or ""
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            update_feedback_in_sheet,
-            user_id,
-            message.caption or message.text or "",
-            str(admin_id),
-            admin_username,
-            "Вопрос закрыт"
-        )
-
-        await StateManager(user_id).unlock_feedback()
+        try:
+            await update_feedback_in_sheet(
+                user_id,
+                message.caption or message.text or "",
+                str(admin_id),
+                admin_username,
+                "Вопрос закрыт"
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue ticket close for user {user_id} in Google Sheets: {e}")
 
-        await state_manager.delete_state_field("admin_replying_from_chat")
-        await state_manager.delete_state_field("admin_replying_to")
-        if hasattr(state_manager, "admin_replying_key") and state_manager.admin_replying_key:
-            await redis_client.delete(state_manager.admin_replying_key)
+        # Разблокировка пользователя и сброс состояния ответа — одним запросом
+        async with state_manager.batch() as batch:
+            batch.user(user_id).unlock_user()
+            batch.delete_state_fields("admin_replying_from_chat", "admin_replying_to")
 
         logger.info(f"Admin {admin_id} finished replying to user {user_id}")
 
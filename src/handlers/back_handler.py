@@ -1,6 +1,6 @@
 from aiogram.types import CallbackQuery, FSInputFile, InputMediaPhoto
-import json
 from src.services.state_manager import StateManager
+from src.utils.fingerprint import screen_fingerprint
 from src.utils.logger import setup_logger
 from src.handlers.start_handler import start_handler
 from src.handlers.feedback_handler import send_feedback_prompt, handle_feedback_choice
@@ -34,11 +34,7 @@ async def try_edit_main_menu(bot, user_id, state_mgr, full_name):
             text=caption_text,
             reply_markup=keyboard
         )
-        await state_mgr.save_state(
-            last_text=caption_text,
-            last_image=photo_path,
-            last_keyboard=json.dumps(keyboard.model_dump())
-        )
+        await state_mgr.save_state(**screen_fingerprint(caption_text, photo_path, keyboard))
         logger.info(f"[main] Отредактировано главное меню для пользователя {user_id}")
         return True
     except Exception as e:
@@ -61,15 +57,8 @@ async def back_handler(callback: CallbackQuery):
     user_id = callback.from_user.id
     state_mgr = StateManager(user_id)
 
-    # Логируем стек до возврата
-    stack_before = await state_mgr.get_nav_stack()
-    logger.info(f"[nav] User {user_id} nav stack before go_back: {stack_before}")
-
+    # pop_nav сам логирует новый верх стека, отдельные чтения стека для логов не нужны
     screen, params = await state_mgr.go_back()
-
-    # Логируем стек после возврата
-    stack_after = await state_mgr.get_nav_stack()
-    logger.info(f"[nav] User {user_id} nav stack after go_back: {stack_after}")
     logger.info(f"User {user_id} возвращается на экран '{screen}' с params={params}")
 
     if not screen:
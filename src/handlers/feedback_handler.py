@@ -1,4 +1,3 @@
-import asyncio
 from aiogram.types import (
     Message, FSInputFile, InputMediaPhoto,
     InlineKeyboardMarkup, CallbackQuery
@@ -7,8 +6,10 @@ from src.keyboards.main_menu import back_button
 from src.keyboards.identity import get_identity_choice_keyboard
 from src.keyboards.reply import get_reply_to_user_keyboard
 from src.utils.config import GROUP_CHAT_ID, SUPPORT_THREAD_ID
+from src.utils.fingerprint import screen_fingerprint
 from src.utils.logger import setup_logger
 from src.services.state_manager import StateManager
+from src.services.redis_scripts import ADMIT_BLOCKED, ADMIT_LOCKED
 from src.utils.categories import (
     FEEDBACK_NOTIFICATION_TEMPLATE,
     URGENT_FEEDBACK_NOTIFICATION_TEMPLATE,
@@ -20,7 +21,7 @@ from src.utils.categories import (
 )
 from src.utils.media_utils import send_or_edit_media
 from src.utils.helpers import handle_bot_user
-from src.utils.filter_profanity import ProfanityFilter
+from src.utils.filter_profanity import profanity_filter
 from src.services.google_sheets import append_feedback_to_sheet
 from src.utils.feedback_validator import FeedbackValidator 
 
@@ -92,12 +93,15 @@ async def handle_feedback_choice(callback: CallbackQuery, data: str):
     user_id = callback.from_user.id
     state_mgr = StateManager(user_id)
 
-    if await state_mgr.is_blocked():
+    # Проверка блокировок одним Lua-скриптом
+    verdict = await state_mgr.admit()
+
+    if verdict == ADMIT_BLOCKED:
         await callback.answer("❌ Вы заблокированы и не можете оставлять обращения.", show_alert=True)
         logger.info(f"Blocked user {user_id} попытался выбрать категорию.")
         return
 
-    if not await state_mgr.can_create_feedback():
+    if verdict == ADMIT_LOCKED:
         await callback.answer(
             "❗️ У вас уже есть открытое обращение. Дождитесь ответа перед созданием нового. ❗️",
             show_alert=True
@@ -105,8 +109,9 @@ async def handle_feedback_choice(callback: CallbackQuery, data: str):
         logger.info(f"User {user_id} attempted to start new feedback while locked")
         return
 
-    await state_mgr.set_feedback_type(data, expire=300)
-    await state_mgr.push_nav("identity_choice", {"category": data})
+    async with state_mgr.batch() as batch:
+        batch.set_feedback_type(data, expire=300)
+        batch.push_nav("identity_choice", {"category": data})
 
     msg = await send_or_edit_media(
         callback,
@@ -138,8 +143,9 @@ async def handle_send_identity_choice(callback: CallbackQuery, data: str):
         return
 
     is_named = data == "send_named"
-    await state_mgr.save_state(type=feedback_type, is_named=is_named)
-    await state_mgr.push_nav("feedback_prompt", {"feedback_type": feedback_type})
+    async with state_mgr.batch() as batch:
+        batch.save_state(type=feedback_type, is_named=is_named)
+        batch.push_nav("feedback_prompt", {"feedback_type": feedback_type})
 
     await send_feedback_prompt(bot, user_id, feedback_type)
     await callback.answer()
@@ -153,11 +159,13 @@ async def handle_print_request(callback: CallbackQuery, data: str):
     bot = callback.message.bot
     state_mgr = StateManager(user_id)
 
-    if await state_mgr.is_blocked():
+    verdict = await state_mgr.admit()
+
+    if verdict == ADMIT_BLOCKED:
         await callback.answer("❌ Вы заблокированы и не можете отправлять запросы.", show_alert=True)
         return
 
-    if not await state_mgr.can_create_feedback():
+    if verdict == ADMIT_LOCKED:
         await callback.answer(
             "❗️ У вас уже есть открытое обращение. Дождитесь ответа перед созданием нового. ❗️",
             show_alert=True
@@ -165,9 +173,10 @@ async def handle_print_request(callback: CallbackQuery, data: str):
         return
 
     feedback_type = data  
-    await state_mgr.set_feedback_type(feedback_type, expire=300)
-    await state_mgr.save_state(type=feedback_type, is_named=True)
-    await state_mgr.push_nav("feedback_prompt", {"feedback_type": feedback_type})
+    async with state_mgr.batch() as batch:
+        batch.set_feedback_type(feedback_type, expire=300)
+        batch.save_state(type=feedback_type, is_named=True)
+        batch.push_nav("feedback_prompt", {"feedback_type": feedback_type})
 
     await send_feedback_prompt(bot, user_id, feedback_type)
     await callback.answer()
@@ -196,25 +205,26 @@ async def feedback_message_handler(message: Message):
         logger.info(f"User {user_id} sent a message, but feedback prompt not expected. Ignoring.")
         return
 
-    if await state_mgr.is_blocked():
+    try:
+        profanity_filter.check_and_raise(message.text or "")
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+
+    # Проверка и захват лока атомарно: второе сообщение, пришедшее одновременно, получит ADMIT_LOCKED
+    verdict = await state_mgr.admit(acquire=True)
+
+    if verdict == ADMIT_BLOCKED:
         await message.answer("❌ Вы заблокированы и не можете создавать обращения.")
         logger.info(f"Blocked user {user_id} попытался отправить обращение")
         return
 
-    if not await state_mgr.can_create_feedback():
+    if verdict == ADMIT_LOCKED:
         await message.answer(
             "❗️ У вас уже есть открытое обращение. Пожалуйста, дождитесь ответа на предыдущее перед созданием нового."
         )
         return
 
-    try:
-        ProfanityFilter().check_and_raise(message.text or "")
-    except ValueError as e:
-        await message.answer(str(e))
-        return
-
-    await state_mgr.lock_user()
-
     category = feedback.get('type', 'Не указана')
     is_named = feedback.get('is_named', False)
     prompt_message_id = feedback.get('prompt_message_id')
@@ -300,9 +310,7 @@ async def feedback_message_handler(message: Message):
 
     # --- запись в Google Sheets ---
     try:
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            append_feedback_to_sheet,
+        await append_feedback_to_sheet(
             user_id,
             sender_display_name,
             category,
@@ -311,7 +319,7 @@ async def feedback_message_handler(message: Message):
             "Ожидает ответа",
             is_named
         )
-        logger.info(f"Feedback from user {user_id} saved to Google Sheets")
+        logger.info(f"Feedback from user {user_id} queued for Google Sheets")
     except Exception as e:
         logger.error(f"Failed to save feedback to Google Sheets: {e}")
 
@@ -326,6 +334,7 @@ async def feedback_message_handler(message: Message):
     # Показываем экран подтверждения
     ack_photo = FSInputFile(ACKNOWLEDGMENT_IMAGE_PATH)
     back_btn = InlineKeyboardMarkup(inline_keyboard=[[back_button()]])
+    ack_state = {}
 
     try:
         if image_message_id:
@@ -343,12 +352,10 @@ async def feedback_message_handler(message: Message):
                 reply_markup=back_btn
             )
 
-            await state_mgr.save_state(
+            ack_state = dict(
                 image_message_id=image_message_id,
                 menu_message_id=menu_message_id,
-                last_text=ACKNOWLEDGMENT_CAPTION,
-                last_image=ACKNOWLEDGMENT_IMAGE_PATH,
-                last_keyboard=back_btn
+                **screen_fingerprint(ACKNOWLEDGMENT_CAPTION, ACKNOWLEDGMENT_IMAGE_PATH, back_btn)
             )
     except Exception as e:
         logger.warning(f"Failed to edit existing messages: {e}")
@@ -357,12 +364,12 @@ async def feedback_message_handler(message: Message):
             caption=ACKNOWLEDGMENT_CAPTION,
             reply_markup=back_btn
         )
-        await state_mgr.save_state(
+        ack_state = dict(
             image_message_id=ack_message.message_id,
             menu_message_id=ack_message.message_id,
-            last_text=ACKNOWLEDGMENT_CAPTION,
-            last_image=ACKNOWLEDGMENT_IMAGE_PATH,
-            last_keyboard=back_btn
+            **screen_fingerprint(ACKNOWLEDGMENT_CAPTION, ACKNOWLEDGMENT_IMAGE_PATH, back_btn)
         )
 
-    await state_mgr.reset_nav()
+    async with state_mgr.batch() as batch:
+        batch.save_state(**ack_state)
+        batch.reset_nav()
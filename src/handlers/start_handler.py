@@ -1,5 +1,6 @@
 from aiogram.types import Message, FSInputFile
 from src.keyboards.main_menu import get_main_keyboard
+from src.utils.fingerprint import screen_fingerprint
 from src.utils.logger import setup_logger
 from src.utils.categories import START_INFO
 from src.services.state_manager import StateManager  
@@ -12,26 +13,25 @@ async def start_handler(message: Message):
 
     state_manager = StateManager(user_id)
 
-    # Сбрасываем стек навигации на главный экран
-    await state_manager.reset_nav()
-
-    # Очищаем состояние обратной связи, чтобы не оставалось ожиданий
-    await state_manager.clear_feedback_state()
+    # Сбрасываем стек навигации на главный экран и очищаем состояние обратной связи,
+    # чтобы не оставалось ожиданий (одним запросом к Redis)
+    async with state_manager.batch() as batch:
+        batch.reset_nav()
+        batch.clear_feedback_state()
 
     photo = FSInputFile(START_INFO.image)
     caption_text = START_INFO.text.format(full_name=message.from_user.full_name or "друг")
 
     try:
+        keyboard = get_main_keyboard()
         photo_msg = await message.answer_photo(photo=photo)
-        text_msg = await message.answer(caption_text, reply_markup=get_main_keyboard())
+        text_msg = await message.answer(caption_text, reply_markup=keyboard)
 
         # Сохраняем состояние (ID сообщений + экран)
         await state_manager.save_state(
             image_message_id=photo_msg.message_id,
             menu_message_id=text_msg.message_id,
-            last_text=caption_text,
-            last_image=START_INFO.image,
-            last_keyboard=get_main_keyboard().model_dump()  
+            **screen_fingerprint(caption_text, START_INFO.image, keyboard)
         )
 
         logger.info(
@@ -0,0 +1,27 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.services.state_manager import StateManager, state_cache
+
+
+class StateCacheMiddleware(BaseMiddleware):
+    """
+    Кэш состояния пользователя на время обработки одного апдейта.
+    Все StateManager внутри хендлера читают user_state:{id} из одного снимка,
+    а записи уходят в Redis одним pipeline, когда хендлер завершился.
+    В этот же pipeline попадает продление TTL состояния автора апдейта.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with state_cache():
+            user = data.get("event_from_user")
+            if user is not None:
+                await StateManager(user.id).touch()
+            return await handler(event, data)
@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from redis.exceptions import ResponseError
+
+from src.services.redis_client import REDIS_DB, REDIS_MODE, redis_client
+from src.utils import config
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Ключи с флагами (раскладка keys) и сводный хэш (раскладка hash), за которыми следит кэш;
+# blocked и admin_replying в раскладке hash остаются отдельными ключами
+FLAG_KEY_PREFIXES = ["blocked:", "admin_replying:", "feedback_lock:"]
+HASH_KEY_PREFIXES = ["user:", "blocked:", "admin_replying:"]
+
+# События keyspace, после которых значения точно нет (остальные могут его создать)
+REMOVAL_EVENTS = {
+    "del", "expired", "evicted", "expire", "persist", "rename_from", "move_from",
+    "hdel", "hexpire", "hpersist", "hexpired",
+}
+
+
+@dataclass
+class FlagCacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    resets: int = 0  # сколько раз кэш очищался целиком (переподключение к Redis)
+
+
+class FlagCache:
+    """
+    Локальный кэш отрицательных ответов для горячих флагов: "не заблокирован",
+    "не отвечает пользователю", "нет открытого обращения". Почти все апдейты получают
+    именно такие ответы, и с кэшем им не нужен отдельный запрос к Redis.
+
+    Положительные ответы не кэшируются: флаг, который пропал по TTL, сразу читается заново.
+    Появление флага (SET, HSET — от этого или другого процесса бота) приходит
+    keyspace-уведомлением, и запись о ключе удаляется. Пока подписка не подтверждена
+    или соединение потеряно, кэш выключен и пуст, поэтому пропущенное уведомление
+    не оставит устаревший ответ; ttl дополнительно ограничивает возраст записи.
+
+    Гонку "прочитали, и тут пришло уведомление" закрывает счётчик version: каждая
+    инвалидация увеличивает его и запоминает новое значение для своего ключа. Ответ
+    запоминается, только если с момента отправки запроса не было инвалидации этого ключа
+    (уведомления о других ключах его не отбрасывают). Журнал инвалидаций ограничен
+    max_size ключей; вытесненные из него считаются инвалидированными в момент вытеснения.
+    В раскладке hash уведомление приходит на весь user:{id}, поэтому любая запись
+    в хэш сбрасывает все его флаги.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = FlagCacheStats()
+        self.enabled = False
+        self.version = 0
+        self._confirmed = 0
+        self._entries: "OrderedDict[str, Dict[Optional[str], float]]" = OrderedDict()
+        # Ключ -> version его последней инвалидации; _floor — для вытесненных ключей и clear()
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def known_absent(self, key: str, field: Optional[str] = None) -> bool:
+        """Известно ли, что флага нет (поле field сводного хэша или ключ целиком)"""
+        if not self.enabled:
+            return False
+        expires_at = self._entries.get(key, {}).get(field)
+        if expires_at is None or expires_at <= time.monotonic():
+            self.stats.misses += 1
+            return False
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return True
+
+    def remember_absent(self, key: str, field: Optional[str], version: int) -> None:
+        """Запомнить, что флага нет; version — значение self.version до отправки запроса"""
+        if not self.enabled or max(self._floor, self._invalidated.get(key, 0)) > version:
+            return
+        self._entries.setdefault(key, {})[field] = time.monotonic() + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        self.version += 1
+        self._invalidated[key] = self.version
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.max_size:
+            self._floor = max(self._floor, self._invalidated.popitem(last=False)[1])
+        if self._entries.pop(key, None) is not None:
+            self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        self.version += 1
+        self._floor = self.version
+        self._invalidated.clear()
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Подписка на keyspace-уведомления
+
+    @staticmethod
+    def _required_events() -> str:
+        # K — уведомления keyspace, g — RENAME/COPY/RESTORE, $ — строковые SET, h — HSET
+        return "Kg$h" if config.STATE_LAYOUT == "hash" else "Kg$"
+
+    async def _enable_notifications(self) -> bool:
+        """Включить нужные классы notify-keyspace-events, не убирая уже включённые"""
+        try:
+            current = (await redis_client.config_get("notify-keyspace-events")).get("notify-keyspace-events", "")
+            missing = [
+                c for c in self._required_events()
+                if c not in current and not (c in "g$lshzxet" and "A" in current)
+            ]
+            if missing:
+                await redis_client.config_set("notify-keyspace-events", current + "".join(missing))
+                logger.info(f"[flag-cache] notify-keyspace-events: {current!r} -> {current + ''.join(missing)!r}")
+            return True
+        except ResponseError as e:
+            logger.warning(
+                f"[flag-cache] Cannot configure keyspace notifications ({e}); "
+                f"set notify-keyspace-events={self._required_events()} on the server to enable the cache"
+            )
+            return False
+
+    def _patterns(self) -> List[str]:
+        prefixes = HASH_KEY_PREFIXES if config.STATE_LAYOUT == "hash" else FLAG_KEY_PREFIXES
+        return [f"__keyspace@{REDIS_DB}__:{prefix}*" for prefix in prefixes]
+
+    def _on_message(self, message: dict) -> None:
+        if message["type"] == "psubscribe":
+            # Подтверждение подписки (в том числе после переподключения) — всё, что кэш
+            # помнил до него, могло устареть без уведомления
+            self.clear()
+            self._confirmed += 1
+            self.enabled = self._confirmed >= len(self._patterns())
+            if self.enabled:
+                logger.info("[flag-cache] Subscribed to keyspace notifications, cache enabled")
+        elif message["type"] == "pmessage" and message["data"] not in REMOVAL_EVENTS:
+            self.invalidate(message["channel"].split(":", 1)[1])
+
+    def _disable(self) -> None:
+        if self.enabled:
+            self.stats.resets += 1
+        self.enabled = False
+        self.clear()
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            pubsub = redis_client.pubsub()
+            self._confirmed = 0
+            try:
+                await pubsub.psubscribe(*self._patterns())
+                async for message in pubsub.listen():
+                    self._on_message(message)
+                    delay = 1.0
+            except Exception as e:
+                logger.warning(f"[flag-cache] Keyspace subscription lost: {e}, retrying in {delay:.0f}s")
+            finally:
+                self._disable()
+                await pubsub.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+    async def start(self) -> None:
+        if self.ttl <= 0 or (self._task is not None and not self._task.done()):
+            return
+        if REDIS_MODE == "cluster":
+            # Уведомления в кластере приходят только подписчикам своего узла — без подписки на каждый
+            # узел согласованность не гарантировать, поэтому кэш не включается
+            logger.info("[flag-cache] Disabled in cluster mode")
+            return
+        if REDIS_MODE == "memory":
+            # Флаги и так в памяти процесса
+            return
+        if await self._enable_notifications():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._disable()
+
+
+flag_cache = FlagCache(ttl=config.FLAG_CACHE_TTL, max_size=config.FLAG_CACHE_SIZE)
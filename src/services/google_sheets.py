@@ -1,21 +1,818 @@
+import asyncio
+import hashlib
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
 import gspread
 from google.oauth2.service_account import Credentials
 from datetime import datetime
 from src.utils import config
+from src.services.redis_client import redis_client
+from src.services.sheets_api import AsyncSheetsClient, SheetsApiError, sheet_range
+from src.services.sheets_fake import FakeSpreadsheet
+from src.services.sheets_outbox import OutboxEntry, SheetsOutbox
+from src.services.state_manager import queue_unlock
+from src.utils.logger import setup_logger
+from src.utils.rate_limiter import TokenBucket
+
+logger = setup_logger(__name__)
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
-credentials = Credentials.from_service_account_file(
-    config.GOOGLE_SERVICE_ACCOUNT_FILE, scopes=SCOPES
+SPREADSHEET_ID = config.SPREADSHEET_ID
+
+SHEET_ROW_INDEX_KEY = "sheet_row_index"
+SHEET_ARCHIVED_KEY = "sheet_archived_partitions"
+SHEET_SYNC_HWM_KEY = "sheet_sync_hwm"
+SHEET_SYNC_VERSIONS_KEY = "sheet_sync_versions"
+
+# Отдельный ограниченный пул потоков для gspread, чтобы Sheets не занимал default executor
+sheets_executor = ThreadPoolExecutor(max_workers=config.SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+
+# Лимит запросов под квоту Google (per-user-per-minute): сверх лимита запросы ждут, а не ловят 429
+rate_limiter = TokenBucket(
+    rate_per_minute=config.SHEETS_RATE_PER_MINUTE,
+    capacity=config.SHEETS_RATE_BURST,
+    max_wait=config.SHEETS_RATE_MAX_WAIT
 )
-gc = gspread.authorize(credentials)
 
-SPREADSHEET_ID = config.SPREADSHEET_ID
+SHEET_HEADER = [
+    "Дата", "Время", "user_id", "username", "Категория", "Сообщение",
+    "Ответ", "ID админа", "admin_username", "Статус", "ticket_id"
+]
+STATUS_OPEN = "Ожидает ответа"
+USER_ID_COL = 2   # индекс колонки user_id (C) в строке
+MESSAGE_COL = 5   # индекс колонки текста обращения (F) в строке
+STATUS_COL = 9    # индекс колонки статуса (J) в строке
+TICKET_ID_COL = 10  # индекс колонки ticket_id (K) — защита от дублей при повторной отправке
+
+
+class GspreadSpreadsheet:
+    """
+    Синхронный доступ к таблице через gspread (вызывается из sheets_executor).
+    Интерфейс совпадает с AsyncSheetsClient, поэтому очередь работает с любым из них.
+    """
+
+    def __init__(self, spreadsheet: gspread.Spreadsheet, email: str):
+        self.spreadsheet = spreadsheet
+        self.email = email
+        self._worksheets: Dict[str, gspread.Worksheet] = {}
+
+    def titles(self) -> List[str]:
+        self._worksheets = {ws.title: ws for ws in self.spreadsheet.worksheets()}
+        return list(self._worksheets)
+
+    def add_worksheet(self, title: str, cols: int) -> None:
+        self._worksheets[title] = self.spreadsheet.add_worksheet(title, rows=1000, cols=cols)
+
+    def append_rows(self, title: str, rows: List[list]) -> dict:
+        return self.spreadsheet.values_append(
+            sheet_range(title),
+            params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows}
+        )
+
+    def get_values(self, ranges: List[str]) -> List[List[list]]:
+        data = self.spreadsheet.values_batch_get(ranges)
+        return [value_range.get("values", []) for value_range in data.get("valueRanges", [])]
+
+    def batch_update(self, data: List[dict]) -> dict:
+        return self.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": data})
+
+    def protect(self, title: str, editor_email: Optional[str] = None) -> None:
+        if title not in self._worksheets:
+            self.titles()
+        self.spreadsheet.batch_update({
+            "requests": [{"addProtectedRange": {"protectedRange": {
+                "range": {"sheetId": self._worksheets[title].id},
+                "description": "Архив обращений",
+                "editors": {"users": [editor_email or self.email]},
+            }}}]
+        })
+
+
+Spreadsheet = Union[GspreadSpreadsheet, AsyncSheetsClient, FakeSpreadsheet]
+
+
+class SheetsConnection:
+    """
+    Ленивое подключение к таблице через gspread или асинхронный AsyncSheetsClient (backend="aiohttp").
+    Авторизация и открытие таблицы выполняются в фоне после старта бота,
+    с повторами и экспоненциальной задержкой, поэтому недоступность Google не мешает запуску.
+    """
+
+    def __init__(self, backend: str = "gspread", initial_delay: float = 1.0, max_delay: float = 60.0):
+        self.backend = backend
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.spreadsheet: Optional[Spreadsheet] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @staticmethod
+    def _open_spreadsheet() -> GspreadSpreadsheet:
+        credentials = Credentials.from_service_account_file(
+            config.GOOGLE_SERVICE_ACCOUNT_FILE, scopes=SCOPES
+        )
+        gc = gspread.authorize(credentials)
+        return GspreadSpreadsheet(gc.open_by_key(SPREADSHEET_ID), credentials.service_account_email)
+
+    async def _open(self) -> Spreadsheet:
+        if self.backend == "fake":
+            # Таблица в памяти для локального запуска без доступа к Google
+            return FakeSpreadsheet()
+        if self.backend == "aiohttp":
+            return await AsyncSheetsClient(
+                config.GOOGLE_SERVICE_ACCOUNT_FILE, SPREADSHEET_ID, SCOPES,
+                pool_size=config.SHEETS_MAX_WORKERS
+            ).open()
+        return await asyncio.get_running_loop().run_in_executor(sheets_executor, self._open_spreadsheet)
+
+    def use(self, spreadsheet: Spreadsheet) -> None:
+        """Подключить готовый объект таблицы (например, фейковый бэкенд в тестах)"""
+        self.spreadsheet = spreadsheet
+        self._ready.set()
+
+    async def connect(self) -> None:
+        delay = self.initial_delay
+        attempt = 1
+        while not self.ready:
+            started = time.perf_counter()
+            try:
+                self.use(await self._open())
+                logger.info(f"[sheets] Connected to spreadsheet in {time.perf_counter() - started:.2f}s (attempt {attempt})")
+            except Exception as e:
+                logger.warning(f"[sheets] Connection attempt {attempt} failed: {e}. Retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+                attempt += 1
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.connect())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if isinstance(self.spreadsheet, AsyncSheetsClient):
+            await self.spreadsheet.close()
+
+    async def get_spreadsheet(self) -> Spreadsheet:
+        await self._ready.wait()
+        return self.spreadsheet
+
+
+connection = SheetsConnection(backend=config.SHEETS_BACKEND)
+
+
+@dataclass
+class SheetsStats:
+    """Счётчики обращений к Sheets API"""
+    api_calls: int = 0
+    throttled: int = 0  # ответы 429 от Google
+    rows_appended: int = 0
+    rows_closed: int = 0
+    manual_closes: int = 0  # обращения, закрытые админами прямо в таблице
 
-sh = gc.open_by_key(SPREADSHEET_ID)
-worksheet = sh.sheet1
+    @property
+    def calls_per_ticket(self) -> float:
+        """Среднее число вызовов API на одну операцию с обращением (создание или закрытие)"""
+        operations = self.rows_appended + self.rows_closed
+        return self.api_calls / operations if operations else 0.0
+
+
+stats = SheetsStats()
+
+
+async def _sheets_call(method: str, *args):
+    """
+    Вызвать метод таблицы: у AsyncSheetsClient — напрямую, у gspread — в sheets_executor.
+    Перед вызовом берётся токен из rate_limiter; вызов учитывается в статистике.
+    """
+    spreadsheet = await connection.get_spreadsheet()
+    await rate_limiter.acquire()
+    stats.api_calls += 1
+    func = getattr(spreadsheet, method)
+    try:
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args)
+        return await asyncio.get_running_loop().run_in_executor(sheets_executor, func, *args)
+    except (gspread.exceptions.APIError, SheetsApiError) as e:
+        if e.code == 429:
+            stats.throttled += 1
+        raise
+
+
+def _first_row_from_range(updated_range: str) -> Optional[int]:
+    """'Лист1'!A12:J14 -> 12"""
+    match = re.search(r"![A-Z]+(\d+)", updated_range or "")
+    return int(match.group(1)) if match else None
+
+
+class SheetPartitions:
+    """
+    Разбиение обращений по листам: один лист на месяц ("month") или полугодие ("semester").
+    В режиме "none" всё пишется в первый лист, как раньше.
+    Архивные листы защищаются от правок и больше не читаются при пересборке индекса.
+    """
+
+    def __init__(self, mode: str = "month", prefix: str = "Обращения", archived_key: str = SHEET_ARCHIVED_KEY):
+        self.mode = mode
+        self.prefix = prefix
+        self.archived_key = archived_key
+        self._titles: Optional[List[str]] = None
+
+    def title_for(self, date_str: str) -> Optional[str]:
+        """Название листа для даты 'YYYY-MM-DD' (None в режиме "none")"""
+        if self.mode == "none":
+            return None
+        year, month = date_str[:4], int(date_str[5:7])
+        if self.mode == "semester":
+            return f"{self.prefix} {year}-H{1 if month <= 6 else 2}"
+        return f"{self.prefix} {year}-{month:02d}"
+
+    async def titles(self, refresh: bool = False) -> List[str]:
+        if self._titles is None or refresh:
+            self._titles = await _sheets_call("titles")
+        return self._titles
+
+    async def resolve(self, date_str: str) -> str:
+        """Лист для новой строки; при необходимости создаётся с заголовком"""
+        title = self.title_for(date_str)
+        titles = await self.titles()
+        if title is None:
+            return titles[0]
+        if title not in titles:
+            titles = await self.titles(refresh=True)
+            if title not in titles:
+                await _sheets_call("add_worksheet", title, len(SHEET_HEADER))
+                # Заголовок — отдельным вызовом через _sheets_call, чтобы его учли лимитер и статистика
+                await _sheets_call("append_rows", title, [SHEET_HEADER])
+                titles.append(title)
+                logger.info(f"[sheets] Created partition '{title}'")
+        return title
+
+    def partitions(self, titles: List[str]) -> List[str]:
+        return sorted(t for t in titles if t.startswith(f"{self.prefix} "))
+
+    async def active_titles(self) -> List[str]:
+        """Листы, в которых могут быть открытые обращения"""
+        titles = await self.titles()
+        if self.mode == "none":
+            return titles[:1]
+        archived = await redis_client.smembers(self.archived_key)
+        # Первый лист — общий лист из времён до разбиения, в нём тоже могут оставаться открытые обращения
+        active = [titles[0]] if titles and titles[0] not in archived else []
+        active += [t for t in self.partitions(titles) if t not in archived and t not in active]
+        return active
+
+    async def archive(self, keep: int = 2) -> List[str]:
+        """Заморозить все разделы, кроме keep последних; возвращает заархивированные листы"""
+        titles = await self.titles(refresh=True)
+        archived = await redis_client.smembers(self.archived_key)
+        candidates = self.partitions(titles)[:-keep] if keep else self.partitions(titles)
+        frozen = []
+        for title in candidates:
+            if title in archived:
+                continue
+            await _sheets_call("protect", title)
+            await redis_client.sadd(self.archived_key, title)
+            frozen.append(title)
+            logger.info(f"[sheets] Partition '{title}' archived")
+        return frozen
+
+
+partitions = SheetPartitions(mode=config.SHEETS_PARTITION)
+
+
+class SheetRowIndex:
+    """
+    Индекс открытых обращений в Redis: user_id -> лист и номер строки ("Лист!12").
+    Позволяет закрывать обращение прямой записью в строку без чтения листов.
+    """
+
+    def __init__(self, key: str = SHEET_ROW_INDEX_KEY):
+        self.key = key
+
+    @staticmethod
+    def _parse(value) -> Optional[Tuple[str, int]]:
+        if not value:
+            return None
+        title, sep, row = value.rpartition("!")
+        if not sep:
+            # Запись старого формата (только номер строки) — индекс будет пересобран
+            return None
+        return title, int(row)
+
+    async def get(self, user_id) -> Optional[Tuple[str, int]]:
+        return self._parse(await redis_client.hget(self.key, str(user_id)))
+
+    async def get_many(self, user_ids: List[str]) -> List[Optional[Tuple[str, int]]]:
+        values = await redis_client.hmget(self.key, [str(u) for u in user_ids])
+        return [self._parse(value) for value in values]
+
+    async def add_rows(self, title: str, first_row: int, rows: List[list]) -> None:
+        """Запомнить строки, только что дописанные на лист title начиная с first_row"""
+        mapping = {
+            str(row[USER_ID_COL]): f"{title}!{first_row + offset}"
+            for offset, row in enumerate(rows)
+            if row[STATUS_COL] == STATUS_OPEN
+        }
+        if mapping:
+            await redis_client.hset(self.key, mapping=mapping)
+
+    async def remove(self, *user_ids) -> None:
+        if user_ids:
+            await redis_client.hdel(self.key, *(str(u) for u in user_ids))
+
+    async def rebuild(self) -> int:
+        """Пересобрать индекс одним чтением всех неархивных листов"""
+        titles = await partitions.active_titles()
+        sheets = await _sheets_call("get_values", [sheet_range(t) for t in titles]) if titles else []
+        mapping: Dict[str, str] = {}
+        for title, values in zip(titles, sheets):
+            for idx, row in enumerate(values[1:], start=2):
+                if len(row) > STATUS_COL and row[STATUS_COL].strip() == STATUS_OPEN:
+                    mapping[row[USER_ID_COL].strip()] = f"{title}!{idx}"
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key)
+            if mapping:
+                pipe.hset(self.key, mapping=mapping)
+            await pipe.execute()
+
+        logger.info(f"[sheets] Row index rebuilt from {len(titles)} sheets: {len(mapping)} open tickets")
+        return len(mapping)
+
+
+row_index = SheetRowIndex()
+
+
+async def read_feedback_rows() -> List[Tuple[str, int, list]]:
+    """Все строки обращений со всех листов, включая архивные: [(лист, номер строки, строка), ...]"""
+    titles = await partitions.titles(refresh=True)
+    sheets = await _sheets_call("get_values", [sheet_range(t) for t in titles]) if titles else []
+    return [
+        (title, idx, row)
+        for title, values in zip(titles, sheets)
+        for idx, row in enumerate(values[1:], start=2)
+    ]
 
-def append_feedback_to_sheet(
+
+@dataclass
+class SheetOp:
+    """Отложенная операция с таблицей: 'append' (row) или 'close' (user_id + новые значения)"""
+    kind: str
+    op_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    row: Optional[list] = None
+    user_id: Optional[str] = None
+    date_str: str = ""
+    time_str: str = ""
+    answer_text: str = ""
+    admin_id: str = ""
+    admin_username: str = ""
+    new_status: str = ""
+
+    def payload(self) -> dict:
+        data = asdict(self)
+        del data["kind"], data["op_id"]
+        return data
+
+    @classmethod
+    def from_entry(cls, entry: OutboxEntry) -> "SheetOp":
+        return cls(kind=entry.kind, op_id=entry.op_id, **entry.payload)
+
+
+class TicketRowNotFound(Exception):
+    """Для закрытия нет открытой строки обращения ни на одном неархивном листе"""
+
+
+def _close_ranges(title: str, row: int, op: SheetOp) -> List[dict]:
+    """Диапазоны строки, которые меняются при закрытии обращения"""
+    return [
+        {"range": sheet_range(title, f"A{row}:B{row}"), "values": [[op.date_str, op.time_str]]},  # Дата, Время
+        {
+            "range": sheet_range(title, f"G{row}:J{row}"),  # Ответ, ID админа, admin_username, Статус
+            "values": [[op.answer_text, str(op.admin_id), op.admin_username, op.new_status]]
+        },
+    ]
+
+
+class SheetsWriteQueue:
+    """
+    Write-behind очередь изменений таблицы поверх локального журнала (SheetsOutbox).
+    Операции сначала сохраняются на диск, затем фоновый воркер раз в flush_interval секунд
+    (или при накоплении max_batch штук) отправляет подряд идущие добавления одним append_rows,
+    а закрытия — одним batch_update. Порядок операций сохраняется, поэтому закрытие всегда
+    идёт после добавления своей строки. Пока таблица недоступна, операции копятся в журнале
+    и отправляются с экспоненциальной задержкой между попытками.
+    """
+
+    def __init__(
+        self, outbox: SheetsOutbox, flush_interval: float = 2.0,
+        max_batch: int = 50, max_retry_delay: float = 60.0, max_close_attempts: int = 5
+    ):
+        self.outbox = outbox
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retry_delay = max_retry_delay
+        self.max_close_attempts = max_close_attempts
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        """Сколько операций ждёт отправки"""
+        return self.outbox.depth
+
+    @asynccontextmanager
+    async def exclusive(self):
+        """
+        Пока блок выполняется, очередь ничего не пишет в таблицу и не меняет индекс строк:
+        начавшийся сброс дописывает свою партию, следующий ждёт выхода из блока
+        """
+        async with self._flush_lock:
+            yield
+
+    async def put(self, op: SheetOp) -> None:
+        await self.outbox.add(op.op_id, op.kind, op.payload())
+        if self.depth >= self.max_batch:
+            self._full.set()
+
+    def _next_batch(self, entries: List[OutboxEntry]) -> List[OutboxEntry]:
+        """Подряд идущие операции одного вида"""
+        kind = entries[0].kind
+        batch = []
+        for entry in entries:
+            if entry.kind != kind:
+                break
+            batch.append(entry)
+        return batch
+
+    async def _skip_written(self, title: str, batch: List[SheetOp]) -> List[SheetOp]:
+        """
+        Предыдущая попытка могла дойти до таблицы (таймаут, падение до подтверждения).
+        Строки, чей ticket_id уже есть на листе, не дописываем повторно.
+        """
+        letter = chr(ord("A") + TICKET_ID_COL)
+        column, = await _sheets_call("get_values", [sheet_range(title, f"{letter}:{letter}")])
+        positions = {row[0]: idx for idx, row in enumerate(column, start=1) if row}
+
+        for op in batch:
+            if op.op_id in positions:
+                logger.info(f"[sheets] Op {op.op_id} already in '{title}' at row {positions[op.op_id]}, skipping")
+                await row_index.add_rows(title, positions[op.op_id], [op.row])
+        return [op for op in batch if op.op_id not in positions]
+
+    async def _append(self, batch: List[SheetOp], retried: bool) -> None:
+        # Строки попадают в раздел по дате создания, даже если отправляются позже
+        by_title: Dict[str, List[SheetOp]] = {}
+        for op in batch:
+            title = await partitions.resolve(op.row[0])
+            by_title.setdefault(title, []).append(op)
+
+        for title, ops in by_title.items():
+            if retried:
+                ops = await self._skip_written(title, ops)
+                if not ops:
+                    continue
+
+            rows = [op.row for op in ops]
+            response = await _sheets_call("append_rows", title, rows)
+            stats.rows_appended += len(rows)
+
+            first_row = _first_row_from_range(
+                (response or {}).get("updates", {}).get("updatedRange", "")
+            )
+            if first_row is not None:
+                await row_index.add_rows(title, first_row, rows)
+            else:
+                logger.warning("[sheets] append_rows returned no range, row index not updated")
+
+    async def _close(self, batch: List[SheetOp], attempts: List[int]) -> List[SheetOp]:
+        """
+        Записать закрытия, чьи строки нашлись; возвращает те, что остаются в журнале до следующей
+        попытки. Строки может ещё не быть в индексе (его пересобрали до добавления строки,
+        добавление ответило без диапазона), поэтому закрытие без строки не отбрасывается сразу,
+        а ждёт max_close_attempts попыток сброса.
+        """
+        user_ids = [op.user_id for op in batch]
+        rows = await row_index.get_many(user_ids)
+        if any(row is None for row in rows):
+            # Индекс пуст или устарел — пересобираем одним чтением неархивных листов
+            await row_index.rebuild()
+            rows = await row_index.get_many(user_ids)
+
+        data = []
+        closed = []
+        waiting = []
+        for op, location, attempt in zip(batch, rows, attempts):
+            if location is not None:
+                data.extend(_close_ranges(*location, op))
+                closed.append(op.user_id)
+            elif attempt + 1 < self.max_close_attempts:
+                waiting.append(op)
+            else:
+                logger.warning(
+                    f"[sheets] No open ticket row for user {op.user_id} after {attempt + 1} attempts, dropping close"
+                )
+
+        # Повторное закрытие идемпотентно: те же значения пишутся в ту же строку
+        if data:
+            await _sheets_call("batch_update", data)
+            stats.rows_closed += len(closed)
+            await row_index.remove(*closed)
+        return waiting
+
+    async def flush(self) -> int:
+        """
+        Отправить всё накопленное по порядку. Операция удаляется из журнала только после
+        успешной записи; при ошибке сброс останавливается, чтобы не нарушить порядок.
+        Закрытие, для которого не нашлось строки, тоже остаётся в журнале и останавливает сброс
+        (TicketRowNotFound) — очередь повторит его с обычной задержкой.
+        """
+        if not connection.ready:
+            # Подключение ещё не установлено — операции подождут в журнале
+            return 0
+
+        written = 0
+        async with self.exclusive():
+            while True:
+                entries = await self.outbox.peek(self.max_batch)
+                if not entries:
+                    break
+
+                batch = self._next_batch(entries)
+                ids = [entry.id for entry in batch]
+                ops = [SheetOp.from_entry(entry) for entry in batch]
+                retried = any(entry.attempts for entry in batch)
+
+                await self.outbox.mark_attempt(ids)
+                waiting: List[SheetOp] = []
+                try:
+                    if batch[0].kind == "append":
+                        await self._append(ops, retried)
+                    else:
+                        waiting = await self._close(ops, [entry.attempts for entry in batch])
+                except Exception as e:
+                    await self.outbox.record_error(ids, str(e))
+                    raise
+
+                kept = {op.op_id for op in waiting}
+                if len(kept) < len(batch):
+                    await self.outbox.ack([entry.id for entry in batch if entry.op_id not in kept])
+                written += len(batch) - len(kept)
+                if kept:
+                    error = f"No open ticket row for users {', '.join(op.user_id for op in waiting)}"
+                    await self.outbox.record_error([entry.id for entry in batch if entry.op_id in kept], error)
+                    raise TicketRowNotFound(error)
+        if written:
+            logger.info(
+                f"[sheets] Flushed {written} ops, queue depth={self.depth}, "
+                f"api calls per ticket={stats.calls_per_ticket:.2f}"
+            )
+        return written
+
+    async def _run(self) -> None:
+        await self.outbox.open()
+        delay = self.flush_interval
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+                delay = self.flush_interval
+            except Exception as e:
+                # Операции остаются в журнале; следующая попытка — с увеличенной задержкой
+                delay = min(delay * 2, self.max_retry_delay)
+                logger.error(f"[sheets] Failed to flush {self.depth} ops: {e}. Retrying in {delay:.0f}s")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновый сброс и дописать хвост журнала (вызывается при завершении бота)"""
+        self._closing = True
+        self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"[sheets] Final flush failed: {e}")
+        if self.depth:
+            logger.warning(f"[sheets] {self.depth} ops remain in the outbox and will be replayed on next start")
+        await self.outbox.close()
+
+
+outbox = SheetsOutbox(config.SHEETS_OUTBOX_PATH, max_entries=config.SHEETS_OUTBOX_MAX_ENTRIES)
+
+write_queue = SheetsWriteQueue(
+    outbox,
+    flush_interval=config.SHEETS_FLUSH_INTERVAL,
+    max_batch=config.SHEETS_BATCH_SIZE,
+    max_close_attempts=config.SHEETS_CLOSE_MAX_ATTEMPTS
+)
+
+
+def _row_version(row: list) -> str:
+    """Короткий хэш содержимого строки — по нему видно, правили ли её в таблице"""
+    return hashlib.blake2b("\x1f".join(row).encode(), digest_size=8).hexdigest()
+
+
+class SheetsSync:
+    """
+    Обратная синхронизация: подхватывает правки, которые админы вносят прямо в таблицу.
+    Весь лист не перечитывается — за один опрос одним get_values читаются:
+    - строки открытых обращений из индекса (не больше max_rows, по кругу);
+    - хвост каждого неархивного листа после high-water mark (не больше tail_rows строк).
+    Для строк из индекса хранится хэш содержимого, и разбираются только изменившиеся.
+    Если статус сменился с "Ожидает ответа", обращение считается закрытым вручную:
+    пользователь разблокируется, строка убирается из индекса. Закрытия самого бота
+    (из очереди записи) ручными не считаются — см. _confirm_manual_closes.
+    """
+
+    def __init__(
+        self, interval: float = 60.0, tail_rows: int = 200, max_rows: int = 200,
+        hwm_key: str = SHEET_SYNC_HWM_KEY, versions_key: str = SHEET_SYNC_VERSIONS_KEY
+    ):
+        self.interval = interval
+        self.tail_rows = tail_rows
+        self.max_rows = max_rows
+        self.hwm_key = hwm_key
+        self.versions_key = versions_key
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _pick_rows(self, rows: List[Tuple[str, str, int]]) -> List[Tuple[str, str, int]]:
+        """Очередная порция строк из индекса (user_id, лист, строка): не больше max_rows, по кругу"""
+        if len(rows) <= self.max_rows:
+            self._cursor = 0
+            return rows
+        start = self._cursor % len(rows)
+        self._cursor = start + self.max_rows
+        return (rows + rows)[start:start + self.max_rows]
+
+    async def poll(self) -> int:
+        """Один проход синхронизации; возвращает, сколько обращений закрыто вручную"""
+        if not connection.ready:
+            return 0
+
+        titles = await partitions.active_titles()
+        indexed = await redis_client.hgetall(row_index.key)
+        hwm = await redis_client.hgetall(self.hwm_key)
+        versions = await redis_client.hgetall(self.versions_key)
+
+        open_rows = []
+        for user_id, value in indexed.items():
+            location = SheetRowIndex._parse(value)
+            if location is not None:
+                open_rows.append((user_id, *location))
+        open_rows.sort(key=lambda item: (item[1], item[2]))
+        picked = self._pick_rows(open_rows)
+        tails = []
+        for title in titles:
+            # Без отметки начинаем с последней известной открытой строки листа
+            known = [row for _, t, row in open_rows if t == title]
+            start = int(hwm.get(title) or max(known, default=1)) + 1
+            tails.append((title, start))
+
+        ranges = [sheet_range(title, f"A{start}:K{start + self.tail_rows - 1}") for title, start in tails]
+        ranges += [sheet_range(title, f"A{row}:K{row}") for _, title, row in picked]
+        if not ranges:
+            return 0
+        values = await _sheets_call("get_values", ranges)
+        tail_values, row_values = values[:len(tails)], values[len(tails):]
+
+        closed: List[str] = []
+        new_versions: Dict[str, str] = {}
+        new_hwm: Dict[str, int] = {}
+        reindex: Dict[str, str] = {}
+        stale = False
+
+        for (user_id, title, row), found in zip(picked, row_values):
+            location = f"{title}!{row}"
+            cells = found[0] if found else []
+            if len(cells) <= USER_ID_COL or cells[USER_ID_COL].strip() != user_id:
+                # Строки сдвинули (сортировка, удаление) — индекс больше не соответствует листу
+                stale = True
+                continue
+            version = _row_version(cells)
+            if versions.get(location) == version:
+                continue
+            status = cells[STATUS_COL].strip() if len(cells) > STATUS_COL else ""
+            if status == STATUS_OPEN:
+                new_versions[location] = version
+            else:
+                closed.append(user_id)
+
+        for (title, start), rows in zip(tails, tail_values):
+            new_hwm[title] = start + len(rows) - 1
+            for offset, cells in enumerate(rows):
+                # Открытые строки, которых нет в индексе (добавлены вручную или индекс отстал)
+                if len(cells) > STATUS_COL and cells[STATUS_COL].strip() == STATUS_OPEN:
+                    user_id = cells[USER_ID_COL].strip()
+                    if user_id and user_id not in indexed:
+                        reindex[user_id] = f"{title}!{start + offset}"
+
+        # Пока очередь приостановлена, она не запишет в таблицу закрытие и не поменяет индекс
+        async with write_queue.exclusive():
+            if closed:
+                closed = await self._confirm_manual_closes(closed, indexed)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                if closed:
+                    pipe.hdel(row_index.key, *closed)
+                    pipe.hdel(self.versions_key, *(indexed[u] for u in closed))
+                    queue_unlock(pipe, closed)
+                if reindex:
+                    pipe.hset(row_index.key, mapping=reindex)
+                if new_versions:
+                    pipe.hset(self.versions_key, mapping=new_versions)
+                if new_hwm:
+                    pipe.hset(self.hwm_key, mapping=new_hwm)
+                await pipe.execute()
+
+        if closed:
+            stats.manual_closes += len(closed)
+            logger.info(f"[sheets-sync] Tickets closed in the sheet by hand, users unlocked: {', '.join(closed)}")
+        if stale:
+            await row_index.rebuild()
+            await redis_client.delete(self.versions_key)
+        return len(closed)
+
+    async def _confirm_manual_closes(self, closed: List[str], indexed: Dict[str, str]) -> List[str]:
+        """
+        Между чтением индекса и get_values очередь записи могла сама закрыть обращение:
+        тогда строка уже убрана из индекса (или указывает на новое обращение пользователя),
+        либо закрытие ещё в журнале. Такие строки не ручные — лок пользователя не трогаем,
+        иначе можно снять лок только что открытого обращения.
+        """
+        current = await redis_client.hmget(row_index.key, closed)
+        entries = await write_queue.outbox.peek(max(write_queue.depth, 1))
+        pending = {str(entry.payload.get("user_id")) for entry in entries if entry.kind == "close"}
+        confirmed = [
+            user_id for user_id, location in zip(closed, current)
+            if location == indexed[user_id] and user_id not in pending
+        ]
+        if len(confirmed) < len(closed):
+            skipped = sorted(set(closed) - set(confirmed))
+            logger.info(f"[sheets-sync] Rows closed by the bot itself, not unlocking: {', '.join(skipped)}")
+        return confirmed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"[sheets-sync] Poll failed: {e}")
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+sheets_sync = SheetsSync(
+    interval=config.SHEETS_SYNC_INTERVAL,
+    tail_rows=config.SHEETS_SYNC_TAIL_ROWS,
+    max_rows=config.SHEETS_SYNC_MAX_ROWS
+)
+
+
+async def append_feedback_to_sheet(
     user_id, username, category, message_text,
     answer_text="", admin_id="", admin_username="", status="Ожидает ответа",
     is_named=True
@@ -41,27 +838,28 @@ def append_feedback_to_sheet(
         status
     ]
 
-    worksheet.append_row(row)
+    op = SheetOp(kind="append")
+    row.append(op.op_id)  # ticket_id
+    op.row = row
+    await write_queue.put(op)
 
-def update_feedback_in_sheet(
+async def update_feedback_in_sheet(
     user_id, answer_text, admin_id,
     admin_username="", new_status="Вопрос закрыт"
 ):
+    """
+    Поставить закрытие обращения в очередь. Строка ищется по индексу при сбросе,
+    несколько закрытий подряд уходят одним batch_update.
+    """
     now = datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
-    time_str = now.strftime("%H:%M:%S")
-
-    all_records = worksheet.get_all_records()
-
-    for idx, record in enumerate(all_records, start=2):
-        if str(record.get('user_id', '')).strip() == str(user_id) and record.get('Статус', '').strip() == "Ожидает ответа":
-            worksheet.update(f'A{idx}', [[date_str]])           # Дата
-            worksheet.update(f'B{idx}', [[time_str]])           # Время
-            worksheet.update(f'G{idx}', [[answer_text]])        # Ответ
-            worksheet.update(f'H{idx}', [[str(admin_id)]])      # ID админа
-            worksheet.update(f'I{idx}', [[admin_username]])     # admin_username 
-            worksheet.update(f'J{idx}', [[new_status]])         # Статус
-            return True
-
-    return False
 
+    await write_queue.put(SheetOp(
+        kind="close",
+        user_id=str(user_id),
+        date_str=now.strftime("%Y-%m-%d"),
+        time_str=now.strftime("%H:%M:%S"),
+        answer_text=answer_text,
+        admin_id=str(admin_id),
+        admin_username=admin_username,
+        new_status=new_status
+    ))
@@ -1,11 +1,11 @@
 from aiogram.types import InputMediaPhoto, CallbackQuery
 from aiogram.types.input_file import FSInputFile
 from aiogram.exceptions import TelegramBadRequest
-import json
 
 from src.utils.helpers import handle_bot_user, get_keyboard_for_category
 from src.utils.categories import CategoryInfo, CATEGORIES, START_INFO
 from src.services.state_manager import StateManager
+from src.utils.fingerprint import screen_fingerprint
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -19,9 +19,7 @@ async def send_fresh_menu(bot, user_id, info: CategoryInfo, keyboard):
     await state.save_state(
         image_message_id=image_msg.message_id,
         menu_message_id=text_msg.message_id,
-        last_text=info.text,
-        last_image=info.image,
-        last_keyboard=json.dumps(keyboard.model_dump())
+        **screen_fingerprint(info.text, info.image, keyboard)
     )
 
     logger.info(f"[menu] Sent fresh menu to user {user_id}")
@@ -40,7 +38,8 @@ async def _process_category_selection(bot, user_id, info: CategoryInfo, disabled
     prev_keyboard = state_data.get("last_keyboard", "")
 
     keyboard = get_keyboard_for_category(info, disabled_category)
-    keyboard_str = json.dumps(keyboard.model_dump())
+    # В состоянии лежат хэши текста и клавиатуры — сравниваем хэши, а не сериализованные строки
+    screen = screen_fingerprint(info.text, info.image, keyboard)
 
     if image_msg_id and info.image != prev_image:
         try:
@@ -58,7 +57,7 @@ async def _process_category_selection(bot, user_id, info: CategoryInfo, disabled
     else:
         logger.debug(f"[image] Skipped update for user {user_id} (same image)")
 
-    if text_msg_id and (info.text != prev_text or keyboard_str != prev_keyboard):
+    if text_msg_id and (screen["last_text"] != prev_text or screen["last_keyboard"] != prev_keyboard):
         try:
             await bot.edit_message_text(
                 chat_id=user_id,
@@ -78,11 +77,7 @@ async def _process_category_selection(bot, user_id, info: CategoryInfo, disabled
     if not image_msg_id or not text_msg_id:
         await send_fresh_menu(bot, user_id, info, keyboard)
     else:
-        await state.save_state(
-            last_text=info.text,
-            last_image=info.image,
-            last_keyboard=keyboard_str
-        )
+        await state.save_state(**screen)
 
 
 async def handle_category_selection(callback: CallbackQuery, data: str):
@@ -1,19 +1,83 @@
 import os
 import redis.asyncio as redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.sentinel import Sentinel
 
+# standalone — один узел REDIS_HOST:REDIS_PORT; sentinel — мастер REDIS_SENTINEL_MASTER,
+# адрес которого спрашивается у REDIS_SENTINELS (переживает переключение мастера);
+# cluster — Redis Cluster, стартовые узлы REDIS_CLUSTER_NODES (или REDIS_HOST:REDIS_PORT);
+# memory — без сервера: хранилище в памяти процесса (state_backend.MemoryBackend), для одного
+# экземпляра бота и тестов, данные теряются при перезапуске
+REDIS_MODE = os.getenv("REDIS_MODE", "standalone")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD") or None
+REDIS_SENTINELS = os.getenv("REDIS_SENTINELS", "")
+REDIS_SENTINEL_MASTER = os.getenv("REDIS_SENTINEL_MASTER", "mymaster")
+REDIS_CLUSTER_NODES = os.getenv("REDIS_CLUSTER_NODES", "")
 
-redis_client = redis.Redis(
-    host=REDIS_HOST,    
-    port=REDIS_PORT,
-    db=0,
-    decode_responses=True
-)
+if REDIS_MODE not in ("standalone", "sentinel", "cluster", "memory"):
+    raise ValueError("REDIS_MODE должен быть 'standalone', 'sentinel', 'cluster' или 'memory', проверь .env файл.")
 
-FEEDBACK_LOCK_KEY = "feedback_lock:{user_id}"
-USER_STATE_KEY = "user_state:{user_id}"
-FEEDBACK_TYPE_KEY = "feedback_type:{user_id}"
+if REDIS_MODE == "cluster" and REDIS_DB != 0:
+    raise ValueError("В Redis Cluster есть только база 0 — убери REDIS_DB, проверь .env файл.")
+
+
+def parse_nodes(value: str) -> list:
+    """"host1:26379,host2:26379" -> [("host1", 26379), ("host2", 26379)]"""
+    nodes = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        host, _, port = item.rpartition(":")
+        nodes.append((host, int(port)))
+    return nodes
+
+
+class ClusterClient(RedisCluster):
+    """
+    В Redis Cluster нет MULTI/EXEC через pipeline, поэтому pipeline(transaction=True)
+    выполняется без транзакции: команды одного пользователя всё равно уходят на один узел
+    (ключи с хэш-тегом {user_id}), а атомарность там, где она нужна, дают Lua-скрипты.
+    """
+
+    def pipeline(self, transaction=None, shard_hint=None):
+        return super().pipeline()
+
+
+def create_client():
+    if REDIS_MODE == "memory":
+        from src.services.state_backend import MemoryBackend
+        return MemoryBackend()
+    if REDIS_MODE == "sentinel":
+        if not REDIS_SENTINELS:
+            raise ValueError("Для REDIS_MODE=sentinel нужен REDIS_SENTINELS (host:port,...), проверь .env файл.")
+        sentinel = Sentinel(parse_nodes(REDIS_SENTINELS), sentinel_kwargs={"password": REDIS_PASSWORD})
+        return sentinel.master_for(
+            REDIS_SENTINEL_MASTER, db=REDIS_DB, password=REDIS_PASSWORD, decode_responses=True
+        )
+    if REDIS_MODE == "cluster":
+        nodes = parse_nodes(REDIS_CLUSTER_NODES) or [(REDIS_HOST, REDIS_PORT)]
+        return ClusterClient(
+            startup_nodes=[ClusterNode(host, port) for host, port in nodes],
+            password=REDIS_PASSWORD,
+            decode_responses=True
+        )
+    return redis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        password=REDIS_PASSWORD,
+        decode_responses=True
+    )
+
+
+redis_client = create_client()
+
+# Ключи одного пользователя — с хэш-тегом {user_id}: в кластере они лежат в одном слоте,
+# поэтому pipeline и Lua-скрипты над ними работают и там
+FEEDBACK_LOCK_KEY = "feedback_lock:{{{user_id}}}"
+USER_STATE_KEY = "user_state:{{{user_id}}}"
+FEEDBACK_TYPE_KEY = "feedback_type:{{{user_id}}}"
 
 async def can_create_new_feedback(user_id: int) -> bool:
     key = FEEDBACK_LOCK_KEY.format(user_id=user_id)
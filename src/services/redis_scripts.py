@@ -0,0 +1,352 @@
+from redis.crc import key_slot
+from redis.exceptions import NoScriptError
+
+from src.services.redis_client import redis_client
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Проверка перед созданием обращения: блокировка, открытое обращение и (по флагу) захват лока.
+# KEYS[1] = blocked:{id}, KEYS[2] = feedback_lock:{id}
+# ARGV[1] = "1", чтобы сразу занять лок, ARGV[2] = время жизни лока в секундах
+ADMISSION_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 'blocked'
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 'locked'
+end
+if ARGV[1] == '1' then
+    redis.call('SET', KEYS[2], '1', 'EX', ARGV[2])
+end
+return 'ok'
+"""
+
+ADMIT_OK = "ok"
+ADMIT_BLOCKED = "blocked"
+ADMIT_LOCKED = "locked"
+
+# Стек навигации — список JSON-записей {"screen", "params"}, внизу всегда главный экран.
+# Общая часть: ключ старого формата (JSON-строка) или пустой стек заменяется корнем,
+# push кладёт экран сверху, не давая стеку вырасти больше max_depth (корень сохраняется).
+NAV_PRELUDE = """
+local function ensure(key, root)
+    local kind = redis.call('TYPE', key).ok
+    if kind ~= 'list' then
+        if kind ~= 'none' then
+            redis.call('DEL', key)
+        end
+        redis.call('RPUSH', key, root)
+    end
+end
+
+local function push(key, entry, max_depth)
+    local depth = redis.call('RPUSH', key, entry)
+    if depth > max_depth then
+        local keep = redis.call('LRANGE', key, depth - max_depth + 1, -1)
+        redis.call('LTRIM', key, 0, 0)
+        redis.call('RPUSH', key, unpack(keep))
+        depth = max_depth
+    end
+    return depth
+end
+"""
+
+# KEYS[1] = nav_stack:{id}; ARGV: запись, max_depth, ttl, корень. Возвращает глубину стека
+NAV_PUSH_LUA = NAV_PRELUDE + """
+ensure(KEYS[1], ARGV[4])
+local depth = push(KEYS[1], ARGV[1], tonumber(ARGV[2]))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return depth
+"""
+
+# KEYS[1] = nav_stack:{id}; ARGV: ttl, корень. Снимает верхний экран (корень не трогает), возвращает новый верх
+NAV_POP_LUA = NAV_PRELUDE + """
+ensure(KEYS[1], ARGV[2])
+if redis.call('LLEN', KEYS[1]) > 1 then
+    redis.call('RPOP', KEYS[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return redis.call('LINDEX', KEYS[1], -1)
+"""
+
+# KEYS[1] = nav_stack:{id}; ARGV: screen, запись, "1" — заменить params найденного экрана, max_depth, ttl, корень.
+# Обрезает стек до экрана screen; если его нет — кладёт запись сверху. Возвращает глубину стека
+NAV_GOTO_LUA = NAV_PRELUDE + """
+ensure(KEYS[1], ARGV[6])
+local depth = 0
+for i, raw in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    local ok, entry = pcall(cjson.decode, raw)
+    if ok and type(entry) == 'table' and entry.screen == ARGV[1] then
+        redis.call('LTRIM', KEYS[1], 0, i - 1)
+        if ARGV[3] == '1' then
+            redis.call('LSET', KEYS[1], i - 1, ARGV[2])
+        end
+        depth = i
+        break
+    end
+end
+if depth == 0 then
+    depth = push(KEYS[1], ARGV[2], tonumber(ARGV[4]))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return depth
+"""
+
+# Сводная раскладка (STATE_LAYOUT=hash, см. state_layout): те же операции над полями хэша user:{id}.
+# Последний аргумент каждого скрипта — "1", если TTL полей ведёт Redis (HEXPIRE), иначе
+# время истечения хранится в поле "~exp:<поле>" и сверяется с TIME сервера.
+HASH_PRELUDE = """
+local native = ARGV[#ARGV] == '1'
+
+local function now()
+    return tonumber(redis.call('TIME')[1])
+end
+
+local function hget(key, field)
+    local value = redis.call('HGET', key, field)
+    if value and not native then
+        local expires = redis.call('HGET', key, '~exp:' .. field)
+        if expires and tonumber(expires) <= now() then
+            redis.call('HDEL', key, field, '~exp:' .. field)
+            return false
+        end
+    end
+    return value
+end
+
+local function hset(key, field, value, ttl)
+    redis.call('HSET', key, field, value)
+    if native then
+        redis.call('HEXPIRE', key, ttl, 'FIELDS', 1, field)
+    else
+        redis.call('HSET', key, '~exp:' .. field, now() + tonumber(ttl))
+    end
+end
+"""
+
+# KEYS[1] = user:{id}; ARGV: поле, значение, TTL поля в секундах, время жизни хэша, native
+HASH_SET_LUA = HASH_PRELUDE + """
+hset(KEYS[1], ARGV[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+# KEYS[1] = user:{id}; ARGV: поле, native. Значение поля или nil, если его TTL истёк
+HASH_GET_LUA = HASH_PRELUDE + """
+return hget(KEYS[1], ARGV[1])
+"""
+
+# Блокировка живёт отдельным ключом и в сводной раскладке: у хэша есть TTL простоя,
+# а блокировка без срока не должна пропадать вместе с ним.
+# KEYS[1] = user:{id}, KEYS[2] = blocked:{id}; ARGV: "1" — занять лок, время жизни лока, время жизни хэша, native
+ADMISSION_HASH_LUA = HASH_PRELUDE + """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 'blocked'
+end
+if hget(KEYS[1], '~feedback_lock') then
+    return 'locked'
+end
+if ARGV[1] == '1' then
+    hset(KEYS[1], '~feedback_lock', '1', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return 'ok'
+"""
+
+# Стек навигации в поле "~nav" — JSON-массив; семантика та же, что у списочных скриптов выше.
+# load() возвращает стек (или корень, если поля нет), save() пишет его с TTL и продлевает хэш
+NAV_HASH_PRELUDE = HASH_PRELUDE + """
+local function load(key, root)
+    local raw = hget(key, '~nav')
+    if raw then
+        local ok, stack = pcall(cjson.decode, raw)
+        if ok and type(stack) == 'table' and #stack > 0 then
+            return stack
+        end
+    end
+    return {cjson.decode(root)}
+end
+
+local function save(key, stack, ttl, state_ttl)
+    hset(key, '~nav', cjson.encode(stack), ttl)
+    redis.call('EXPIRE', key, state_ttl)
+end
+
+local function push(stack, entry, max_depth)
+    table.insert(stack, entry)
+    while #stack > max_depth do
+        table.remove(stack, 2)
+    end
+end
+"""
+
+# KEYS[1] = user:{id}; ARGV: запись, max_depth, ttl, корень, время жизни хэша, native. Возвращает глубину стека
+NAV_PUSH_HASH_LUA = NAV_HASH_PRELUDE + """
+local stack = load(KEYS[1], ARGV[4])
+push(stack, cjson.decode(ARGV[1]), tonumber(ARGV[2]))
+save(KEYS[1], stack, ARGV[3], ARGV[5])
+return #stack
+"""
+
+# KEYS[1] = user:{id}; ARGV: ttl, корень, время жизни хэша, native. Возвращает новый стек (JSON-массив)
+NAV_POP_HASH_LUA = NAV_HASH_PRELUDE + """
+local stack = load(KEYS[1], ARGV[2])
+if #stack > 1 then
+    table.remove(stack)
+end
+save(KEYS[1], stack, ARGV[1], ARGV[3])
+return cjson.encode(stack)
+"""
+
+# KEYS[1] = user:{id}; ARGV: screen, запись, "1" — заменить params, max_depth, ttl, корень, время жизни хэша, native
+NAV_GOTO_HASH_LUA = NAV_HASH_PRELUDE + """
+local stack = load(KEYS[1], ARGV[6])
+local depth = 0
+for i, entry in ipairs(stack) do
+    if type(entry) == 'table' and entry.screen == ARGV[1] then
+        for j = #stack, i + 1, -1 do
+            table.remove(stack, j)
+        end
+        if ARGV[3] == '1' then
+            stack[i] = cjson.decode(ARGV[2])
+        end
+        depth = i
+        break
+    end
+end
+if depth == 0 then
+    push(stack, cjson.decode(ARGV[2]), tonumber(ARGV[4]))
+    depth = #stack
+end
+save(KEYS[1], stack, ARGV[5], ARGV[7])
+return depth
+"""
+
+# KEYS[1] = user:{id}. Удаляет поля состояния (без префикса "~"), служебные поля остаются
+CLEAR_STATE_HASH_LUA = """
+local doomed = {}
+for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+    if string.sub(field, 1, 1) ~= '~' then
+        table.insert(doomed, field)
+    end
+end
+if #doomed > 0 then
+    redis.call('HDEL', KEYS[1], unpack(doomed))
+end
+return #doomed
+"""
+
+# register_script вызывает скрипт через EVALSHA и сам подгружает его, если Redis забыл SHA
+admission = redis_client.register_script(ADMISSION_LUA)
+
+nav_push = redis_client.register_script(NAV_PUSH_LUA)
+nav_pop = redis_client.register_script(NAV_POP_LUA)
+nav_goto = redis_client.register_script(NAV_GOTO_LUA)
+
+hash_set = redis_client.register_script(HASH_SET_LUA)
+hash_get = redis_client.register_script(HASH_GET_LUA)
+admission_hash = redis_client.register_script(ADMISSION_HASH_LUA)
+nav_push_hash = redis_client.register_script(NAV_PUSH_HASH_LUA)
+nav_pop_hash = redis_client.register_script(NAV_POP_HASH_LUA)
+nav_goto_hash = redis_client.register_script(NAV_GOTO_HASH_LUA)
+clear_state_hash = redis_client.register_script(CLEAR_STATE_HASH_LUA)
+
+SCRIPTS = {
+    "admission": admission, "nav_push": nav_push, "nav_pop": nav_pop, "nav_goto": nav_goto,
+    "hash_set": hash_set, "hash_get": hash_get, "admission_hash": admission_hash,
+    "nav_push_hash": nav_push_hash, "nav_pop_hash": nav_pop_hash, "nav_goto_hash": nav_goto_hash,
+    "clear_state_hash": clear_state_hash,
+}
+
+
+def queue(pipe, script, keys: list, args: list = ()) -> None:
+    """
+    Поставить вызов скрипта по SHA в pipeline. Через execute_command, а не pipe.evalsha:
+    pipeline Redis Cluster запрещает evalsha, но EVALSHA маршрутизирует по слоту KEYS
+    """
+    pipe.execute_command("EVALSHA", script.sha, len(keys), *keys, *args)
+
+
+async def load_scripts() -> None:
+    """Загрузить все скрипты в кэш Redis при старте, чтобы дальше вызывать их только по SHA"""
+    for name, script in SCRIPTS.items():
+        script.sha = await redis_client.script_load(script.script)
+        logger.info(f"[redis] Script '{name}' loaded, sha={script.sha}")
+
+
+class ScriptPipeline:
+    """
+    Pipeline для команд с EVALSHA. Запоминает поставленные команды (через публичные методы
+    pipeline), чтобы пережить потерю кэша скриптов (перезапуск Redis, переключение мастера).
+    EVALSHA с NOSCRIPT не выполняется, а остальные команды MULTI/EXEC выполняются, поэтому
+    после загрузки скриптов отправляются заново только упавшие вызовы скриптов и идущие
+    после них команды того же слота (того же пользователя) — чтобы сохранить порядок.
+    Команды до первого упавшего скрипта и команды других пользователей не повторяются.
+
+        async with ScriptPipeline(redis_client) as pipe:
+            queue(pipe, nav_push, keys, args)
+            pipe.expire(key, ttl)
+            results = await pipe.execute()
+    """
+
+    def __init__(self, client, transaction: bool = True):
+        self._client = client
+        self._transaction = transaction
+        self._pipe = client.pipeline(transaction=transaction)
+        self._ops: list = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self._pipe, name)
+
+        def record(*args, **kwargs):
+            self._ops.append((name, args, kwargs))
+            method(*args, **kwargs)
+            return self
+        return record
+
+    async def __aenter__(self) -> "ScriptPipeline":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.reset()
+
+    async def reset(self) -> None:
+        self._ops.clear()
+        await self._pipe.reset()
+
+    @staticmethod
+    def _slots(op: tuple) -> set:
+        name, args, _ = op
+        if name == "execute_command" and args[0] == "EVALSHA":
+            keys = args[3:3 + int(args[2])]
+        elif name in ("delete", "exists", "unlink"):
+            keys = args
+        else:
+            keys = args[:1]
+        return {key_slot(str(key).encode()) for key in keys}
+
+    async def execute(self) -> list:
+        ops, self._ops = self._ops, []
+        results = await self._pipe.execute(raise_on_error=False)
+        failed = {i for i, result in enumerate(results) if isinstance(result, NoScriptError)}
+        if failed:
+            resend, slots = [], set()
+            for i in range(min(failed), len(ops)):
+                if i in failed or self._slots(ops[i]) & slots:
+                    slots |= self._slots(ops[i])
+                    resend.append(i)
+            logger.warning(f"[redis] NOSCRIPT in pipeline, reloading scripts and resending {len(resend)} commands")
+            await load_scripts()
+            async with self._client.pipeline(transaction=self._transaction) as pipe:
+                for i in resend:
+                    name, args, kwargs = ops[i]
+                    getattr(pipe, name)(*args, **kwargs)
+                for i, result in zip(resend, await pipe.execute(raise_on_error=False)):
+                    results[i] = result
+        error = next((result for result in results if isinstance(result, Exception)), None)
+        if error is not None:
+            raise error
+        return results
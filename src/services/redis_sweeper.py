@@ -0,0 +1,165 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.services.redis_client import redis_client
+from src.utils import config
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Семейства ключей бота: имя, префикс и TTL, который должен быть у каждого ключа семейства
+# (None — ключи живут без TTL по задумке: индексы таблицы, служебные хэши)
+KEY_FAMILIES: List[Tuple[str, str, Optional[int]]] = [
+    ("user", "user:", config.USER_STATE_TTL),
+    ("user_state", "user_state:", config.USER_STATE_TTL),
+    ("nav_stack", "nav_stack:", config.NAV_STACK_TTL),
+    ("feedback_type", "feedback_type:", None),
+    ("feedback_lock", "feedback_lock:", None),
+    ("blocked", "blocked:", None),
+    ("admin_replying", "admin_replying:", None),
+    ("fsm", "fsm:", None),
+    ("sheets", "sheet", None),
+]
+OTHER_FAMILY = "other"
+
+
+@dataclass
+class FamilyUsage:
+    """Сколько ключей семейства нашёл обход и сколько памяти они занимают"""
+    keys: int = 0
+    sampled: int = 0
+    sampled_bytes: int = 0
+    no_ttl: int = 0  # ключи без TTL там, где он обязателен (остались от старых версий)
+    expired: int = 0  # скольким из них обход выставил TTL
+
+    @property
+    def estimated_bytes(self) -> int:
+        """Оценка памяти семейства по замеренным ключам"""
+        if not self.sampled:
+            return 0
+        return self.sampled_bytes * self.keys // self.sampled
+
+
+@dataclass
+class SweepReport:
+    families: Dict[str, FamilyUsage] = field(default_factory=dict)
+    scanned: int = 0
+    seconds: float = 0.0
+
+    @property
+    def estimated_bytes(self) -> int:
+        return sum(usage.estimated_bytes for usage in self.families.values())
+
+
+def key_family(key: str) -> Tuple[str, Optional[int]]:
+    for name, prefix, ttl in KEY_FAMILIES:
+        if key.startswith(prefix):
+            return name, ttl
+    return OTHER_FAMILY, None
+
+
+class RedisSweeper:
+    """
+    Фоновый обход всех ключей через SCAN (без KEYS и без блокировки Redis):
+    - считает ключи и оценивает память по семействам (MEMORY USAGE на первых samples ключах);
+    - находит ключи user / user_state / nav_stack без TTL, записанные до появления USER_STATE_TTL,
+      и выставляет им TTL, чтобы неактивные пользователи со временем исчезали из Redis.
+    TTL и MEMORY USAGE запрашиваются одним pipeline на каждую порцию SCAN.
+    """
+
+    def __init__(self, interval: float = 3600.0, batch: int = 500, samples: int = 50):
+        self.interval = interval
+        self.batch = batch
+        self.samples = samples
+        self.last_report: Optional[SweepReport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _inspect(self, keys: List[str], report: SweepReport, fix: bool) -> None:
+        families = [key_family(key) for key in keys]
+        measured, pending = [], {}
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, (name, _) in zip(keys, families):
+                usage = report.families.setdefault(name, FamilyUsage())
+                usage.keys += 1
+                pipe.ttl(key)
+                measure = usage.sampled + pending.get(name, 0) < self.samples
+                measured.append(measure)
+                if measure:
+                    pending[name] = pending.get(name, 0) + 1
+                    pipe.memory_usage(key)
+            # MEMORY USAGE бывает запрещён (managed Redis) — тогда память просто не оценивается
+            results = iter(await pipe.execute(raise_on_error=False))
+
+        orphans = []
+        for key, (name, ttl), measure in zip(keys, families, measured):
+            usage = report.families[name]
+            if next(results) == -1 and ttl is not None:
+                usage.no_ttl += 1
+                orphans.append((key, ttl))
+            if measure:
+                usage.sampled += 1
+                size = next(results)
+                usage.sampled_bytes += size if isinstance(size, int) else 0
+
+        if fix and orphans:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, ttl in orphans:
+                    pipe.expire(key, ttl)
+                for (key, _), done in zip(orphans, await pipe.execute()):
+                    if done:
+                        report.families[key_family(key)[0]].expired += 1
+
+    async def sweep(self, fix: bool = True) -> SweepReport:
+        """Один полный проход SCAN; при fix=True ключам без обязательного TTL он выставляется"""
+        started = asyncio.get_running_loop().time()
+        report = SweepReport()
+        keys = []
+        async for key in redis_client.scan_iter(count=self.batch):
+            keys.append(key.decode() if isinstance(key, bytes) else key)
+            if len(keys) >= self.batch:
+                await self._inspect(keys, report, fix)
+                report.scanned += len(keys)
+                keys = []
+        if keys:
+            await self._inspect(keys, report, fix)
+            report.scanned += len(keys)
+
+        report.seconds = asyncio.get_running_loop().time() - started
+        self.last_report = report
+        expired = sum(usage.expired for usage in report.families.values())
+        logger.info(
+            f"[redis-sweep] Scanned {report.scanned} keys in {report.seconds:.1f}s, "
+            f"~{report.estimated_bytes / 1024:.0f} KiB, TTL set on {expired} orphaned keys"
+        )
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"[redis-sweep] Sweep failed: {e}")
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+redis_sweeper = RedisSweeper(
+    interval=config.REDIS_SWEEP_INTERVAL,
+    batch=config.REDIS_SWEEP_BATCH,
+    samples=config.REDIS_SWEEP_SAMPLES
+)
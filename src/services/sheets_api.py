@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import aiohttp
+from google.auth import crypt, jwt
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+DEFAULT_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+
+class SheetsApiError(Exception):
+    """Ошибка ответа Sheets API; code — HTTP-статус (как у gspread.exceptions.APIError)"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"Sheets API error {code}: {message}")
+        self.code = code
+
+
+class ServiceAccountToken:
+    """
+    OAuth-токен сервисного аккаунта с асинхронным обновлением.
+    JWT подписывается локально, обмен на access token идёт через ту же aiohttp-сессию.
+    """
+
+    def __init__(self, info: dict, scopes: List[str]):
+        self.signer = crypt.RSASigner.from_service_account_info(info)
+        self.email = info["client_email"]
+        self.token_uri = info.get("token_uri", DEFAULT_TOKEN_URI)
+        self.scopes = scopes
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, session: aiohttp.ClientSession) -> str:
+        async with self._lock:
+            # Обновляем заранее, чтобы токен не истёк посреди запроса
+            if self._token and time.time() < self._expires_at - 60:
+                return self._token
+
+            now = int(time.time())
+            assertion = jwt.encode(self.signer, {
+                "iss": self.email,
+                "scope": " ".join(self.scopes),
+                "aud": self.token_uri,
+                "iat": now,
+                "exp": now + 3600,
+            })
+            async with session.post(self.token_uri, data={
+                "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+                "assertion": assertion.decode(),
+            }) as resp:
+                body = await resp.json(content_type=None)
+                if resp.status != 200:
+                    raise SheetsApiError(resp.status, body.get("error_description") or str(body))
+
+            self._token = body["access_token"]
+            self._expires_at = now + int(body.get("expires_in", 3600))
+            logger.info("[sheets-api] Access token refreshed")
+            return self._token
+
+
+def sheet_range(title: str, a1: str = "") -> str:
+    """A1-диапазон на листе: sheet_range('Лист1', 'A2:B2') -> 'Лист1'!A2:B2"""
+    sheet = "'" + title.replace("'", "''") + "'"
+    return f"{sheet}!{a1}" if a1 else sheet
+
+
+class AsyncSheetsClient:
+    """
+    Асинхронный клиент Sheets API на aiohttp.
+    Одна сессия с пулом keep-alive соединений на всё время работы бота.
+    Реализует тот же интерфейс таблицы, что и GspreadSpreadsheet в google_sheets
+    (titles, add_worksheet, append_rows, get_values, batch_update, protect).
+    """
+
+    def __init__(
+        self, service_account_file: str, spreadsheet_id: str, scopes: List[str],
+        pool_size: int = 4, base_url: str = SHEETS_API_URL
+    ):
+        self.service_account_file = service_account_file
+        self.spreadsheet_id = spreadsheet_id
+        self.base_url = base_url
+        self.scopes = scopes
+        self.pool_size = pool_size
+        self._sheet_ids: Dict[str, int] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token: Optional[ServiceAccountToken] = None
+
+    async def open(self) -> "AsyncSheetsClient":
+        with open(self.service_account_file, encoding="utf-8") as f:
+            info = json.load(f)
+        self._token = ServiceAccountToken(info, self.scopes)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+        try:
+            await self.titles()
+        except Exception:
+            await self.close()
+            raise
+        return self
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, path: str, params=None, body: dict = None) -> dict:
+        token = await self._token.get(self._session)
+        url = f"{self.base_url}/{self.spreadsheet_id}{path}"
+        async with self._session.request(
+            method, url, params=params, json=body,
+            headers={"Authorization": f"Bearer {token}"}
+        ) as resp:
+            data = await resp.json(content_type=None)
+            if resp.status >= 400:
+                error = (data or {}).get("error", {})
+                raise SheetsApiError(resp.status, error.get("message", str(data)))
+            return data or {}
+
+    async def titles(self) -> List[str]:
+        meta = await self._request("GET", "", params={"fields": "sheets.properties(title,sheetId)"})
+        self._sheet_ids = {
+            sheet["properties"]["title"]: sheet["properties"]["sheetId"] for sheet in meta["sheets"]
+        }
+        return list(self._sheet_ids)
+
+    async def add_worksheet(self, title: str, cols: int) -> None:
+        reply = await self._request("POST", ":batchUpdate", body={
+            "requests": [{"addSheet": {"properties": {
+                "title": title, "gridProperties": {"rowCount": 1000, "columnCount": cols}
+            }}}]
+        })
+        self._sheet_ids[title] = reply["replies"][0]["addSheet"]["properties"]["sheetId"]
+
+    async def append_rows(self, title: str, rows: List[list]) -> dict:
+        return await self._request(
+            "POST", f"/values/{quote(sheet_range(title))}:append",
+            params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows}
+        )
+
+    async def get_values(self, ranges: List[str]) -> List[List[list]]:
+        data = await self._request("GET", "/values:batchGet", params=[("ranges", r) for r in ranges])
+        return [value_range.get("values", []) for value_range in data.get("valueRanges", [])]
+
+    async def batch_update(self, data: List[dict]) -> dict:
+        return await self._request(
+            "POST", "/values:batchUpdate",
+            body={"valueInputOption": "RAW", "data": data}
+        )
+
+    async def protect(self, title: str, editor_email: Optional[str] = None) -> None:
+        if title not in self._sheet_ids:
+            await self.titles()
+        editor_email = editor_email or self._token.email
+        await self._request("POST", ":batchUpdate", body={
+            "requests": [{"addProtectedRange": {"protectedRange": {
+                "range": {"sheetId": self._sheet_ids[title]},
+                "description": "Архив обращений",
+                "editors": {"users": [editor_email]},
+            }}}]
+        })
@@ -0,0 +1,130 @@
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from src.services.sheets_api import SheetsApiError
+
+_RANGE_RE = re.compile(r"^'((?:[^']|'')+)'(?:!([A-Z]+)(\d+)?(?::([A-Z]+)(\d+)?)?)?$")
+
+
+def _col_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index - 1
+
+
+class FakeSpreadsheet:
+    """
+    Таблица в памяти с тем же интерфейсом, что у AsyncSheetsClient и GspreadSpreadsheet.
+    Нужна для тестов и бенчмарков без настоящей таблицы:
+    - latency — задержка каждого вызова в секундах;
+    - error_rate — доля вызовов, которые падают с 429;
+    - quota_per_minute — эмуляция квоты Google: сверх неё вызовы получают 429.
+    В calls копится счётчик вызовов по методам.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, error_rate: float = 0.0,
+        quota_per_minute: Optional[int] = None, seed: Optional[int] = None,
+        first_sheet: str = "Лист1"
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.sheets: Dict[str, List[list]] = {first_sheet: []}
+        self.protected: set = set()
+        self.calls: Dict[str, int] = {}
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._recent = deque()
+
+    async def _call(self, method: str) -> None:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.throttled += 1
+            raise SheetsApiError(429, "Injected quota error")
+
+        if self.quota_per_minute is not None:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.quota_per_minute:
+                self.throttled += 1
+                raise SheetsApiError(429, "Quota exceeded for quota metric 'Write requests'")
+            self._recent.append(now)
+
+    def _parse(self, a1: str):
+        match = _RANGE_RE.match(a1)
+        if not match:
+            raise SheetsApiError(400, f"Unable to parse range: {a1}")
+        title = match.group(1).replace("''", "'")
+        if title not in self.sheets:
+            raise SheetsApiError(400, f"Unable to parse range: {a1}")
+        first_col = _col_index(match.group(2)) if match.group(2) else 0
+        first_row = int(match.group(3)) if match.group(3) else 1
+        last_col = _col_index(match.group(4)) if match.group(4) else (first_col if match.group(2) else None)
+        last_row = int(match.group(5)) if match.group(5) else None
+        return title, first_row, first_col, last_row, last_col
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    async def titles(self) -> List[str]:
+        await self._call("titles")
+        return list(self.sheets)
+
+    async def add_worksheet(self, title: str, cols: int) -> None:
+        await self._call("add_worksheet")
+        if title in self.sheets:
+            raise SheetsApiError(400, f"A sheet with the name \"{title}\" already exists")
+        self.sheets[title] = []
+
+    async def append_rows(self, title: str, rows: List[list]) -> dict:
+        await self._call("append_rows")
+        sheet = self.sheets[title]
+        first = len(sheet) + 1
+        sheet.extend([str(v) for v in row] for row in rows)
+        last_col = chr(ord("A") + max(len(r) for r in rows) - 1)
+        return {"updates": {"updatedRange": f"'{title}'!A{first}:{last_col}{len(sheet)}", "updatedRows": len(rows)}}
+
+    async def get_values(self, ranges: List[str]) -> List[List[list]]:
+        await self._call("get_values")
+        result = []
+        for a1 in ranges:
+            title, first_row, first_col, last_row, last_col = self._parse(a1)
+            rows = self.sheets[title][first_row - 1:last_row]
+            if last_col is not None:
+                rows = [row[first_col:last_col + 1] for row in rows]
+            # Как и настоящий API, отрезаем пустые строки в конце
+            while rows and not any(rows[-1]):
+                rows.pop()
+            result.append([list(row) for row in rows])
+        return result
+
+    async def batch_update(self, data: List[dict]) -> dict:
+        await self._call("batch_update")
+        for item in data:
+            title, first_row, first_col, _, _ = self._parse(item["range"])
+            sheet = self.sheets[title]
+            for r, values in enumerate(item["values"]):
+                while len(sheet) < first_row + r:
+                    sheet.append([])
+                row = sheet[first_row + r - 1]
+                for c, value in enumerate(values):
+                    while len(row) <= first_col + c:
+                        row.append("")
+                    row[first_col + c] = str(value)
+        return {"totalUpdatedCells": sum(len(v) for item in data for v in item["values"])}
+
+    async def protect(self, title: str, editor_email: Optional[str] = None) -> None:
+        await self._call("protect")
+        self.protected.add(title)
+
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class OutboxFullError(Exception):
+    """Журнал достиг лимита записей, новые операции не принимаются"""
+
+
+@dataclass
+class OutboxEntry:
+    id: int
+    op_id: str
+    kind: str
+    payload: dict
+    attempts: int
+    created_at: float
+
+
+@dataclass
+class OutboxStats:
+    pending: int
+    oldest_age: Optional[float]
+    failed_attempts: int
+    last_error: Optional[str]
+    size_bytes: int
+
+
+class SheetsOutbox:
+    """
+    Локальный журнал изменений таблицы на SQLite.
+    Каждая операция сначала записывается на диск и удаляется только после
+    успешной отправки в Google Sheets, поэтому переживает падения API и перезапуски бота.
+    Все обращения к базе идут через один поток, чтобы не блокировать event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-outbox")
+        self._pending: Optional[int] = None
+
+    # Синхронная часть (выполняется в потоке журнала)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op_id TEXT NOT NULL UNIQUE,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+            self._pending = conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        return self._conn
+
+    def _add(self, op_id: str, kind: str, payload: dict) -> int:
+        conn = self._connect()
+        if self._pending >= self.max_entries:
+            raise OutboxFullError(f"Outbox is full ({self._pending} entries)")
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO outbox (op_id, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+                (op_id, kind, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+        self._pending += cursor.rowcount
+        return cursor.lastrowid
+
+    def _peek(self, limit: int) -> List[OutboxEntry]:
+        rows = self._connect().execute(
+            "SELECT id, op_id, kind, payload, attempts, created_at FROM outbox ORDER BY id LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [
+            OutboxEntry(id=r[0], op_id=r[1], kind=r[2], payload=json.loads(r[3]), attempts=r[4], created_at=r[5])
+            for r in rows
+        ]
+
+    def _ack(self, ids: List[int]) -> None:
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+        self._pending -= cursor.rowcount
+        # Возвращаем освободившиеся страницы, чтобы файл не рос бесконечно
+        conn.execute("PRAGMA incremental_vacuum")
+
+    def _mark_attempt(self, ids: List[int]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+
+    def _record_error(self, ids: List[int], error: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany("UPDATE outbox SET last_error = ? WHERE id = ?", [(error, i) for i in ids])
+
+    def _stats(self) -> OutboxStats:
+        conn = self._connect()
+        oldest, failed = conn.execute(
+            "SELECT MIN(created_at), COALESCE(SUM(attempts > 0), 0) FROM outbox"
+        ).fetchone()
+        last_error = conn.execute(
+            "SELECT last_error FROM outbox WHERE last_error IS NOT NULL ORDER BY id LIMIT 1"
+        ).fetchone()
+        size = sum(
+            os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p)
+        )
+        return OutboxStats(
+            pending=self._pending,
+            oldest_age=time.time() - oldest if oldest else None,
+            failed_attempts=failed,
+            last_error=last_error[0] if last_error else None,
+            size_bytes=size
+        )
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # Асинхронный интерфейс
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @property
+    def depth(self) -> int:
+        """Сколько операций ждёт отправки (0, пока журнал не открыт)"""
+        return self._pending or 0
+
+    async def open(self) -> int:
+        await self._run(self._connect)
+        if self._pending:
+            logger.info(f"[outbox] {self._pending} pending ops found in {self.path}, will be replayed")
+        return self._pending
+
+    async def add(self, op_id: str, kind: str, payload: dict) -> int:
+        return await self._run(self._add, op_id, kind, payload)
+
+    async def peek(self, limit: int) -> List[OutboxEntry]:
+        return await self._run(self._peek, limit)
+
+    async def ack(self, ids: List[int]) -> None:
+        await self._run(self._ack, ids)
+
+    async def mark_attempt(self, ids: List[int]) -> None:
+        """Отметить попытку отправки до запроса к API: при повторе такие операции проверяются на дубли"""
+        await self._run(self._mark_attempt, ids)
+
+    async def record_error(self, ids: List[int], error: str) -> None:
+        await self._run(self._record_error, ids, error)
+
+    async def stats(self) -> OutboxStats:
+        return await self._run(self._stats)
+
+    async def close(self) -> None:
+        await self._run(self._close)
@@ -0,0 +1,577 @@
+import fnmatch
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Protocol
+
+from redis.exceptions import NoScriptError, ResponseError
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+class StateBackend(Protocol):
+    """
+    Хранилище, с которым работают StateManager, StateBatch и StateCache: подмножество
+    команд redis.asyncio.Redis (decode_responses=True). По умолчанию это сам redis_client,
+    при REDIS_MODE=memory — MemoryBackend. Кроме перечисленных команд нужны:
+    pipeline(transaction) с теми же командами и execute(), register_script / script_load /
+    evalsha для скриптов из redis_scripts и scan_iter для обхода ключей.
+    """
+
+    async def get(self, key: str) -> Optional[str]: ...
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]: ...
+    async def delete(self, *keys: str) -> int: ...
+    async def exists(self, *keys: str) -> int: ...
+    async def expire(self, key: str, seconds: int) -> bool: ...
+    async def ttl(self, key: str) -> int: ...
+    async def hget(self, key: str, field: str) -> Optional[str]: ...
+    async def hgetall(self, key: str) -> Dict[str, str]: ...
+    async def hset(self, key: str, field: Optional[str] = None, value: Any = None, mapping: Optional[dict] = None) -> int: ...
+    async def hdel(self, key: str, *fields: str) -> int: ...
+    async def lrange(self, key: str, start: int, end: int) -> List[str]: ...
+    async def lindex(self, key: str, index: int) -> Optional[str]: ...
+    def pipeline(self, transaction: bool = True) -> Any: ...
+    def register_script(self, script: str) -> Any: ...
+
+
+class MemoryScript:
+    """Аналог redis.commands.core.AsyncScript для MemoryBackend"""
+
+    def __init__(self, backend: "MemoryBackend", script: str):
+        self.backend = backend
+        self.script = script
+        self.sha = hashlib.sha1(script.encode()).hexdigest()
+
+    async def __call__(self, keys=(), args=(), client=None):
+        client = client or self.backend
+        try:
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # Как AsyncScript: загрузить скрипт и повторить
+            self.sha = await client.script_load(self.script)
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+
+
+class MemoryPipeline:
+    """
+    Pipeline MemoryBackend: команды копятся в command_stack и выполняются в execute()
+    подряд, без переключений event loop, — так же атомарно, как MULTI/EXEC
+    """
+
+    def __init__(self, backend: "MemoryBackend"):
+        self._backend = backend
+        self.command_stack: list = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.reset()
+
+    async def reset(self) -> None:
+        self.command_stack.clear()
+
+    def execute_command(self, *args, **kwargs):
+        self.command_stack.append(("execute_command", args, kwargs))
+        return self
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        self._backend._command(name)  # неизвестная команда — AttributeError сразу, а не в execute()
+
+        def queue(*args, **kwargs):
+            self.command_stack.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        commands, self.command_stack = self.command_stack, []
+        results = []
+        for name, args, kwargs in commands:
+            try:
+                results.append(self._backend._command(name)(*args, **kwargs))
+            except ResponseError as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+
+class MemoryBackend:
+    """
+    Хранилище в памяти процесса с интерфейсом redis_client (REDIS_MODE=memory): для одного
+    экземпляра бота без сервера Redis и для тестов. Строки, хэши, списки и множества,
+    TTL ключей и полей хэша (HEXPIRE), pipeline и скрипты redis_scripts — их Lua-код
+    выполняет LuaScripts (нужен пакет lupa). Данные живут до перезапуска процесса.
+
+    Просроченные ключи удаляются при обращении к ним и раз в purge_every команд —
+    общим проходом, чтобы неактивные пользователи не копились.
+    """
+
+    def __init__(self, purge_every: int = 1000):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._field_expires: Dict[str, Dict[str, float]] = {}
+        self._purge_every = purge_every
+        self._ops = 0
+        self._scripts: Dict[str, Any] = {}
+        self._lua_scripts: Optional["LuaScripts"] = None
+
+    # Вызов команд: публичные методы асинхронные, как у redis_client, реализация — в _cmd_*
+
+    def _command(self, name: str) -> Callable:
+        impl = getattr(self, f"_cmd_{name}", None)
+        if impl is None:
+            raise AttributeError(f"MemoryBackend does not support '{name}'")
+        return impl
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        impl = self._command(name)
+
+        async def call(*args, **kwargs):
+            return impl(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    def register_script(self, script: str) -> MemoryScript:
+        return MemoryScript(self, script)
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> AsyncIterator[str]:
+        self._purge()
+        for key in list(self._data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def aclose(self) -> None:
+        pass
+
+    # Время жизни
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._drop(key)
+        return key in self._data
+
+    def _drop(self, key: str) -> bool:
+        self._expires.pop(key, None)
+        self._field_expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, expires_at in self._expires.items() if expires_at <= now]:
+            self._drop(key)
+        for key in list(self._field_expires):
+            if key in self._data:
+                self._hash(key)
+
+    def _tick(self) -> None:
+        self._ops += 1
+        if self._ops % self._purge_every == 0:
+            self._purge()
+
+    def _value(self, key: str, kind: type, create: bool = False):
+        if not self._alive(key):
+            if not create:
+                return None
+            self._data[key] = kind()
+        value = self._data[key]
+        if not isinstance(value, kind):
+            raise ResponseError(WRONGTYPE)
+        return value
+
+    def _hash(self, key: str, create: bool = False) -> Optional[dict]:
+        values = self._value(key, dict, create)
+        fields = self._field_expires.get(key)
+        if values is not None and fields:
+            now = time.monotonic()
+            for field in [f for f, expires_at in fields.items() if expires_at <= now]:
+                values.pop(field, None)
+                del fields[field]
+            if not values and not create:
+                self._drop(key)
+                return None
+        return values
+
+    def _cleanup(self, key: str) -> None:
+        """Пустые хэши, списки и множества в Redis не существуют"""
+        if key in self._data and not self._data[key]:
+            self._drop(key)
+
+    # Ключи и строки
+
+    def _cmd_ping(self) -> bool:
+        return True
+
+    def _cmd_type(self, key: str) -> str:
+        if not self._alive(key):
+            return "none"
+        return {str: "string", dict: "hash", list: "list", set: "set"}[type(self._data[key])]
+
+    def _cmd_get(self, key: str) -> Optional[str]:
+        return self._value(key, str)
+
+    def _cmd_set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        self._tick()
+        if nx and self._alive(key):
+            return None
+        self._drop(key)
+        self._data[key] = str(value)
+        if ex:
+            self._expires[key] = time.monotonic() + int(ex)
+        return True
+
+    def _cmd_delete(self, *keys: str) -> int:
+        self._tick()
+        return sum(self._alive(key) and self._drop(key) for key in keys)
+
+    def _cmd_exists(self, *keys: str) -> int:
+        return sum(self._alive(key) for key in keys)
+
+    def _cmd_expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self._expires[key] = time.monotonic() + int(seconds)
+        return True
+
+    def _cmd_persist(self, key: str) -> bool:
+        return self._alive(key) and self._expires.pop(key, None) is not None
+
+    def _cmd_ttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        expires_at = self._expires.get(key)
+        return -1 if expires_at is None else max(0, round(expires_at - time.monotonic()))
+
+    def _cmd_renamenx(self, src: str, dst: str) -> bool:
+        if not self._alive(src):
+            raise ResponseError("no such key")
+        if self._alive(dst):
+            return False
+        self._data[dst] = self._data.pop(src)
+        for table in (self._expires, self._field_expires):
+            if src in table:
+                table[dst] = table.pop(src)
+        return True
+
+    def _cmd_memory_usage(self, key: str, samples: Optional[int] = None) -> Optional[int]:
+        return len(repr(self._data[key])) if self._alive(key) else None
+
+    def _cmd_info(self, section: Optional[str] = None) -> dict:
+        size = sum(len(repr(value)) for value in self._data.values())
+        return {"used_memory_human": f"~{size / 1024:.0f}K", "used_memory_peak_human": "?"}
+
+    # Хэши
+
+    def _cmd_hget(self, key: str, field: str) -> Optional[str]:
+        return (self._hash(key) or {}).get(field)
+
+    def _cmd_hmget(self, key: str, keys, *args) -> List[Optional[str]]:
+        fields = ([keys] if isinstance(keys, str) else list(keys)) + list(args)
+        values = self._hash(key) or {}
+        return [values.get(field) for field in fields]
+
+    def _cmd_hgetall(self, key: str) -> Dict[str, str]:
+        return dict(self._hash(key) or {})
+
+    def _cmd_hkeys(self, key: str) -> List[str]:
+        return list(self._hash(key) or {})
+
+    def _cmd_hset(self, key: str, field: Optional[str] = None, value: Any = None, mapping: Optional[dict] = None) -> int:
+        self._tick()
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        values = self._hash(key, create=True)
+        added = 0
+        for k, v in items.items():
+            added += k not in values
+            values[k] = str(v)
+            # Как в Redis: перезапись поля снимает его TTL
+            self._field_expires.get(key, {}).pop(k, None)
+        return added
+
+    def _cmd_hdel(self, key: str, *fields: str) -> int:
+        values = self._hash(key)
+        if values is None:
+            return 0
+        removed = 0
+        for field in fields:
+            if values.pop(field, None) is not None:
+                removed += 1
+                self._field_expires.get(key, {}).pop(field, None)
+        self._cleanup(key)
+        return removed
+
+    def _cmd_hexpire(self, key: str, seconds: int, *fields: str) -> List[int]:
+        values = self._hash(key) or {}
+        expires_at = time.monotonic() + int(seconds)
+        result = []
+        for field in fields:
+            if field in values:
+                self._field_expires.setdefault(key, {})[field] = expires_at
+                result.append(1)
+            else:
+                result.append(-2)
+        return result
+
+    def _cmd_hpersist(self, key: str, *fields: str) -> List[int]:
+        values = self._hash(key) or {}
+        expires = self._field_expires.get(key, {})
+        return [(1 if expires.pop(f, None) is not None else -1) if f in values else -2 for f in fields]
+
+    # Списки
+
+    def _cmd_rpush(self, key: str, *values: Any) -> int:
+        self._tick()
+        items = self._value(key, list, create=True)
+        items.extend(str(v) for v in values)
+        return len(items)
+
+    def _cmd_lrange(self, key: str, start: int, end: int) -> List[str]:
+        items = self._value(key, list) or []
+        end = len(items) if end == -1 else end + 1 if end >= 0 else len(items) + end + 1
+        return items[start if start >= 0 else max(0, len(items) + start):end]
+
+    def _cmd_lindex(self, key: str, index: int) -> Optional[str]:
+        items = self._value(key, list) or []
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def _cmd_llen(self, key: str) -> int:
+        return len(self._value(key, list) or [])
+
+    def _cmd_rpop(self, key: str) -> Optional[str]:
+        items = self._value(key, list)
+        value = items.pop() if items else None
+        self._cleanup(key)
+        return value
+
+    def _cmd_ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self._value(key, list)
+        if items is not None:
+            items[:] = self._cmd_lrange(key, start, end)
+            self._cleanup(key)
+        return True
+
+    def _cmd_lset(self, key: str, index: int, value: Any) -> bool:
+        items = self._value(key, list)
+        if not items:
+            raise ResponseError("no such key")
+        if not -len(items) <= index < len(items):
+            raise ResponseError("index out of range")
+        items[index] = str(value)
+        return True
+
+    # Множества
+
+    def _cmd_sadd(self, key: str, *members: Any) -> int:
+        self._tick()
+        values = self._value(key, set, create=True)
+        before = len(values)
+        values.update(str(m) for m in members)
+        return len(values) - before
+
+    def _cmd_smembers(self, key: str) -> set:
+        return set(self._value(key, set) or set())
+
+    def _cmd_srem(self, key: str, *members: Any) -> int:
+        values = self._value(key, set) or set()
+        removed = len(values & {str(m) for m in members})
+        values.difference_update(str(m) for m in members)
+        self._cleanup(key)
+        return removed
+
+    # Скрипты: исходники redis_scripts выполняются настоящим интерпретатором Lua 5.1 (lupa),
+    # как в Redis, а redis.call вызывает команды _cmd_* этого же хранилища
+
+    def _cmd_script_load(self, script: str) -> str:
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        if sha not in self._scripts:
+            self._scripts[sha] = self._lua().compile(script)
+        return sha
+
+    def _cmd_script_flush(self, sync_type: Optional[str] = None) -> bool:
+        self._scripts.clear()
+        return True
+
+    def _cmd_evalsha(self, sha: str, numkeys: int, *keys_and_args) -> Any:
+        function = self._scripts.get(sha)
+        if function is None:
+            raise NoScriptError("No matching script. Please use EVAL.")
+        numkeys = int(numkeys)
+        return self._lua().run(function, keys_and_args[:numkeys], keys_and_args[numkeys:])
+
+    def _cmd_execute_command(self, *args, **kwargs) -> Any:
+        if args and str(args[0]).upper() == "EVALSHA":
+            return self._cmd_evalsha(*args[1:])
+        return self._command(str(args[0]).lower())(*args[1:], **kwargs)
+
+    def _lua(self) -> "LuaScripts":
+        if self._lua_scripts is None:
+            self._lua_scripts = LuaScripts(self)
+        return self._lua_scripts
+
+
+def _redis_arg(value: Any) -> str:
+    """Аргумент redis.call строкой, как его получил бы Redis: числа Lua — без дробной части"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def _hset_args(db: MemoryBackend, key: str, *pairs: str) -> int:
+    return db._cmd_hset(key, mapping=dict(zip(pairs[::2], pairs[1::2])))
+
+
+def _hexpire_args(db: MemoryBackend, key: str, seconds: str, _fields: str, _count: str, *fields: str) -> List[int]:
+    return db._cmd_hexpire(key, int(seconds), *fields)
+
+
+def _set_args(db: MemoryBackend, key: str, value: str, *options: str) -> Optional[dict]:
+    flags = [option.upper() for option in options]
+    ex = int(options[flags.index("EX") + 1]) if "EX" in flags else None
+    return {"ok": "OK"} if db._cmd_set(key, value, ex=ex, nx="NX" in flags) else None
+
+
+def _time_args(db: MemoryBackend) -> List[str]:
+    now = time.time()
+    return [str(int(now)), str(int(now % 1 * 1_000_000))]
+
+
+# Команды, доступные скриптам через redis.call: имя -> (db, *строковые аргументы) -> ответ Redis
+_LUA_COMMANDS: Dict[str, Callable] = {
+    "EXISTS": lambda db, *keys: db._cmd_exists(*keys),
+    "TYPE": lambda db, key: {"ok": db._cmd_type(key)},
+    "SET": _set_args,
+    "DEL": lambda db, *keys: db._cmd_delete(*keys),
+    "EXPIRE": lambda db, key, seconds: int(db._cmd_expire(key, int(seconds))),
+    "TIME": _time_args,
+    "HGET": lambda db, key, field: db._cmd_hget(key, field),
+    "HSET": _hset_args,
+    "HDEL": lambda db, key, *fields: db._cmd_hdel(key, *fields),
+    "HKEYS": lambda db, key: db._cmd_hkeys(key),
+    "HEXPIRE": _hexpire_args,
+    "RPUSH": lambda db, key, *values: db._cmd_rpush(key, *values),
+    "RPOP": lambda db, key: db._cmd_rpop(key),
+    "LLEN": lambda db, key: db._cmd_llen(key),
+    "LINDEX": lambda db, key, index: db._cmd_lindex(key, int(index)),
+    "LRANGE": lambda db, key, start, end: db._cmd_lrange(key, int(start), int(end)),
+    "LTRIM": lambda db, key, start, end: {"ok": "OK"} if db._cmd_ltrim(key, int(start), int(end)) else None,
+    "LSET": lambda db, key, index, value: {"ok": "OK"} if db._cmd_lset(key, int(index), value) else None,
+}
+
+# cjson.null: значение Python, которое Lua возвращает обратно тем же объектом
+_JSON_NULL = object()
+
+# Окружение скриптов: redis.call и cjson поверх функций Python, переданных в ...
+_LUA_ENV = """
+local call, encode, decode, null = ...
+redis = {call = call}
+cjson = {encode = encode, decode = decode, null = null}
+"""
+
+
+class LuaScripts:
+    """
+    Интерпретатор Lua для скриптов MemoryBackend: тот же исходный код, что уходит в Redis,
+    поэтому память и Redis не расходятся в логике скриптов. Ответы переводятся так же, как
+    в Redis: число Lua — целое, таблица — список (до первого nil), {ok=...} — строка
+    статуса, {err=...} — ошибка, false и nil — None.
+    """
+
+    def __init__(self, db: MemoryBackend):
+        try:
+            from lupa import lua51
+        except ImportError as e:
+            raise RuntimeError("Для скриптов REDIS_MODE=memory нужен пакет lupa (pip install lupa)") from e
+
+        self._db = db
+        self._runtime = lua51.LuaRuntime(unpack_returned_tuples=False)
+        self._is_table = lambda value: lua51.lua_type(value) == "table"
+        self._runtime.execute(_LUA_ENV, self._call, self._encode, self._decode, _JSON_NULL)
+        self._globals = self._runtime.globals()
+
+    def compile(self, script: str) -> Any:
+        try:
+            return self._runtime.compile(script)
+        except Exception as e:
+            raise ResponseError(f"Error compiling script: {e}") from e
+
+    def run(self, function: Any, keys: tuple, args: tuple) -> Any:
+        self._globals.KEYS = self._runtime.table_from([_redis_arg(key) for key in keys])
+        self._globals.ARGV = self._runtime.table_from([_redis_arg(arg) for arg in args])
+        try:
+            return self._reply(function())
+        except ResponseError:
+            raise
+        except Exception as e:
+            raise ResponseError(f"Error running script: {e}") from e
+
+    def _call(self, command: str, *args) -> Any:
+        impl = _LUA_COMMANDS.get(command.upper())
+        if impl is None:
+            raise ResponseError(f"Unknown Redis command called from script: {command}")
+        return self._to_lua(impl(self._db, *map(_redis_arg, args)))
+
+    def _to_lua(self, value: Any) -> Any:
+        if value is None:
+            return False
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, list):
+            return self._runtime.table_from([self._to_lua(item) for item in value])
+        if isinstance(value, dict):
+            return self._runtime.table_from({k: self._to_lua(v) for k, v in value.items()})
+        return value
+
+    def _reply(self, value: Any) -> Any:
+        if value is None or value is False:
+            return None
+        if value is True:
+            return 1
+        if isinstance(value, float):
+            return int(value)
+        if isinstance(value, (int, str)):
+            return value
+        if value["err"] is not None:
+            raise ResponseError(value["err"])
+        if value["ok"] is not None:
+            return value["ok"]
+        items = []
+        while value[len(items) + 1] is not None:
+            items.append(self._reply(value[len(items) + 1]))
+        return items
+
+    def _encode(self, value: Any) -> str:
+        return json.dumps(self._from_table(value), ensure_ascii=False, separators=(",", ":"))
+
+    def _decode(self, raw: str) -> Any:
+        return self._to_table(json.loads(raw))
+
+    def _from_table(self, value: Any) -> Any:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if value is _JSON_NULL:
+            return None
+        if self._is_table(value):
+            items = dict(value.items())
+            # Как у cjson: таблица с ключами 1..n — массив, пустая — объект
+            if items and set(items) == set(range(1, len(items) + 1)):
+                return [self._from_table(items[i]) for i in range(1, len(items) + 1)]
+            return {str(k): self._from_table(v) for k, v in items.items()}
+        return value
+
+    def _to_table(self, value: Any) -> Any:
+        if value is None:
+            return _JSON_NULL
+        if isinstance(value, list):
+            return self._runtime.table_from([self._to_table(item) for item in value])
+        if isinstance(value, dict):
+            return self._runtime.table_from({k: self._to_table(v) for k, v in value.items()})
+        return value
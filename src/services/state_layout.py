@@ -0,0 +1,97 @@
+from typing import Callable, Optional
+
+from redis.exceptions import ResponseError
+
+from src.services import redis_scripts
+from src.services.redis_client import redis_client
+from src.utils import config
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Сводная раскладка (STATE_LAYOUT=hash): всё о пользователе — один хэш user:{id}.
+# Поля состояния (бывший user_state:{id}) лежат в нём без префикса, служебные —
+# с префиксом "~", поэтому get_state их не видит, а clear_state не трогает лок и навигацию.
+# Хэш живёт USER_STATE_TTL без активности, поэтому флаги, которые могут быть бессрочными
+# (блокировка blocked:{id}, цель ответа админа admin_replying:{id}), в него не входят
+# и остаются отдельными ключами с тем же хэш-тегом.
+USER_HASH_KEY = "user:{{{user_id}}}"
+SERVICE_PREFIX = "~"
+FEEDBACK_TYPE_FIELD = "~feedback_type"
+FEEDBACK_LOCK_FIELD = "~feedback_lock"
+NAV_FIELD = "~nav"  # JSON-массив записей {"screen", "params"}
+# Эмуляция TTL поля на Redis < 7.4: рядом лежит "~exp:<поле>" с unix-временем истечения
+# по часам сервера (TIME) — его пишут и сверяют Lua-скрипты redis_scripts
+EXPIRES_PREFIX = "~exp:"
+
+
+def is_state_field(name: str) -> bool:
+    return not name.startswith(SERVICE_PREFIX)
+
+
+class UserHashLayout:
+    """
+    Команды для сводного хэша пользователя. Методы только ставят команды в pipeline
+    (см. StateBatch) и возвращают, сколько команд добавили, или функцию разбора ответа.
+
+    TTL отдельных полей (лок обращения, тип обращения, навигация):
+    - native — HEXPIRE (Redis 7.4+), поля исчезают сами;
+    - emulated — время истечения в соседнем поле "~exp:<поле>"; запись и чтение таких
+      полей идут через скрипты hash_set / hash_get, которые берут время у сервера,
+      а просроченное значение при чтении удаляют. Сам хэш в обоих режимах живёт
+      USER_STATE_TTL без активности, так что забытые поля не копятся.
+    """
+
+    def __init__(self, field_ttl: str = "auto"):
+        self.field_ttl = field_ttl
+        self.native = field_ttl == "native"
+
+    @property
+    def native_arg(self) -> str:
+        """Флаг режима для Lua-скриптов"""
+        return "1" if self.native else "0"
+
+    async def detect(self) -> None:
+        """В режиме auto проверить, умеет ли Redis HEXPIRE"""
+        if self.field_ttl != "auto":
+            return
+        try:
+            await redis_client.hexpire("state_layout:probe", 1, "probe")
+            self.native = True
+        except ResponseError:
+            self.native = False
+        logger.info(f"[redis] Field TTL: {'HEXPIRE' if self.native else 'emulated'}")
+
+    def set_field(self, pipe, key: str, field: str, value: str, expire: Optional[int] = None) -> int:
+        if expire is None:
+            pipe.hset(key, field, value)
+            if self.native:
+                pipe.hpersist(key, field)
+            else:
+                pipe.hdel(key, EXPIRES_PREFIX + field)
+        elif self.native:
+            pipe.hset(key, field, value)
+            pipe.hexpire(key, expire, field)
+        else:
+            redis_scripts.queue(
+                pipe, redis_scripts.hash_set, [key], [field, value, expire, config.USER_STATE_TTL, self.native_arg]
+            )
+            return 1
+        pipe.expire(key, config.USER_STATE_TTL)
+        return 3
+
+    def get_field(self, pipe, key: str, field: str) -> Callable:
+        if self.native:
+            pipe.hget(key, field)
+        else:
+            redis_scripts.queue(pipe, redis_scripts.hash_get, [key], [field, self.native_arg])
+        return lambda raw: raw
+
+    def delete_fields(self, pipe, key: str, *fields: str) -> int:
+        if not self.native:
+            fields = fields + tuple(EXPIRES_PREFIX + field for field in fields)
+        pipe.hdel(key, *fields)
+        return 1
+
+
+layout = UserHashLayout(config.STATE_FIELD_TTL) if config.STATE_LAYOUT == "hash" else None
@@ -1,22 +1,168 @@
 import logging
-from typing import Any, Dict, Optional, Union
-import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Set, Union
 import json
+from redis.exceptions import ResponseError
+from src.services import redis_scripts
+from src.services.flag_cache import flag_cache
 from src.services.redis_client import redis_client
+from src.services.state_layout import (
+    FEEDBACK_LOCK_FIELD, FEEDBACK_TYPE_FIELD, NAV_FIELD, USER_HASH_KEY, is_state_field, layout
+)
+from src.utils import config
 from src.utils.logger import setup_logger  
 
-USER_STATE_KEY = "user_state:{user_id}"
-FEEDBACK_TYPE_KEY = "feedback_type:{user_id}"
-FEEDBACK_LOCK_KEY = "feedback_lock:{user_id}"
-BLOCKED_USER_KEY = "blocked:{user_id}"
-ADMIN_REPLYING_KEY = "admin_replying:{admin_id}"
-NAV_STACK_KEY = "nav_stack:{user_id}"  
+# Хэш-тег {user_id} держит все ключи пользователя в одном слоте Redis Cluster
+USER_STATE_KEY = "user_state:{{{user_id}}}"
+FEEDBACK_TYPE_KEY = "feedback_type:{{{user_id}}}"
+FEEDBACK_LOCK_KEY = "feedback_lock:{{{user_id}}}"
+BLOCKED_USER_KEY = "blocked:{{{user_id}}}"
+ADMIN_REPLYING_KEY = "admin_replying:{{{admin_id}}}"
+NAV_STACK_KEY = "nav_stack:{{{user_id}}}"
+
+NAV_ROOT = {"screen": "main", "params": {}}
+NAV_ROOT_JSON = json.dumps(NAV_ROOT)
+
+
+def _decode(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _nav_entry(screen: str, params: Optional[dict] = None) -> str:
+    return json.dumps({"screen": screen, "params": params or {}})
+
+
+def _state_fields(raw: dict) -> Dict[str, str]:
+    """Поля состояния из HGETALL; служебные поля сводного хэша (с "~") отбрасываются"""
+    return {k: v for k, v in ((_decode(k), _decode(v)) for k, v in (raw or {}).items()) if is_state_field(k)}
+
+
+class StateCache:
+    """
+    Снимки хэшей user_state:{id} на время обработки одного апдейта (см. StateCacheMiddleware).
+    Первое чтение загружает хэш целиком, следующие берут значения из снимка.
+    Записи копятся в буфере и уходят в Redis одним pipeline в flush(),
+    поэтому апдейт читает и пишет каждый хэш не больше одного раза.
+    В тот же pipeline идут EXPIRE: записанным хэшам — USER_STATE_TTL, ключам из touch() — их TTL.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, Dict[str, str]] = {}
+        self._dirty: Dict[str, Dict[str, str]] = {}
+        self._deleted: Dict[str, Set[str]] = {}
+        self._wiped: Dict[str, bool] = {}
+        self._touched: Dict[str, int] = {}
+
+    def snapshot(self, key: str) -> Optional[Dict[str, str]]:
+        return self._snapshots.get(key)
+
+    def remember(self, key: str, raw: dict) -> Dict[str, str]:
+        """Запомнить хэш, прочитанный из Redis; поверх него — ещё не сброшенные записи"""
+        snapshot = {_decode(k): _decode(v) for k, v in (raw or {}).items()}
+        for field in self._deleted.get(key, ()):
+            snapshot.pop(field, None)
+        snapshot.update(self._dirty.get(key, {}))
+        self._snapshots[key] = snapshot
+        return snapshot
+
+    def set(self, key: str, mapping: Dict[str, str]) -> None:
+        self._dirty.setdefault(key, {}).update(mapping)
+        self._deleted.get(key, set()).difference_update(mapping)
+        if key in self._snapshots:
+            self._snapshots[key].update(mapping)
+
+    def delete(self, key: str, *fields: str) -> None:
+        for field in fields:
+            self._dirty.get(key, {}).pop(field, None)
+            self._deleted.setdefault(key, set()).add(field)
+            self._snapshots.get(key, {}).pop(field, None)
+
+    def wipe(self, key: str, keep_service: bool = False) -> None:
+        """
+        Удалить хэш целиком; записи после этого ложатся уже в пустой хэш.
+        keep_service=True — сводный хэш user:{id}: удаляются только поля состояния
+        """
+        self._wiped[key] = keep_service
+        self._dirty.pop(key, None)
+        self._deleted.pop(key, None)
+        self._snapshots[key] = {}
+
+    def touch(self, key: str, ttl: int) -> None:
+        """Продлить время жизни ключа при сбросе (пользователь активен)"""
+        self._touched[key] = ttl
+
+    async def flush(self) -> None:
+        if not (self._wiped or self._touched or any(self._dirty.values()) or any(self._deleted.values())):
+            return
+        async with redis_scripts.ScriptPipeline(redis_client) as pipe:
+            for key, keep_service in self._wiped.items():
+                if keep_service:
+                    redis_scripts.queue(pipe, redis_scripts.clear_state_hash, [key])
+                else:
+                    pipe.delete(key)
+            for key, fields in self._deleted.items():
+                if fields:
+                    pipe.hdel(key, *fields)
+            for key, mapping in self._dirty.items():
+                if mapping:
+                    pipe.hset(key, mapping=mapping)
+                    pipe.expire(key, self._touched.pop(key, config.USER_STATE_TTL))
+            for key, ttl in self._touched.items():
+                pipe.expire(key, ttl)
+            await pipe.execute()
+        self._wiped.clear()
+        self._touched.clear()
+        self._dirty.clear()
+        self._deleted.clear()
+
+
+def queue_unlock(pipe, user_ids) -> None:
+    """Снять лок обращения с пользователей в чужом pipeline (например, у синхронизации с таблицей)"""
+    if layout:
+        for user_id in user_ids:
+            layout.delete_fields(pipe, USER_HASH_KEY.format(user_id=user_id), FEEDBACK_LOCK_FIELD)
+    else:
+        # По одному DEL на пользователя: в кластере ключи разных пользователей лежат в разных слотах
+        for user_id in user_ids:
+            pipe.delete(FEEDBACK_LOCK_KEY.format(user_id=user_id))
+
+
+_state_cache: ContextVar[Optional[StateCache]] = ContextVar("state_cache", default=None)
+
+
+@asynccontextmanager
+async def state_cache():
+    """Включить StateCache для текущей задачи; накопленные записи сбрасываются на выходе"""
+    cache = _state_cache.get()
+    if cache is not None:
+        # Уже внутри кэша (вложенный вызов) — сбросит внешний
+        yield cache
+        return
+
+    cache = StateCache()
+    token = _state_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _state_cache.reset(token)
+        await cache.flush()
+
 
 class StateManager:
-    
+    """
+    Состояние пользователя в Redis. Раскладка задаётся STATE_LAYOUT: по умолчанию
+    отдельные ключи (user_state, feedback_type, feedback_lock, blocked, admin_replying,
+    nav_stack), при hash — один хэш user:{id} (см. state_layout), а блокировка и цель
+    ответа админа остаются отдельными ключами: у хэша TTL простоя. Во втором случае
+    state_key указывает на сводный хэш, а служебные операции идут через StateBatch.
+    """
+
     def __init__(self, user_id: int, logger: Optional[logging.Logger] = None):
         self.user_id = user_id
-        self.state_key = USER_STATE_KEY.format(user_id=user_id)
+        self.layout = layout
+        self.user_key = USER_HASH_KEY.format(user_id=user_id)
+        self.state_key = self.user_key if self.layout else USER_STATE_KEY.format(user_id=user_id)
         self.feedback_type_key = FEEDBACK_TYPE_KEY.format(user_id=user_id)
         self.blocked_key = BLOCKED_USER_KEY.format(user_id=user_id)
         self.lock_key = FEEDBACK_LOCK_KEY.format(user_id=user_id)
@@ -36,7 +182,12 @@ class StateManager:
             if v is not None
         }
 
-        await redis_client.hset(self.state_key, mapping=processed)
+        cache = _state_cache.get()
+        if cache is not None:
+            cache.set(self.state_key, processed)
+        else:
+            await redis_client.hset(self.state_key, mapping=processed)
+            await redis_client.expire(self.state_key, config.USER_STATE_TTL)
 
         simple_processed = {
             k: (f"<long string, length={len(v)}>" if isinstance(v, str) and len(v) > 100 else v)
@@ -45,12 +196,21 @@ class StateManager:
 
         self.logger.info(f"[User {self.user_id}] save_state: {simple_processed}")
 
+    async def _load_cached(self, cache: StateCache) -> Dict[str, str]:
+        snapshot = cache.snapshot(self.state_key)
+        if snapshot is None:
+            snapshot = cache.remember(self.state_key, await redis_client.hgetall(self.state_key))
+        return snapshot
+
     async def get_state(self) -> Dict[str, Any]:
-        raw_state = await redis_client.hgetall(self.state_key) or {}
+        cache = _state_cache.get()
+        if cache is not None:
+            raw_state = await self._load_cached(cache)
+        else:
+            raw_state = await redis_client.hgetall(self.state_key) or {}
         state = {
-            k.decode() if isinstance(k, bytes) else k: 
-            self._deserialize_value(v) 
-            for k, v in raw_state.items()
+            k: self._deserialize_value(v)
+            for k, v in _state_fields(raw_state).items()
         }
         
         simple_state = {
@@ -62,132 +222,286 @@ class StateManager:
         return state
 
     async def get_state_field(self, field: str) -> Any:
+        if field == "admin_replying_to" and self.layout:
+            val = (await self.batch().get_state_field(field).execute())[field]
+            self.logger.info(f"[User {self.user_id}] get_state_field: {field} = {val}")
+            return val
         if field == "admin_replying_to":
             val = await redis_client.get(self.admin_replying_key)
             val_decoded = val.decode() if isinstance(val, bytes) else val
             self.logger.info(f"[User {self.user_id}] get_state_field: {field} = {val_decoded}")
             return val_decoded
         
-        value = await redis_client.hget(self.state_key, field)
+        cache = _state_cache.get()
+        if cache is not None:
+            value = (await self._load_cached(cache)).get(field)
+        else:
+            value = await redis_client.hget(self.state_key, field)
         deserialized = self._deserialize_value(value) if value else None
         self.logger.info(f"[User {self.user_id}] get_state_field: {field} = {deserialized}")
         return deserialized
 
     async def delete_state_field(self, field: str):
-        if field == "admin_replying_to":
+        cache = _state_cache.get()
+        if field == "admin_replying_to" and self.layout:
+            await self.clear_admin_reply_target()
+        elif field == "admin_replying_to":
             await redis_client.delete(self.admin_replying_key)
+        elif cache is not None:
+            cache.delete(self.state_key, field)
         else:
             await redis_client.hdel(self.state_key, field)
         self.logger.info(f"[User {self.user_id}] delete_state_field: {field}")
 
     async def clear_state(self) -> None:
-        await asyncio.gather(
-            redis_client.delete(self.state_key),
-            redis_client.delete(self.feedback_type_key),
-            redis_client.delete(self.admin_replying_key),
-            redis_client.delete(self.blocked_key)
-        )
+        async with self.batch() as batch:
+            batch.clear_state()
         self.logger.info(f"[User {self.user_id}] clear_state called")
 
+    async def touch(self) -> None:
+        """
+        Пользователь активен: продлить TTL состояния и стека навигации.
+        Внутри StateCache — вместе с остальными записями апдейта, иначе отдельным pipeline.
+        """
+        # В сводном хэше навигация — его поле со своим TTL, который продлевают сами nav-скрипты
+        keys = {self.state_key: config.USER_STATE_TTL}
+        if not self.layout:
+            keys[self.nav_stack_key] = config.NAV_STACK_TTL
+
+        cache = _state_cache.get()
+        if cache is not None:
+            for key, ttl in keys.items():
+                cache.touch(key, ttl)
+            return
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, ttl in keys.items():
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    def batch(self, transaction: bool = True) -> "StateBatch":
+        """Собрать несколько операций в один запрос к Redis (см. StateBatch)"""
+        return StateBatch(self, transaction=transaction)
+
+    def _flag_slot(self, key: str, field: Optional[str]) -> tuple:
+        """
+        Запись FlagCache для флага: отдельный ключ или поле сводного хэша.
+        field=None — флаг всегда лежит отдельным ключом (blocked, admin_replying)
+        """
+        return (self.user_key, field) if self.layout and field else (key, None)
+
     # Feedback / блокировки
 
     async def set_feedback_type(self, feedback_type: str, expire: int = 300):
-        await redis_client.set(self.feedback_type_key, feedback_type, ex=expire)
+        if self.layout:
+            await self.batch().set_feedback_type(feedback_type, expire).execute()
+        else:
+            await redis_client.set(self.feedback_type_key, feedback_type, ex=expire)
         self.logger.info(f"[User {self.user_id}] set_feedback_type: {feedback_type} (expire={expire})")
 
     async def get_feedback_type(self) -> Optional[str]:
-        val = await redis_client.get(self.feedback_type_key)
+        if self.layout:
+            val = (await self.batch().get_feedback_type().execute())["feedback_type"]
+        else:
+            val = await redis_client.get(self.feedback_type_key)
         decoded = val.decode() if isinstance(val, bytes) else val
         self.logger.info(f"[User {self.user_id}] get_feedback_type: {decoded}")
         return decoded
 
     async def delete_feedback_type(self):
-        await redis_client.delete(self.feedback_type_key)
+        if self.layout:
+            await self.batch().delete_feedback_type().execute()
+        else:
+            await redis_client.delete(self.feedback_type_key)
         self.logger.info(f"[User {self.user_id}] delete_feedback_type")
 
     async def lock_user(self, expire: int = 3600) -> None:
-        result = await redis_client.set(self.lock_key, "1", ex=expire)
+        if self.layout:
+            result = await self.batch().lock_user(expire).execute()
+        else:
+            result = await redis_client.set(self.lock_key, "1", ex=expire)
+            flag_cache.invalidate(self.lock_key)
         self.logger.info(f"[User {self.user_id}] lock_user expire={expire}, result: {result}")
 
     async def unlock_user(self) -> None:
-        await redis_client.delete(self.lock_key)
+        if self.layout:
+            await self.batch().unlock_user().execute()
+        else:
+            await redis_client.delete(self.lock_key)
         self.logger.info(f"[User {self.user_id}] unlock_user")
 
     async def can_create_feedback(self) -> bool:
-        exists = await redis_client.exists(self.lock_key)
-        can_create = exists == 0
+        if self.layout:
+            can_create = (await self.batch().can_create_feedback().execute())["can_create_feedback"]
+        elif flag_cache.known_absent(self.lock_key):
+            can_create = True
+        else:
+            version = flag_cache.version
+            can_create = await redis_client.exists(self.lock_key) == 0
+            if can_create:
+                flag_cache.remember_absent(self.lock_key, None, version)
         self.logger.info(f"[User {self.user_id}] can_create_feedback: {can_create}")
         return can_create
 
+    async def admit(self, acquire: bool = False, expire: int = 3600) -> str:
+        """
+        Проверка перед созданием обращения одним вызовом Lua-скрипта:
+        ADMIT_BLOCKED, ADMIT_LOCKED или ADMIT_OK. С acquire=True лок занимается
+        в том же скрипте, поэтому два одновременных сообщения не создадут два обращения.
+        """
+        blocked_slot = self._flag_slot(self.blocked_key, None)
+        lock_slot = self._flag_slot(self.lock_key, FEEDBACK_LOCK_FIELD)
+        if not acquire and flag_cache.known_absent(*blocked_slot) and flag_cache.known_absent(*lock_slot):
+            self.logger.info(f"[User {self.user_id}] admit acquire=False: {redis_scripts.ADMIT_OK} (cached)")
+            return redis_scripts.ADMIT_OK
+
+        version = flag_cache.version
+        if self.layout:
+            verdict = await redis_scripts.admission_hash(
+                keys=[self.user_key, self.blocked_key],
+                args=["1" if acquire else "0", expire, config.USER_STATE_TTL, self.layout.native_arg]
+            )
+        else:
+            verdict = await redis_scripts.admission(
+                keys=[self.blocked_key, self.lock_key],
+                args=["1" if acquire else "0", expire]
+            )
+        verdict = _decode(verdict)
+        if acquire:
+            flag_cache.invalidate(lock_slot[0])
+        elif verdict == redis_scripts.ADMIT_OK:
+            flag_cache.remember_absent(*blocked_slot, version)
+            flag_cache.remember_absent(*lock_slot, version)
+        self.logger.info(f"[User {self.user_id}] admit acquire={acquire}: {verdict}")
+        return verdict
+
     async def block_user(self, expire: int = None) -> None:
-        if expire:
+        if self.layout:
+            await self.batch().block_user(expire).execute()
+        elif expire:
             await redis_client.set(self.blocked_key, "1", ex=expire)
         else:
             await redis_client.set(self.blocked_key, "1")
+        flag_cache.invalidate(self.blocked_key)
         self.logger.info(f"[User {self.user_id}] block_user expire={expire}")
 
     async def unblock_user(self) -> None:
-        await redis_client.delete(self.blocked_key)
+        if self.layout:
+            await self.batch().unblock_user().execute()
+        else:
+            await redis_client.delete(self.blocked_key)
         self.logger.info(f"[User {self.user_id}] unblock_user")
 
     async def is_blocked(self) -> bool:
-        exists = await redis_client.exists(self.blocked_key)
-        blocked = exists == 1
+        if self.layout:
+            blocked = (await self.batch().is_blocked().execute())["is_blocked"]
+        elif flag_cache.known_absent(self.blocked_key):
+            blocked = False
+        else:
+            version = flag_cache.version
+            blocked = await redis_client.exists(self.blocked_key) == 1
+            if not blocked:
+                flag_cache.remember_absent(self.blocked_key, None, version)
         self.logger.info(f"[User {self.user_id}] is_blocked: {blocked}")
         return blocked
 
     # Админ-ответы
 
     async def set_admin_reply_target(self, target_user_id: int, expire: int = 3600) -> None:
-        await redis_client.set(self.admin_replying_key, str(target_user_id), ex=expire)
+        if self.layout:
+            await self.batch().set_admin_reply_target(target_user_id, expire).execute()
+        else:
+            await redis_client.set(self.admin_replying_key, str(target_user_id), ex=expire)
+            flag_cache.invalidate(self.admin_replying_key)
         self.logger.info(f"[User {self.user_id}] set_admin_reply_target: {target_user_id} (expire={expire})")
 
     async def get_admin_reply_target(self) -> Optional[int]:
+        if self.layout:
+            return (await self.batch().get_admin_reply_target().execute())["admin_reply_target"]
+        if flag_cache.known_absent(self.admin_replying_key):
+            return None
+        version = flag_cache.version
         target = await redis_client.get(self.admin_replying_key)
         if target:
             return int(target)
+        flag_cache.remember_absent(self.admin_replying_key, None, version)
         return None
 
+    async def clear_admin_reply_target(self) -> None:
+        await self.batch().clear_admin_reply_target().execute()
+
     # Навигация
+    # Стек хранится списком Redis (nav_stack:{id}) из JSON-записей, в сводном хэше —
+    # JSON-массивом в поле "~nav"; push, pop и goto — Lua-скрипты из redis_scripts,
+    # каждый за один атомарный запрос.
 
-    async def _read_nav_stack(self):
-        raw = await redis_client.get(self.nav_stack_key)
-        if not raw:
-            return [{"screen": "main", "params": {}}]
+    @staticmethod
+    def _parse_nav_stack(raw: list) -> list:
+        stack = []
+        for item in raw or []:
+            try:
+                stack.append(json.loads(item))
+            except json.JSONDecodeError:
+                continue
+        return stack or [dict(NAV_ROOT)]
+
+    @staticmethod
+    def _parse_nav_array(raw: Optional[str]) -> list:
+        """Стек из поля "~nav" сводного хэша (JSON-массив)"""
         try:
-            return json.loads(raw)
+            stack = json.loads(raw) if raw else []
         except json.JSONDecodeError:
-            return [{"screen": "main", "params": {}}]
+            stack = []
+        # params может не быть в записи или быть null — приводим к словарю
+        return [
+            {"screen": entry.get("screen"), "params": entry.get("params") or {}}
+            for entry in stack if isinstance(entry, dict)
+        ] or [dict(NAV_ROOT)]
 
-    async def _write_nav_stack(self, stack):
-        await redis_client.set(self.nav_stack_key, json.dumps(stack))
+    async def _read_nav_stack(self):
+        if self.layout:
+            return (await self.batch().get_nav_stack().execute())["nav_stack"]
+        try:
+            raw = await redis_client.lrange(self.nav_stack_key, 0, -1)
+        except ResponseError:
+            # Стек старого формата (JSON-строка) — заменится корнем при следующей записи
+            raw = []
+        return self._parse_nav_stack(raw)
 
     async def reset_nav(self):
         """Сбросить стек до главного экрана"""
-        await self._write_nav_stack([{"screen": "main", "params": {}}])
+        async with self.batch() as batch:
+            batch.reset_nav()
         self.logger.info(f"[User {self.user_id}] reset_nav -> main")
 
     async def clear_nav(self):
         """Полностью очистить навигацию"""
-        await redis_client.delete(self.nav_stack_key)
+        async with self.batch() as batch:
+            batch.clear_nav()
         self.logger.info(f"[User {self.user_id}] clear_nav")
 
     async def push_nav(self, screen: str, params: dict = None):
         """Добавить новый экран в стек"""
-        stack = await self._read_nav_stack()
-        stack.append({"screen": screen, "params": params or {}})
-        await self._write_nav_stack(stack)
-        self.logger.info(f"[User {self.user_id}] push_nav -> {screen} {params}")
+        args = [_nav_entry(screen, params), config.NAV_STACK_MAX_DEPTH, config.NAV_STACK_TTL, NAV_ROOT_JSON]
+        if self.layout:
+            depth = await redis_scripts.nav_push_hash(
+                keys=[self.user_key], args=args + [config.USER_STATE_TTL, self.layout.native_arg]
+            )
+        else:
+            depth = await redis_scripts.nav_push(keys=[self.nav_stack_key], args=args)
+        self.logger.info(f"[User {self.user_id}] push_nav -> {screen} {params} (depth={depth})")
 
     async def pop_nav(self):
         """Удалить последний экран и вернуть предыдущий"""
-        stack = await self._read_nav_stack()
-        if len(stack) <= 1:
-            return stack[0]
-        stack.pop()
-        await self._write_nav_stack(stack)
-        self.logger.info(f"[User {self.user_id}] pop_nav -> {stack[-1]}")
-        return stack[-1]
+        if self.layout:
+            entry = self._parse_nav_array(_decode(await redis_scripts.nav_pop_hash(
+                keys=[self.user_key],
+                args=[config.NAV_STACK_TTL, NAV_ROOT_JSON, config.USER_STATE_TTL, self.layout.native_arg]
+            )))[-1]
+        else:
+            raw = await redis_scripts.nav_pop(keys=[self.nav_stack_key], args=[config.NAV_STACK_TTL, NAV_ROOT_JSON])
+            entry = self._parse_nav_stack([raw])[-1]
+        self.logger.info(f"[User {self.user_id}] pop_nav -> {entry}")
+        return entry
 
     async def go_back(self):
         """Вернуться на предыдущий экран (для кнопки Назад)"""
@@ -195,22 +509,28 @@ class StateManager:
         return prev["screen"], prev["params"]
 
     async def goto_nav(self, screen: str, params: dict = None):
-        """Перейти на конкретный экран, обрезав стек"""
-        stack = await self._read_nav_stack()
-        for i, entry in enumerate(stack):
-            if entry["screen"] == screen:
-                stack = stack[:i+1]
-                if params is not None:
-                    stack[-1]["params"] = params
-                await self._write_nav_stack(stack)
-                self.logger.info(f"[User {self.user_id}] goto_nav -> {screen} {params}")
-                return
-        await self.push_nav(screen, params)
+        """Перейти на конкретный экран, обрезав стек (если экрана в стеке нет — добавить сверху)"""
+        args = [
+            screen, _nav_entry(screen, params), "1" if params is not None else "0",
+            config.NAV_STACK_MAX_DEPTH, config.NAV_STACK_TTL, NAV_ROOT_JSON
+        ]
+        if self.layout:
+            depth = await redis_scripts.nav_goto_hash(
+                keys=[self.user_key], args=args + [config.USER_STATE_TTL, self.layout.native_arg]
+            )
+        else:
+            depth = await redis_scripts.nav_goto(keys=[self.nav_stack_key], args=args)
+        self.logger.info(f"[User {self.user_id}] goto_nav -> {screen} {params} (depth={depth})")
 
     async def current_nav(self):
         """Получить текущий экран"""
-        stack = await self._read_nav_stack()
-        return stack[-1]
+        if self.layout:
+            return (await self._read_nav_stack())[-1]
+        try:
+            raw = await redis_client.lindex(self.nav_stack_key, -1)
+        except ResponseError:
+            raw = None
+        return self._parse_nav_stack([raw] if raw else [])[-1]
 
 
     # Aliases
@@ -243,9 +563,304 @@ class StateManager:
 
     async def clear_feedback_state(self):
         """Сбросить состояние, связанное с процессом обратной связи"""
-        await self.delete_state_field("prompt_message_id")
-        await self.delete_state_field("type")
-        await self.delete_state_field("is_named")
-        await self.delete_feedback_type()
-        await self.unlock_user()
+        async with self.batch() as batch:
+            batch.clear_feedback_state()
         self.logger.info(f"[User {self.user_id}] clear_feedback_state called")
+
+
+class StateBatch:
+    """
+    Unit of work для StateManager: команды копятся в pipeline и уходят в Redis
+    одним запросом (по умолчанию в MULTI/EXEC). Методы только ставят команды в очередь
+    и возвращают сам batch; результаты чтений execute() отдаёт словарём по именам:
+
+        checks = await state_mgr.batch().is_blocked().can_create_feedback().execute()
+        checks["is_blocked"], checks["can_create_feedback"]
+
+    Для одних записей удобнее "async with state_mgr.batch() as batch:" — execute() при выходе.
+    Операции над ключами другого пользователя — через batch.user(user_id).
+    Внутри StateCache чтение и запись user_state идут через кэш, а не через pipeline.
+    """
+
+    def __init__(self, manager: StateManager, transaction: bool = True, _shared=None):
+        self.manager = manager
+        if _shared is None:
+            _shared = (redis_scripts.ScriptPipeline(redis_client, transaction=transaction), [], set())
+        self._shared = _shared
+        # _written — ключи флагов, записи которых в этом batch надо убрать из FlagCache
+        self._pipe, self._readers, self._written = _shared
+        self._cache = _state_cache.get()
+
+    def _queue(self, op: str, name: Optional[str] = None, decode=None, commands: int = 1) -> "StateBatch":
+        """
+        Записать операцию для execute(): сколько команд она добавила в pipeline и как
+        разобрать их ответы. При commands=0 (операция обслужена StateCache) decode()
+        вызывается без аргументов и возвращает уже известное значение.
+        """
+        self._readers.append((self.manager.user_id, op, name, decode, commands))
+        return self
+
+    def user(self, user_id: int) -> "StateBatch":
+        """Тот же batch для ключей другого пользователя"""
+        return StateBatch(StateManager(user_id, logger=self.manager.logger), _shared=self._shared)
+
+    # Служебные значения: отдельный ключ или поле сводного хэша (STATE_LAYOUT=hash).
+    # field=None — значение и в сводной раскладке хранится отдельным ключом
+
+    def _set_value(self, op: str, key: str, field: Optional[str], value: str, expire: Optional[int]) -> "StateBatch":
+        m = self.manager
+        written = m._flag_slot(key, field)[0]
+        flag_cache.invalidate(written)
+        self._written.add(written)
+        if m.layout and field:
+            return self._queue(op, commands=m.layout.set_field(self._pipe, m.user_key, field, value, expire))
+        if expire:
+            self._pipe.set(key, value, ex=expire)
+        else:
+            self._pipe.set(key, value)
+        return self._queue(op)
+
+    def _get_value(
+        self, op: str, name: str, key: str, field: Optional[str], decode=_decode, flag: bool = False
+    ) -> "StateBatch":
+        """flag=True — горячий флаг: ответ "значения нет" берётся из FlagCache и запоминается в нём"""
+        m = self.manager
+        slot = m._flag_slot(key, field) if flag else None
+        if slot and flag_cache.known_absent(*slot):
+            return self._queue(op, name, lambda: decode(None), commands=0)
+        version = flag_cache.version
+
+        def read(value):
+            if slot and value is None:
+                flag_cache.remember_absent(*slot, version)
+            return decode(value)
+
+        if m.layout and field:
+            extract = m.layout.get_field(self._pipe, m.user_key, field)
+            return self._queue(op, name, lambda raw: read(_decode(extract(raw))))
+        self._pipe.get(key)
+        return self._queue(op, name, lambda raw: read(_decode(raw)))
+
+    def _has_value(self, op: str, name: str, key: str, field: Optional[str], decode) -> "StateBatch":
+        """Флаг из FlagCache или Redis; decode получает True/False — есть ли значение"""
+        if self.manager.layout and field:
+            return self._get_value(op, name, key, field, lambda value: decode(value is not None), flag=True)
+        if flag_cache.known_absent(key):
+            return self._queue(op, name, lambda: decode(False), commands=0)
+        version = flag_cache.version
+
+        def read(raw):
+            if raw == 0:
+                flag_cache.remember_absent(key, None, version)
+            return decode(raw == 1)
+
+        self._pipe.exists(key)
+        return self._queue(op, name, read)
+
+    def _delete_values(self, op: str, *slots) -> "StateBatch":
+        """slots — пары (ключ, поле сводного хэша или None)"""
+        m = self.manager
+        fields = [field for _, field in slots if m.layout and field]
+        keys = [key for key, field in slots if not (m.layout and field)]
+        commands = m.layout.delete_fields(self._pipe, m.user_key, *fields) if fields else 0
+        if keys:
+            self._pipe.delete(*keys)
+            commands += 1
+        return self._queue(op, commands=commands)
+
+    # Чтение
+
+    def _read_state(self, op: str, name: str, extract) -> "StateBatch":
+        """Чтение user_state: из снимка StateCache, если он есть, иначе HGETALL в pipeline"""
+        key = self.manager.state_key
+        if self._cache is not None:
+            snapshot = self._cache.snapshot(key)
+            if snapshot is not None:
+                value = extract(snapshot)
+                return self._queue(op, name, lambda: value, commands=0)
+            self._pipe.hgetall(key)
+            return self._queue(op, name, lambda raw: extract(self._cache.remember(key, raw)))
+        self._pipe.hgetall(key)
+        return self._queue(op, name, lambda raw: extract(_state_fields(raw)))
+
+    def get_state(self) -> "StateBatch":
+        return self._read_state("get_state", "state", lambda raw: {
+            k: StateManager._deserialize_value(v) for k, v in raw.items() if is_state_field(k)
+        })
+
+    def get_state_field(self, field: str) -> "StateBatch":
+        if field == "admin_replying_to":
+            m = self.manager
+            return self._get_value(
+                f"get_state_field({field})", field, m.admin_replying_key, None, flag=True
+            )
+        return self._read_state(
+            f"get_state_field({field})", field,
+            lambda raw: StateManager._deserialize_value(raw[field]) if raw.get(field) else None
+        )
+
+    def get_feedback_type(self) -> "StateBatch":
+        return self._get_value("get_feedback_type", "feedback_type", self.manager.feedback_type_key, FEEDBACK_TYPE_FIELD)
+
+    def is_blocked(self) -> "StateBatch":
+        return self._has_value("is_blocked", "is_blocked", self.manager.blocked_key, None, lambda found: found)
+
+    def can_create_feedback(self) -> "StateBatch":
+        return self._has_value(
+            "can_create_feedback", "can_create_feedback", self.manager.lock_key, FEEDBACK_LOCK_FIELD,
+            lambda found: not found
+        )
+
+    def get_admin_reply_target(self) -> "StateBatch":
+        return self._get_value(
+            "get_admin_reply_target", "admin_reply_target", self.manager.admin_replying_key, None,
+            lambda raw: int(raw) if raw else None, flag=True
+        )
+
+    def get_nav_stack(self) -> "StateBatch":
+        m = self.manager
+        if m.layout:
+            return self._get_value(
+                "get_nav_stack", "nav_stack", m.nav_stack_key, NAV_FIELD,
+                StateManager._parse_nav_array
+            )
+        self._pipe.lrange(m.nav_stack_key, 0, -1)
+        return self._queue("get_nav_stack", "nav_stack", StateManager._parse_nav_stack)
+
+    # Запись
+
+    def save_state(self, **kwargs) -> "StateBatch":
+        processed = {k: StateManager._serialize_value(v) for k, v in kwargs.items() if v is not None}
+        if not processed:
+            return self
+        if self._cache is not None:
+            self._cache.set(self.manager.state_key, processed)
+            return self._queue(f"save_state({', '.join(processed)})", commands=0)
+        self._pipe.hset(self.manager.state_key, mapping=processed)
+        self._pipe.expire(self.manager.state_key, config.USER_STATE_TTL)
+        return self._queue(f"save_state({', '.join(processed)})", commands=2)
+
+    def delete_state_fields(self, *fields: str) -> "StateBatch":
+        if "admin_replying_to" in fields:
+            self.clear_admin_reply_target()
+        fields = [f for f in fields if f != "admin_replying_to"]
+        if not fields:
+            return self
+        if self._cache is not None:
+            self._cache.delete(self.manager.state_key, *fields)
+            return self._queue(f"delete_state_fields({', '.join(fields)})", commands=0)
+        self._pipe.hdel(self.manager.state_key, *fields)
+        return self._queue(f"delete_state_fields({', '.join(fields)})")
+
+    def set_feedback_type(self, feedback_type: str, expire: int = 300) -> "StateBatch":
+        m = self.manager
+        return self._set_value(f"set_feedback_type({feedback_type})", m.feedback_type_key, FEEDBACK_TYPE_FIELD, feedback_type, expire)
+
+    def delete_feedback_type(self) -> "StateBatch":
+        return self._delete_values("delete_feedback_type", (self.manager.feedback_type_key, FEEDBACK_TYPE_FIELD))
+
+    def lock_user(self, expire: int = 3600) -> "StateBatch":
+        return self._set_value("lock_user", self.manager.lock_key, FEEDBACK_LOCK_FIELD, "1", expire)
+
+    def unlock_user(self) -> "StateBatch":
+        return self._delete_values("unlock_user", (self.manager.lock_key, FEEDBACK_LOCK_FIELD))
+
+    def block_user(self, expire: Optional[int] = None) -> "StateBatch":
+        return self._set_value("block_user", self.manager.blocked_key, None, "1", expire)
+
+    def unblock_user(self) -> "StateBatch":
+        return self._delete_values("unblock_user", (self.manager.blocked_key, None))
+
+    def set_admin_reply_target(self, target_user_id: int, expire: int = 3600) -> "StateBatch":
+        m = self.manager
+        return self._set_value(
+            f"set_admin_reply_target({target_user_id})", m.admin_replying_key, None,
+            str(target_user_id), expire
+        )
+
+    def clear_admin_reply_target(self) -> "StateBatch":
+        return self._delete_values("clear_admin_reply_target", (self.manager.admin_replying_key, None))
+
+    def push_nav(self, screen: str, params: dict = None) -> "StateBatch":
+        # По SHA, загруженному при старте (redis_scripts.load_scripts); NOSCRIPT обрабатывает execute()
+        m = self.manager
+        args = [_nav_entry(screen, params), config.NAV_STACK_MAX_DEPTH, config.NAV_STACK_TTL, NAV_ROOT_JSON]
+        if m.layout:
+            redis_scripts.queue(
+                self._pipe, redis_scripts.nav_push_hash, [m.user_key], args + [config.USER_STATE_TTL, m.layout.native_arg]
+            )
+        else:
+            redis_scripts.queue(self._pipe, redis_scripts.nav_push, [m.nav_stack_key], args)
+        return self._queue(f"push_nav({screen})")
+
+    def reset_nav(self) -> "StateBatch":
+        m = self.manager
+        if m.layout:
+            root = json.dumps([NAV_ROOT])
+            return self._queue(
+                "reset_nav", commands=m.layout.set_field(self._pipe, m.user_key, NAV_FIELD, root, config.NAV_STACK_TTL)
+            )
+        self._pipe.delete(m.nav_stack_key)
+        self._pipe.rpush(m.nav_stack_key, NAV_ROOT_JSON)
+        self._pipe.expire(m.nav_stack_key, config.NAV_STACK_TTL)
+        return self._queue("reset_nav", commands=3)
+
+    def clear_nav(self) -> "StateBatch":
+        return self._delete_values("clear_nav", (self.manager.nav_stack_key, NAV_FIELD))
+
+    def clear_state(self) -> "StateBatch":
+        m = self.manager
+        slots = [
+            (m.feedback_type_key, FEEDBACK_TYPE_FIELD),
+            (m.admin_replying_key, None),
+            (m.blocked_key, None),
+        ]
+        if self._cache is not None:
+            # Поля состояния удалит StateCache при сбросе, до записей этого апдейта
+            self._cache.wipe(m.state_key, keep_service=bool(m.layout))
+        elif m.layout:
+            redis_scripts.queue(self._pipe, redis_scripts.clear_state_hash, [m.user_key])
+            self._queue("clear_state_fields")
+        else:
+            slots.insert(0, (m.state_key, None))
+        return self._delete_values("clear_state", *slots)
+
+    def clear_feedback_state(self) -> "StateBatch":
+        self.delete_state_fields("prompt_message_id", "type", "is_named")
+        return self.delete_feedback_type().unlock_user()
+
+    async def execute(self) -> Dict[str, Any]:
+        """Отправить всё накопленное одним запросом; возвращает результаты чтений"""
+        queued = list(self._readers)
+        self._readers.clear()
+        if not queued:
+            return {}
+        # Операции, обслуженные StateCache, в pipeline не попадают
+        raw = iter(await self._pipe.execute() if any(commands for *_, commands in queued) else [])
+        # Свои записи флагов: уведомление о них придёт позже, а читать их можно уже сейчас
+        for key in self._written:
+            flag_cache.invalidate(key)
+        self._written.clear()
+        results = {}
+        for _, _, name, decode, commands in queued:
+            values = [next(raw) for _ in range(commands)]
+            if name is not None:
+                results[name] = decode(*values)
+
+        ops = ", ".join(
+            op if user_id == self.manager.user_id else f"{op}[user {user_id}]"
+            for user_id, op, *_ in queued
+        )
+        self.manager.logger.info(f"[User {self.manager.user_id}] batch: {ops}")
+        return results
+
+    async def __aenter__(self) -> "StateBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.execute()
+        else:
+            self._readers.clear()
+            self._written.clear()
+            await self._pipe.reset()
@@ -39,3 +39,87 @@ if not SPREADSHEET_ID:
 # print("Config: GROUP_CHAT_ID =", GROUP_CHAT_ID, type(GROUP_CHAT_ID))
 # print("Config: BOT_TOKEN =", BOT_TOKEN, type(GROUP_CHAT_ID))
 
+
+# Write-behind очередь для Google Sheets: как часто сбрасывать и сколько строк за раз
+SHEETS_FLUSH_INTERVAL = float(os.getenv("SHEETS_FLUSH_INTERVAL", 2))
+SHEETS_BATCH_SIZE = int(os.getenv("SHEETS_BATCH_SIZE", 50))
+# Сколько попыток закрытие ждёт появления открытой строки обращения на листе, прежде чем его бросить
+SHEETS_CLOSE_MAX_ATTEMPTS = int(os.getenv("SHEETS_CLOSE_MAX_ATTEMPTS", 5))
+
+# Локальный журнал операций с таблицей: переживает недоступность Google Sheets и перезапуски
+SHEETS_OUTBOX_PATH = os.getenv("SHEETS_OUTBOX_PATH", "data/sheets_outbox.sqlite3")
+SHEETS_OUTBOX_MAX_ENTRIES = int(os.getenv("SHEETS_OUTBOX_MAX_ENTRIES", 10000))
+
+# Пул потоков и лимит запросов к Google Sheets (квота по умолчанию — 60 запросов в минуту)
+SHEETS_MAX_WORKERS = int(os.getenv("SHEETS_MAX_WORKERS", 2))
+SHEETS_RATE_PER_MINUTE = float(os.getenv("SHEETS_RATE_PER_MINUTE", 60))
+SHEETS_RATE_BURST = float(os.getenv("SHEETS_RATE_BURST", 10))
+SHEETS_RATE_MAX_WAIT = float(os.getenv("SHEETS_RATE_MAX_WAIT", 30))
+
+# Клиент Google Sheets: gspread (потоки), aiohttp (асинхронный, с keep-alive соединениями)
+# или fake (таблица в памяти для локального запуска и тестов)
+SHEETS_BACKEND = os.getenv("SHEETS_BACKEND", "gspread")
+
+if SHEETS_BACKEND not in ("gspread", "aiohttp", "fake"):
+    raise ValueError("SHEETS_BACKEND должен быть 'gspread', 'aiohttp' или 'fake', проверь .env файл.")
+
+# Разбиение обращений по листам: month (лист на месяц), semester (на полугодие) или none (один лист)
+SHEETS_PARTITION = os.getenv("SHEETS_PARTITION", "month")
+
+if SHEETS_PARTITION not in ("month", "semester", "none"):
+    raise ValueError("SHEETS_PARTITION должен быть 'month', 'semester' или 'none', проверь .env файл.")
+
+# Обратная синхронизация правок админов из таблицы: интервал опроса (сек, 0 — выключено),
+# сколько новых строк читать за опрос и сколько строк открытых обращений проверять за раз
+SHEETS_SYNC_INTERVAL = float(os.getenv("SHEETS_SYNC_INTERVAL", 60))
+SHEETS_SYNC_TAIL_ROWS = int(os.getenv("SHEETS_SYNC_TAIL_ROWS", 200))
+SHEETS_SYNC_MAX_ROWS = int(os.getenv("SHEETS_SYNC_MAX_ROWS", 200))
+
+# Стек навигации пользователя: максимальная глубина и время жизни без активности (сек)
+NAV_STACK_MAX_DEPTH = int(os.getenv("NAV_STACK_MAX_DEPTH", 20))
+NAV_STACK_TTL = int(os.getenv("NAV_STACK_TTL", 7 * 24 * 3600))
+
+if NAV_STACK_MAX_DEPTH < 2:
+    raise ValueError("NAV_STACK_MAX_DEPTH должен быть не меньше 2, проверь .env файл.")
+
+# Состояние пользователя (user_state:{id}) живёт без активности столько секунд (по умолчанию 30 дней);
+# каждый апдейт продлевает его вместе со стеком навигации
+USER_STATE_TTL = int(os.getenv("USER_STATE_TTL", 30 * 24 * 3600))
+
+if USER_STATE_TTL <= 0:
+    raise ValueError("USER_STATE_TTL должен быть больше нуля, проверь .env файл.")
+
+# Фоновый обход Redis (SCAN): как часто (сек, 0 — выключено), ключей за один SCAN
+# и сколько ключей каждого семейства замерять через MEMORY USAGE
+REDIS_SWEEP_INTERVAL = float(os.getenv("REDIS_SWEEP_INTERVAL", 3600))
+REDIS_SWEEP_BATCH = int(os.getenv("REDIS_SWEEP_BATCH", 500))
+REDIS_SWEEP_SAMPLES = int(os.getenv("REDIS_SWEEP_SAMPLES", 50))
+
+# Раскладка данных пользователя в Redis: keys (отдельные ключи user_state, feedback_lock, nav_stack, ...)
+# или hash (один хэш user:{id}; перенос старых ключей — dev/migrate_state_layout.py).
+# TTL отдельных полей хэша: native (HEXPIRE, Redis 7.4+), emulated или auto — определить при старте
+STATE_LAYOUT = os.getenv("STATE_LAYOUT", "keys")
+STATE_FIELD_TTL = os.getenv("STATE_FIELD_TTL", "auto")
+
+if STATE_LAYOUT not in ("keys", "hash"):
+    raise ValueError("STATE_LAYOUT должен быть 'keys' или 'hash', проверь .env файл.")
+
+if STATE_FIELD_TTL not in ("auto", "native", "emulated"):
+    raise ValueError("STATE_FIELD_TTL должен быть 'auto', 'native' или 'emulated', проверь .env файл.")
+
+# Локальный кэш отрицательных ответов для флагов blocked / admin_replying / feedback_lock:
+# сколько секунд помнить ответ (0 — выключено) и сколько ключей держать в памяти.
+# Кэш согласуется keyspace-уведомлениями Redis (notify-keyspace-events включается при старте)
+FLAG_CACHE_TTL = float(os.getenv("FLAG_CACHE_TTL", 60))
+FLAG_CACHE_SIZE = int(os.getenv("FLAG_CACHE_SIZE", 10000))
+
+if FLAG_CACHE_SIZE <= 0:
+    raise ValueError("FLAG_CACHE_SIZE должен быть больше нуля, проверь .env файл.")
+
+# Файл со стоп-словами фильтра мата и как часто (сек) проверять, не изменился ли он:
+# изменённый файл перечитывается без перезапуска бота
+BADWORDS_FILE = os.getenv("BADWORDS_FILE", "badwords.txt")
+BADWORDS_CHECK_INTERVAL = float(os.getenv("BADWORDS_CHECK_INTERVAL", 5))
+# Куда сохранять собранный фильтр, чтобы при старте и перечитывании того же словаря не собирать
+# его заново; пустое значение отключает кэш
+BADWORDS_CACHE_DIR = os.getenv("BADWORDS_CACHE_DIR", "data/profanity_cache")
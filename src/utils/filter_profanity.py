@@ -1,15 +1,126 @@
-import re
-from typing import List, Optional
+import hashlib
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from src.utils import config
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Роль символа текста: буква/цифра (\w), подчёркивание (\w, но разделяет буквы) или разделитель
+WORD, UNDERSCORE, SEPARATOR = 0, 1, 2
+ROOT = 0
+MATCH = -1
+
+
+class SymbolTable(dict):
+    """
+    Таблица для str.translate: символ текста -> номер его класса. Класс — набор букв словаря,
+    которые символ может изображать (с учётом регистра, латиницы и цифр), плюс роль символа.
+    Символы с одинаковым классом получают один номер, незнакомые классифицируются при первой встрече.
+    """
+
+    def __init__(self, variants: Dict[str, FrozenSet[str]]):
+        super().__init__()
+        self.variants = variants
+        self.ids: Dict[Tuple[FrozenSet[str], int], int] = {}
+        self.classes: List[Tuple[FrozenSet[str], int]] = []
+
+    def __missing__(self, code: int) -> int:
+        char = chr(code)
+        # "İ".lower() — две кодовые точки, как и re.IGNORECASE берём первую
+        letters = self.variants.get(char.lower()[0], frozenset())
+        if char == "_":
+            kind = UNDERSCORE
+        elif char.isalnum():
+            kind = WORD
+        else:
+            kind = SEPARATOR
+        symbol = self.ids.get((letters, kind))
+        if symbol is None:
+            symbol = self.ids[(letters, kind)] = len(self.classes)
+            self.classes.append((letters, kind))
+        self[code] = symbol
+        return symbol
+
 
 class ProfanityFilter:
+    """
+    Проверка текста на слова из списка с учётом окончаний, латиницы/цифр вместо букв
+    и разделителей между буквами ("ж.о.п.а").
+
+    Слова со всеми допустимыми окончаниями собираются в префиксное дерево. Текст переводится
+    через SymbolTable в классы символов и проходится один раз автоматом, состояния которого —
+    наборы узлов дерева; переходы между ними строятся при первой встрече и запоминаются.
+    Поэтому проверка линейна по длине сообщения и не зависит от размера словаря.
+
+    Дерево хранится упакованным (см. _pack_trie), и с cache_dir готовое дерево сохраняется
+    в файл, имя которого — хэш словаря и правил; следующий запуск с тем же словарём читает
+    его вместо сборки.
+    """
+
     ALLOWED_ENDINGS = [
         'а', 'ы', 'е', 'ой', 'ую', 'ою', 'и', 'у', 'ам', 'ах', 'ями', 'ях', 'ом', 'енция', 'онька', 'ище', 'астый'
     ]
+    VOWELS = 'аеиоуыэюяё'
+    # Какими символами в тексте может быть записана буква (каждый символ строки — вариант)
+    CHAR_MAP = {
+        'а': 'аa@4а́а̀', 'б': 'бb6', 'в': 'вvbw', 'г': 'гg',
+        'д': 'дd', 'е': 'еeё3е́ѐ', 'ё': 'ёe3', 'ж': 'жzh',
+        'з': 'з3z', 'и': 'иi1|!ії', 'й': 'йиi', 'к': 'кkqκ',
+        'л': 'лl', 'м': 'мm', 'н': 'нh', 'о': 'оo0',
+        'п': 'пpπ', 'р': 'рpr', 'с': 'сsc$', 'т': 'тt',
+        'у': 'уyu', 'ф': 'фfph', 'х': 'хxh%', 'ц': 'цc',
+        'ч': 'чch4', 'ш': 'шsh', 'щ': 'щsch', 'ь': "ьb'",
+        'ы': 'ыbi', 'ъ': 'ъb', 'э': 'эe', 'ю': 'юiu',
+        'я': 'яya'
+    }
+    # Сколько состояний автомата держать, прежде чем начать их строить заново
+    MAX_STATES = 10000
+    # Меняется вместе с форматом упакованного дерева, чтобы не читать старые файлы кэша
+    CACHE_FORMAT = 2
+    # Заголовок файла кэша: метка, ключ (хэш словаря), число форм, длины букв (UTF-8), offsets и terminal.
+    # За ним — сами буквы, offsets как uint32 little-endian и terminal; исполняемого в файле нет
+    CACHE_MAGIC = b"PROFTRIE"
+    CACHE_HEADER = struct.Struct("<8s16sIIII")
 
-    def __init__(self, badwords: Optional[List[str]] = None):
+    def __init__(self, badwords: Optional[List[str]] = None, cache_dir: Optional[str] = None):
         if badwords is None:
             badwords = self._load_default_badwords()
-        self.patterns = self._compile_patterns(badwords)
+        self.from_cache = False
+        trie = self._load_cached(badwords, cache_dir) if cache_dir else None
+        if trie is None:
+            forms = self._word_forms(badwords)
+            trie = (*self._pack_trie(forms), len(forms))
+            if cache_dir:
+                self._save_cached(badwords, cache_dir, trie)
+        self._use_trie(trie)
+
+    @classmethod
+    def from_trie(cls, trie: tuple) -> "ProfanityFilter":
+        """Фильтр из готового упакованного дерева (ProfanityFilter.trie), без словаря"""
+        profanity_filter = cls.__new__(cls)
+        profanity_filter.from_cache = False
+        profanity_filter._use_trie(trie)
+        return profanity_filter
+
+    @property
+    def trie(self) -> tuple:
+        return self._letters, self._offsets, self._terminal, self.pattern_count
+
+    def _use_trie(self, trie: tuple):
+        self._letters, self._offsets, self._terminal, self.pattern_count = trie
+        self._build_symbols()
+        self._reset_automaton()
 
     @staticmethod
     def _load_default_badwords(filepath: str = "badwords.txt") -> List[str]:
@@ -30,58 +141,394 @@ class ProfanityFilter:
             print(f"Файл '{filepath}' не найден.")
             return cls()
 
-    def _obfuscate(self, word: str) -> str:
-        char_map = {
-            'а': '[аa@4а́а̀]', 'б': '[бb6]', 'в': '[вvbw]', 'г': '[гg]',
-            'д': '[дd]', 'е': '[еeё3е́ѐ]', 'ё': '[ёe3]', 'ж': '[жzh]',
-            'з': '[з3z]', 'и': '[иi1|!ії]', 'й': '[йиi]', 'к': '[кkqκ]',
-            'л': '[лl]', 'м': '[мm]', 'н': '[нh]', 'о': '[оo0]',
-            'п': '[пpπ]', 'р': '[рpr]', 'с': '[сsc$]', 'т': '[тt]',
-            'у': '[уyu]', 'ф': '[фfph]', 'х': '[хxh%]', 'ц': '[цc]',
-            'ч': '[чch4]', 'ш': '[шsh]', 'щ': '[щsch]', 'ь': "[ьb']",
-            'ы': '[ыbi]', 'ъ': '[ъb]', 'э': '[эe]', 'ю': '[юiu]',
-            'я': '[яya]'
-        }
-        # Каждую букву заменить на паттерн + разрешить спецсимволы между буквами
-        return ''.join(char_map.get(c, re.escape(c)) + r'[\W_]*' for c in word.lower())
-
-    def _compile_patterns(self, words: List[str]) -> List[re.Pattern]:
-        vowels = 'аеиоуыэюяё'
-        patterns = []
+    @classmethod
+    def cache_key(cls, words: List[str]) -> str:
+        """Хэш словаря и всего, что влияет на дерево: окончаний, гласных, карты букв и формата"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (str(cls.CACHE_FORMAT), "\n".join(words), "\n".join(cls.ALLOWED_ENDINGS), cls.VOWELS,
+                     "\n".join(f"{letter}{chars}" for letter, chars in sorted(cls.CHAR_MAP.items()))):
+            digest.update(part.encode())
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _load_cached(self, words: List[str], cache_dir: str) -> Optional[tuple]:
+        key = self.cache_key(words)
+        path = os.path.join(cache_dir, f"profanity-{key}.trie")
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            trie = self._unpack_cached(data, key)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"[profanity] Cannot load cached filter {path}: {e}, rebuilding")
+            return None
+        self.from_cache = True
+        return trie
+
+    def _save_cached(self, words: List[str], cache_dir: str, trie: tuple):
+        key = self.cache_key(words)
+        name = f"profanity-{key}.trie"
+        letters, offsets, terminal, pattern_count = trie
+        letters = letters.encode()
+        offsets = array("I", offsets)
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = os.path.join(cache_dir, f".{name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(self.CACHE_HEADER.pack(self.CACHE_MAGIC, bytes.fromhex(key), pattern_count,
+                                               len(letters), len(offsets), len(terminal)))
+                f.write(letters)
+                offsets.tofile(f)
+                f.write(terminal)
+            os.replace(tmp_path, os.path.join(cache_dir, name))
+            # Файлы прежних словарей (и прежних форматов) больше не понадобятся
+            for old in os.listdir(cache_dir):
+                if old.startswith("profanity-") and old != name:
+                    os.remove(os.path.join(cache_dir, old))
+        except OSError as e:
+            logger.warning(f"[profanity] Cannot save compiled filter to {cache_dir}: {e}")
+
+    @classmethod
+    def _unpack_cached(cls, data: bytes, key: str) -> tuple:
+        """Дерево из файла кэша; ValueError, если заголовок не сходится с ключом или размером файла"""
+        magic, file_key, pattern_count, letters_size, offsets_count, terminal_size = cls.CACHE_HEADER.unpack_from(data)
+        if magic != cls.CACHE_MAGIC or file_key != bytes.fromhex(key):
+            raise ValueError("foreign or outdated cache file")
+        offsets = array("I")
+        if offsets.itemsize != 4:
+            raise ValueError(f"unsupported array itemsize {offsets.itemsize}")
+        position = cls.CACHE_HEADER.size
+        if len(data) != position + letters_size + offsets_count * 4 + terminal_size:
+            raise ValueError("truncated cache file")
+        letters = data[position:position + letters_size].decode()
+        position += letters_size
+        offsets.frombytes(data[position:position + offsets_count * 4])
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        terminal = data[position + offsets_count * 4:]
+        # Узлов столько же, сколько флагов terminal; последний offset — конец букв
+        if offsets_count != terminal_size + 1 or offsets[-1] != len(letters):
+            raise ValueError("inconsistent trie in cache file")
+        return letters, offsets, terminal, pattern_count
+
+    def _word_forms(self, words: List[str]) -> List[str]:
+        forms = {}
         for w in words:
+            w = w.lower()
             if not w:
                 continue
-
-            # Отделяем корень и возможное окончание
-            base = w
-            endings = []
-
-            # Если слово оканчивается на гласную — отделим корень и сделаем список окончаний
-            if w[-1] in vowels:
-                base = w[:-1]
-                endings = [w[-1]] + self.ALLOWED_ENDINGS
+            # Слово на гласную: корень без неё плюс исходное или одно из допустимых окончаний;
+            # на согласную — допускаем и без окончания
+            if w[-1] in self.VOWELS:
+                base, endings = w[:-1], [w[-1]] + self.ALLOWED_ENDINGS
             else:
-                endings = self.ALLOWED_ENDINGS + ['']  # допускаем и без окончания
+                base, endings = w, self.ALLOWED_ENDINGS + ['']
+            for ending in endings:
+                forms.setdefault(base + ending)
+        return list(forms)
 
-            base_pattern = self._obfuscate(base)
+    @staticmethod
+    def _pack_trie(forms: List[str]) -> Tuple[str, array, bytes]:
+        """
+        Префиксное дерево форм в плоском виде, узлы пронумерованы обходом в ширину: буквы детей
+        узла n — letters[offsets[n]:offsets[n + 1]], ребёнок по букве на позиции i — узел i + 1,
+        terminal[n] — на узле n заканчивается форма. Такое дерево занимает мало памяти
+        и сохраняется/читается без сборки сотен тысяч словарей.
+        """
+        children: List[Dict[str, int]] = [{}]
+        ends = [False]
+        for form in forms:
+            node = ROOT
+            for letter in form:
+                child = children[node].get(letter)
+                if child is None:
+                    child = children[node][letter] = len(children)
+                    children.append({})
+                    ends.append(False)
+                node = child
+            ends[node] = True
+
+        order, letters, offsets = [ROOT], [], array("I")
+        for node in order:  # order растёт по ходу обхода
+            offsets.append(len(letters))
+            for letter, child in sorted(children[node].items()):
+                letters.append(letter)
+                order.append(child)
+        offsets.append(len(letters))
+        return "".join(letters), offsets, bytes(ends[node] for node in order)
 
-            # Сформируем паттерн для всех окончаний с обфускацией
-            endings_patterns = [self._obfuscate(e) for e in endings]
+    def _build_symbols(self):
+        # Обратная карта: символ текста -> буквы словаря, которые он может изображать
+        variants: Dict[str, set] = {}
+        for letter in set(self._letters):
+            for char in self.CHAR_MAP.get(letter, letter):
+                variants.setdefault(char, set()).add(letter)
+        self._symbols = SymbolTable({char: frozenset(letters) for char, letters in variants.items()})
 
-            # Допустим ровно одно окончание из списка (или пустое)
-            endings_regex = '(?:' + '|'.join(endings_patterns) + ')'
+    def _reset_automaton(self):
+        # Состояние: (активные узлы дерева, предыдущий символ — \w, найдена форма и ждём конца слова)
+        self._states: List[Tuple[FrozenSet[int], bool, bool]] = []
+        self._state_ids: Dict[Tuple[FrozenSet[int], bool, bool], int] = {}
+        self._transitions: List[Dict[str, int]] = []
+        self._start = self._state(frozenset(), False, False)
 
-            full_pattern = rf'(?<!\w){base_pattern}{endings_regex}(?!\w)'
+    def _state(self, active: FrozenSet[int], after_word: bool, pending: bool) -> int:
+        key = (active, after_word, pending)
+        state = self._state_ids.get(key)
+        if state is None:
+            state = self._state_ids[key] = len(self._states)
+            self._states.append(key)
+            self._transitions.append({})
+        return state
 
-            patterns.append(re.compile(full_pattern, re.IGNORECASE))
-        return patterns
+    def _step(self, state: int, symbol: str) -> int:
+        active, after_word, pending = self._states[state]
+        letters, kind = self._symbols.classes[ord(symbol)]
+        if pending and kind == SEPARATOR:
+            # Форма закончилась перед не-буквой — как (?!\w) после окончания
+            target = MATCH
+        else:
+            advanced = set()
+            # Новое слово может начаться только не сразу после буквы — как (?<!\w)
+            for node in active if after_word else (*active, ROOT):
+                start, end = self._offsets[node], self._offsets[node + 1]
+                for letter in letters:
+                    position = self._letters.find(letter, start, end)
+                    if position >= 0:
+                        advanced.add(position + 1)
+            # Разделители между буквами пропускаются, буква без продолжения обрывает совпадение
+            kept = advanced | active if kind != WORD else advanced
+            found = any(self._terminal[node] for node in advanced) or (pending and kind == UNDERSCORE)
+            target = self._state(frozenset(kept), kind != SEPARATOR, found)
+        self._transitions[state][symbol] = target
+        return target
 
     def contains_profanity(self, text: str) -> bool:
         text = text.strip()
         if not text:
             return False
-        return any(p.search(text) for p in self.patterns)
+        if len(self._states) > self.MAX_STATES:
+            self._reset_automaton()
+
+        state = self._start
+        transitions = self._transitions
+        for symbol in text.translate(self._symbols):
+            target = transitions[state].get(symbol)
+            if target is None:
+                target = self._step(state, symbol)
+            if target == MATCH:
+                return True
+            state = target
+        # Текст кончился сразу после формы
+        return self._states[state][2]
+
+    def find_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Где в тексте найдены слова: [(начало, конец), ...] по позициям исходной строки,
+        пересекающиеся совпадения объединены. Тот же проход, что и contains_profanity,
+        но с позицией начала у каждого узла и без кэша переходов — только для текстов,
+        где что-то нашлось.
+        """
+        if not self.contains_profanity(text):
+            return []
+
+        spans = []
+        active: Dict[int, int] = {}  # узел дерева -> самое раннее начало совпадения
+        pending: List[Tuple[int, int]] = []
+        after_word = False
+        for index, symbol in enumerate(text.translate(self._symbols)):
+            letters, kind = self._symbols.classes[ord(symbol)]
+            if kind == SEPARATOR:
+                spans += pending
+            if kind != UNDERSCORE:
+                pending = []
+            if not letters and (not active or kind == WORD):
+                # Символ не продолжает и не начинает ни одного слова
+                active, after_word = {} if kind == WORD else active, kind != SEPARATOR
+                continue
+
+            advanced: Dict[int, int] = {}
+            for node, start in (*active.items(), *(() if after_word else ((ROOT, index),))):
+                begin, end = self._offsets[node], self._offsets[node + 1]
+                for letter in letters:
+                    position = self._letters.find(letter, begin, end)
+                    if position >= 0 and advanced.get(position + 1, index + 1) > start:
+                        advanced[position + 1] = start
+            pending += [(start, index + 1) for node, start in advanced.items() if self._terminal[node]]
+            if kind != WORD:
+                for node, start in active.items():
+                    if advanced.get(node, index + 1) > start:
+                        advanced[node] = start
+            active, after_word = advanced, kind != SEPARATOR
+        spans += pending
+
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        return merged
 
     def check_and_raise(self, text: str):
         if self.contains_profanity(text):
             raise ValueError("Сообщение содержит запрещённые слова и не может быть отправлено.")
+
+    def screen_many(
+        self, texts: Iterable[str], workers: Optional[int] = None, chunk_size: int = 500
+    ) -> Iterator["ScreenResult"]:
+        """
+        Проверить много текстов (например, весь архив обращений после обновления словаря).
+        Тексты читаются из texts по мере надобности пачками по chunk_size и раздаются пулу
+        из workers процессов (по умолчанию — по числу ядер), в работе не больше двух пачек
+        на процесс. Результаты отдаются в исходном порядке, по одному на текст.
+        workers=0 — проверять в текущем процессе, без пула.
+        """
+        texts = iter(texts)  # список тоже: islice по нему каждый раз начинал бы сначала
+        chunks = iter(lambda: list(islice(texts, chunk_size)), [])
+        offset = 0
+        if workers == 0:
+            for chunk in chunks:
+                for index, spans in enumerate(map(self.find_spans, chunk), start=offset):
+                    yield ScreenResult(index, spans)
+                offset += len(chunk)
+            return
+
+        workers = workers or os.cpu_count() or 1
+        # spawn, а не fork: в боте работают потоки, форк мог бы унести в дочерний процесс чужие блокировки
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.trie,)
+        ) as pool:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(_screen_chunk, chunk))
+                if len(in_flight) >= workers * 2:
+                    for spans in in_flight.popleft().result():
+                        yield ScreenResult(offset, spans)
+                        offset += 1
+            while in_flight:
+                for spans in in_flight.popleft().result():
+                    yield ScreenResult(offset, spans)
+                    offset += 1
+
+
+@dataclass
+class ScreenResult:
+    """Результат screen_many для одного текста: его номер во входных данных и найденные места"""
+    index: int
+    spans: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def matched(self) -> bool:
+        return bool(self.spans)
+
+
+# Фильтр внутри процесса пула screen_many, собирается из дерева один раз на процесс
+_worker_filter: Optional[ProfanityFilter] = None
+
+
+def _init_worker(trie: tuple):
+    global _worker_filter
+    _worker_filter = ProfanityFilter.from_trie(trie)
+
+
+def _screen_chunk(chunk: List[str]) -> List[List[Tuple[int, int]]]:
+    return [_worker_filter.find_spans(text) for text in chunk]
+
+
+@dataclass
+class FilterInfo:
+    """Что загружено в общий фильтр сейчас"""
+    path: str
+    words: int = 0
+    patterns: int = 0
+    compile_seconds: float = 0.0
+    loaded_at: float = 0.0
+    reloads: int = 0
+    from_cache: bool = False
+
+
+class SharedProfanityFilter:
+    """
+    Один скомпилированный ProfanityFilter на процесс вместо сборки на каждое сообщение.
+    Не чаще раза в check_interval секунд сверяет mtime и размер файла со словами;
+    если файл изменился, собирает новый фильтр целиком и только потом подменяет ссылку,
+    поэтому проверки никогда не видят наполовину собранный список. Если файл пропал
+    или не читается, остаётся прежний фильтр.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0, cache_dir: Optional[str] = None):
+        self.path = path
+        self.check_interval = check_interval
+        self.cache_dir = cache_dir
+        self.info = FilterInfo(path=path)
+        self._filter: Optional[ProfanityFilter] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature: Tuple[int, int]) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                words = [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            logger.error(f"[profanity] Cannot read {self.path}: {e}, keeping the current word list")
+            return
+
+        started = time.perf_counter()
+        new_filter = ProfanityFilter(badwords=words, cache_dir=self.cache_dir)
+        elapsed = time.perf_counter() - started
+
+        reloaded = self._filter is not None
+        self._filter, self._signature = new_filter, signature
+        self.info = FilterInfo(
+            path=self.path, words=len(words), patterns=new_filter.pattern_count, compile_seconds=elapsed,
+            loaded_at=time.time(), reloads=self.info.reloads + reloaded, from_cache=new_filter.from_cache
+        )
+        logger.info(
+            f"[profanity] {'Reloaded' if reloaded else 'Loaded'} {len(words)} words from {self.path}: "
+            f"{self.info.patterns} patterns {'loaded from cache' if new_filter.from_cache else 'compiled'} "
+            f"in {elapsed * 1000:.1f} ms"
+        )
+
+    def get(self) -> ProfanityFilter:
+        """Текущий фильтр; при необходимости перечитывает файл"""
+        now = time.monotonic()
+        if self._filter is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            signature = self._file_signature()
+            if signature is not None and signature != self._signature:
+                self._load(signature)
+            elif signature is None and self._filter is None:
+                logger.warning(f"[profanity] Word list {self.path} not found, the filter is empty")
+                self._filter = ProfanityFilter(badwords=[])
+        return self._filter
+
+    def contains_profanity(self, text: str) -> bool:
+        return self.get().contains_profanity(text)
+
+    def check_and_raise(self, text: str):
+        self.get().check_and_raise(text)
+
+    def screen_many(self, texts: Iterable[str], **kwargs) -> Iterator[ScreenResult]:
+        """
+        screen_many на отдельном экземпляре фильтра с тем же деревом: автомат общего фильтра
+        достраивается во время проверок без блокировок, а массовую проверку обычно запускают
+        в отдельном потоке, пока бот проверяет сообщения
+        """
+        return ProfanityFilter.from_trie(self.get().trie).screen_many(texts, **kwargs)
+
+
+profanity_filter = SharedProfanityFilter(
+    config.BADWORDS_FILE, check_interval=config.BADWORDS_CHECK_INTERVAL, cache_dir=config.BADWORDS_CACHE_DIR or None
+)
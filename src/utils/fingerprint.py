@@ -0,0 +1,33 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+FINGERPRINT_SIZE = 8  # байт -> 16 hex-символов в Redis
+
+
+def fingerprint(value: Optional[str]) -> str:
+    """Короткий хэш содержимого (blake2b); для пустого значения — пустая строка"""
+    if not value:
+        return ""
+    return hashlib.blake2b(value.encode(), digest_size=FINGERPRINT_SIZE).hexdigest()
+
+
+def keyboard_fingerprint(keyboard: Any) -> str:
+    """Хэш клавиатуры aiogram: одинаковые кнопки дают одинаковый хэш независимо от порядка ключей"""
+    if keyboard is None:
+        return ""
+    dump = keyboard.model_dump(exclude_none=True) if hasattr(keyboard, "model_dump") else keyboard
+    return fingerprint(json.dumps(dump, sort_keys=True, ensure_ascii=False, separators=(",", ":")))
+
+
+def screen_fingerprint(text: str, image: str, keyboard: Any) -> Dict[str, str]:
+    """
+    Что сохранить в состоянии об отрисованном экране: вместо полного текста и
+    сериализованной клавиатуры — их хэши. Проверка "нужно ли редактировать" —
+    сравнение с fingerprint(text) / keyboard_fingerprint(keyboard).
+    """
+    return {
+        "last_text": fingerprint(text),
+        "last_image": image,
+        "last_keyboard": keyboard_fingerprint(keyboard),
+    }
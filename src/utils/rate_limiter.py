@@ -0,0 +1,79 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+class RateLimitExceeded(Exception):
+    """Запрос пришлось бы ждать дольше допустимого"""
+
+
+@dataclass
+class LimiterStats:
+    acquired: int = 0
+    waited: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    rejected: int = 0
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.waited if self.waited else 0.0
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket.
+    Пополняется со скоростью rate_per_minute токенов в минуту, вмещает не больше capacity.
+    Запросы сверх лимита не падают, а ждут своей очереди (FIFO); если ожидание
+    превысило бы max_wait секунд, запрос отклоняется с RateLimitExceeded.
+
+    Токен резервируется сразу при вызове: баланс может уйти в минус, и каждый следующий
+    запрос видит всю очередь перед собой — по ней и считается ожидание для max_wait.
+    Ждут запросы уже без блокировок, а в stats попадает реальное время от вызова до токена.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, max_wait: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.max_wait = max_wait
+        self.stats = LimiterStats()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return max(0.0, self._tokens)
+
+    async def acquire(self) -> float:
+        """Взять токен; возвращает, сколько секунд пришлось ждать"""
+        started = time.monotonic()
+        # Резерв без await между проверкой и списанием — атомарен в event loop
+        self._refill()
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+        if self.max_wait is not None and wait > self.max_wait:
+            self.stats.rejected += 1
+            raise RateLimitExceeded(f"Rate limit wait {wait:.1f}s exceeds {self.max_wait:.1f}s")
+        self._tokens -= 1
+        self.stats.acquired += 1
+        if not wait:
+            return 0.0
+
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Токен так и не понадобился — вернуть его очереди
+            self._tokens += 1
+            self.stats.acquired -= 1
+            raise
+        waited = time.monotonic() - started
+        self.stats.waited += 1
+        self.stats.total_wait += waited
+        self.stats.max_wait = max(self.stats.max_wait, waited)
+        return waited
@@ -1,9 +1,15 @@
 import pytest
 from src.utils.filter_profanity import ProfanityFilter
 
+# Словарь для тестов: рабочий badwords.txt в репозиторий не входит
+TEST_BADWORDS = ["жопа", "хуй"]
+
+
 @pytest.fixture
-def filter():
-    return ProfanityFilter.from_file("badwords.txt")
+def filter(tmp_path):
+    path = tmp_path / "badwords.txt"
+    path.write_text("\n".join(TEST_BADWORDS) + "\n", encoding="utf-8")
+    return ProfanityFilter.from_file(str(path))
 
 # === Мат должен детектиться ===
 @pytest.mark.parametrize("text", [
@@ -102,3 +108,86 @@ def test_sentence_cases(filter, text, should_fail):
             filter.check_and_raise(text)
     else:
         filter.check_and_raise(text)
+
+
+# === Длинные цепочки разделителей и почти-совпадения ===
+def test_long_separator_runs(filter):
+    assert filter.contains_profanity("ж" + "._" * 5000 + "опа")
+    assert not filter.contains_profanity("ж" + "._" * 5000 + "оп")
+    assert not filter.contains_profanity("жоп " * 2000 + "жопация")
+
+
+# === Места совпадений и пакетная проверка ===
+def test_find_spans(filter):
+    text = "Это ж.о.п.а, на хуй, жопация"
+    assert [text[start:end] for start, end in filter.find_spans(text)] == ["ж.о.п.а", "хуй"]
+    assert filter.find_spans("привет") == []
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+@pytest.mark.parametrize("source", [list, iter], ids=["list", "iterator"])
+def test_screen_many(filter, workers, source):
+    texts = ["привет", "ж0п@ мира", "", "на хуй"] * 3
+    results = list(filter.screen_many(source(texts), workers=workers, chunk_size=5))
+    assert [r.index for r in results] == list(range(len(texts)))
+    assert [r.matched for r in results] == [False, True, False, True] * 3
+    assert results[1].spans == [(0, 4)]
+
+
+# === Собранный фильтр сохраняется и читается из кэша ===
+def test_compiled_filter_cache(tmp_path):
+    words = ["жопа", "хуй"]
+    built = ProfanityFilter(words, cache_dir=str(tmp_path))
+    loaded = ProfanityFilter(words, cache_dir=str(tmp_path))
+    assert not built.from_cache and loaded.from_cache
+    assert loaded.pattern_count == built.pattern_count
+    for text in ("ж0п@ мира", "на хуй", "жопация", "привет"):
+        assert loaded.contains_profanity(text) == built.contains_profanity(text)
+
+    # Другой словарь — другой файл, старый удаляется
+    assert not ProfanityFilter(["редиска"], cache_dir=str(tmp_path)).from_cache
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_damaged_cache_file_is_rebuilt(tmp_path):
+    words = ["жопа", "хуй"]
+    ProfanityFilter(words, cache_dir=str(tmp_path))
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(path.read_bytes()[:-3])
+
+    rebuilt = ProfanityFilter(words, cache_dir=str(tmp_path))
+    assert not rebuilt.from_cache
+    assert rebuilt.contains_profanity("ж0п@ мира")
+    assert ProfanityFilter(words, cache_dir=str(tmp_path)).from_cache
+
+
+# === Общий фильтр перечитывает изменённый файл ===
+def test_shared_filter_reloads_changed_file(tmp_path):
+    from src.utils.filter_profanity import SharedProfanityFilter
+
+    path = tmp_path / "words.txt"
+    path.write_text("жопа\n", encoding="utf-8")
+    shared = SharedProfanityFilter(str(path), check_interval=0)
+    assert shared.contains_profanity("жопа")
+    assert shared.info.words == 1 and shared.info.patterns > 1 and shared.info.reloads == 0
+
+    path.write_text("редиска\nзараза\n", encoding="utf-8")
+    assert not shared.contains_profanity("жопа")
+    assert shared.contains_profanity("редиска")
+    assert shared.info.words == 2 and shared.info.reloads == 1
+
+    # Пропавший файл не сбрасывает загруженный список
+    path.unlink()
+    assert shared.contains_profanity("зараза")
+
+
+def test_shared_screen_many_uses_its_own_automaton(tmp_path):
+    from src.utils.filter_profanity import SharedProfanityFilter
+
+    path = tmp_path / "words.txt"
+    path.write_text("жопа\n", encoding="utf-8")
+    shared = SharedProfanityFilter(str(path), check_interval=0)
+    states = len(shared.get()._states)
+    # Массовая проверка идёт в отдельном потоке и не достраивает автомат общего фильтра
+    assert [r.matched for r in shared.screen_many(["ж0п@ мира", "привет"], workers=0)] == [True, False]
+    assert len(shared.get()._states) == states
@@ -0,0 +1,22 @@
+import pytest
+import src.services.google_sheets as gs
+from src.services.sheets_fake import FakeSpreadsheet
+from src.services.sheets_outbox import SheetsOutbox
+from src.services.state_backend import MemoryBackend
+from src.utils.rate_limiter import TokenBucket
+
+
+@pytest.fixture
+def sheets(monkeypatch, tmp_path):
+    spreadsheet = FakeSpreadsheet()
+    connection = gs.SheetsConnection()
+    connection.use(spreadsheet)
+
+    monkeypatch.setattr(gs, "redis_client", MemoryBackend())
+    monkeypatch.setattr(gs, "connection", connection)
+    monkeypatch.setattr(gs, "partitions", gs.SheetPartitions(mode="month"))
+    monkeypatch.setattr(gs, "stats", gs.SheetsStats())
+    monkeypatch.setattr(gs, "rate_limiter", TokenBucket(rate_per_minute=60_000))
+    monkeypatch.setattr(gs, "write_queue", gs.SheetsWriteQueue(SheetsOutbox(str(tmp_path / "outbox.sqlite3"))))
+    return spreadsheet
+
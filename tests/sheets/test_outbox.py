@@ -0,0 +1,65 @@
+import pytest
+from src.services.sheets_outbox import SheetsOutbox, OutboxFullError
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return SheetsOutbox(str(tmp_path / "outbox.sqlite3"), max_entries=3)
+
+
+@pytest.mark.asyncio
+async def test_entries_are_returned_in_insertion_order(outbox):
+    await outbox.add("a", "append", {"row": [1]})
+    await outbox.add("b", "close", {"user_id": "1"})
+
+    entries = await outbox.peek(10)
+
+    assert [e.op_id for e in entries] == ["a", "b"]
+    assert entries[0].payload == {"row": [1]}
+    assert outbox.depth == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicate_op_id_is_ignored(outbox):
+    await outbox.add("a", "append", {})
+    await outbox.add("a", "append", {})
+    assert outbox.depth == 1
+
+
+@pytest.mark.asyncio
+async def test_ack_removes_entries(outbox):
+    await outbox.add("a", "append", {})
+    await outbox.add("b", "append", {})
+    first, _ = await outbox.peek(10)
+
+    await outbox.ack([first.id])
+
+    assert [e.op_id for e in await outbox.peek(10)] == ["b"]
+    assert outbox.depth == 1
+
+
+@pytest.mark.asyncio
+async def test_full_outbox_rejects_new_entries(outbox):
+    for op_id in "abc":
+        await outbox.add(op_id, "append", {})
+    with pytest.raises(OutboxFullError):
+        await outbox.add("d", "append", {})
+
+
+@pytest.mark.asyncio
+async def test_entries_survive_reopen(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    box = SheetsOutbox(path)
+    await box.add("a", "append", {"row": ["x"]})
+    await box.mark_attempt([1])
+    await box.record_error([1], "429")
+    await box.close()
+
+    reopened = SheetsOutbox(path)
+    assert await reopened.open() == 1
+    entry, = await reopened.peek(10)
+    assert entry.attempts == 1
+    stats = await reopened.stats()
+    assert stats.pending == 1
+    assert stats.last_error == "429"
+    await reopened.close()
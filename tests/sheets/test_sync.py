@@ -0,0 +1,83 @@
+import pytest
+import src.services.google_sheets as gs
+
+
+def partition(spreadsheet):
+    title, = [t for t in spreadsheet.sheets if t.startswith("Обращения ")]
+    return title, spreadsheet.sheets[title]
+
+
+async def open_tickets(*user_ids):
+    for user_id in user_ids:
+        await gs.append_feedback_to_sheet(user_id, "user", "Другое", "текст")
+        await gs.redis_client.hset(f"feedback_lock:{{{user_id}}}", "x", "1")
+    await gs.write_queue.flush()
+
+
+@pytest.mark.asyncio
+async def test_manual_close_unlocks_user_and_drops_index(sheets):
+    await open_tickets(1, 2)
+    sync = gs.SheetsSync()
+    assert await sync.poll() == 0
+
+    _, rows = partition(sheets)
+    rows[1][gs.STATUS_COL] = "Вопрос закрыт"
+
+    assert await sync.poll() == 1
+    assert await gs.row_index.get(1) is None
+    assert await gs.row_index.get(2) is not None
+    assert not await gs.redis_client.exists("feedback_lock:{1}")
+    assert await gs.redis_client.exists("feedback_lock:{2}")
+    assert gs.stats.manual_closes == 1
+
+
+@pytest.mark.asyncio
+async def test_poll_is_one_read_of_bounded_ranges(sheets):
+    await open_tickets(*range(10))
+    sync = gs.SheetsSync(tail_rows=5, max_rows=3)
+    before = sheets.calls.get("get_values", 0)
+
+    await sync.poll()
+    await sync.poll()
+
+    assert sheets.calls["get_values"] - before == 2
+    title, rows = partition(sheets)
+    hwm = await gs.redis_client.hget(sync.hwm_key, title)
+    assert int(hwm) == len(rows)
+
+
+@pytest.mark.asyncio
+async def test_shifted_rows_trigger_index_rebuild(sheets):
+    await open_tickets(1, 2)
+    sync = gs.SheetsSync()
+
+    _, rows = partition(sheets)
+    rows[1], rows[2] = rows[2], rows[1]
+
+    assert await sync.poll() == 0
+    title, _ = partition(sheets)
+    assert await gs.row_index.get(1) == (title, 3)
+    assert await gs.row_index.get(2) == (title, 2)
+
+
+@pytest.mark.asyncio
+async def test_bot_close_during_poll_is_not_manual(sheets, monkeypatch):
+    await open_tickets(1, 2)
+    sync = gs.SheetsSync()
+    assert await sync.poll() == 0
+
+    # Закрытие бота доходит до таблицы между чтением индекса и get_values,
+    # а пользователь сразу открывает новое обращение
+    await gs.update_feedback_in_sheet(1, "Ответ", 7)
+    get_values = sheets.get_values
+
+    async def racing_get_values(ranges):
+        monkeypatch.setattr(sheets, "get_values", get_values)
+        await gs.write_queue.flush()
+        await gs.redis_client.hset("feedback_lock:{1}", "x", "1")
+        return await get_values(ranges)
+
+    monkeypatch.setattr(sheets, "get_values", racing_get_values)
+    assert await sync.poll() == 0
+    assert await gs.redis_client.exists("feedback_lock:{1}")
+    assert gs.stats.manual_closes == 0
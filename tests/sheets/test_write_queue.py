@@ -0,0 +1,118 @@
+import pytest
+from datetime import datetime
+import src.services.google_sheets as gs
+from src.services.sheets_api import SheetsApiError
+
+
+def partition(spreadsheet):
+    title, = [t for t in spreadsheet.sheets if t.startswith("Обращения ")]
+    return spreadsheet.sheets[title]
+
+
+@pytest.mark.asyncio
+async def test_appends_are_batched_into_one_call(sheets):
+    for user_id in range(5):
+        await gs.append_feedback_to_sheet(user_id, "user", "Другое", "текст")
+
+    assert await gs.write_queue.flush() == 5
+
+    # Заголовок нового листа и одна пачка строк; все вызовы прошли через _sheets_call
+    assert sheets.calls["append_rows"] == 2
+    assert gs.stats.api_calls == sheets.total_calls
+    rows = partition(sheets)
+    assert rows[0] == gs.SHEET_HEADER
+    assert [row[gs.USER_ID_COL] for row in rows[1:]] == ["0", "1", "2", "3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_closes_use_row_index_and_one_batch_update(sheets):
+    await gs.append_feedback_to_sheet(1, "user", "Другое", "первый")
+    await gs.append_feedback_to_sheet(2, "user", "Другое", "второй")
+    await gs.write_queue.flush()
+
+    await gs.update_feedback_in_sheet(1, "ответ 1", 10, "admin")
+    await gs.update_feedback_in_sheet(2, "ответ 2", 10, "admin")
+    await gs.write_queue.flush()
+
+    assert sheets.calls["batch_update"] == 1
+    assert "get_values" not in sheets.calls
+    rows = partition(sheets)
+    assert [row[gs.STATUS_COL] for row in rows[1:]] == ["Вопрос закрыт", "Вопрос закрыт"]
+    assert rows[1][6] == "ответ 1"
+
+
+@pytest.mark.asyncio
+async def test_close_rebuilds_missing_index_with_one_read(sheets):
+    await gs.append_feedback_to_sheet(1, "user", "Другое", "текст")
+    await gs.write_queue.flush()
+    await gs.redis_client.delete(gs.SHEET_ROW_INDEX_KEY)
+
+    await gs.update_feedback_in_sheet(1, "ответ", 10, "admin")
+    await gs.write_queue.flush()
+
+    assert sheets.calls["get_values"] == 1
+    assert partition(sheets)[1][gs.STATUS_COL] == "Вопрос закрыт"
+
+
+@pytest.mark.asyncio
+async def test_close_without_row_stays_in_outbox_until_row_appears(sheets):
+    await gs.update_feedback_in_sheet(1, "ответ", 10, "admin")
+    with pytest.raises(gs.TicketRowNotFound):
+        await gs.write_queue.flush()
+    assert gs.write_queue.depth == 1
+
+    # Строка появилась на листе позже (например, её дописали вручную) — закрытие доходит
+    today = datetime.now().strftime("%Y-%m-%d")
+    title = await gs.partitions.resolve(today)
+    row = [today, "12:00:00", "1", "user", "Другое", "текст", "", "", "", gs.STATUS_OPEN, "t1"]
+    await sheets.append_rows(title, [row])
+    assert await gs.write_queue.flush() == 1
+    assert gs.write_queue.depth == 0
+    assert sheets.sheets[title][-1][gs.STATUS_COL] == "Вопрос закрыт"
+
+
+@pytest.mark.asyncio
+async def test_close_without_row_is_dropped_after_max_attempts(sheets):
+    gs.write_queue.max_close_attempts = 2
+    await gs.update_feedback_in_sheet(1, "ответ", 10, "admin")
+    with pytest.raises(gs.TicketRowNotFound):
+        await gs.write_queue.flush()
+    await gs.write_queue.flush()
+    assert gs.write_queue.depth == 0
+    assert "batch_update" not in sheets.calls
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_ops_in_outbox(sheets):
+    await gs.append_feedback_to_sheet(1, "user", "Другое", "текст")
+
+    sheets.error_rate = 1.0
+    with pytest.raises(SheetsApiError):
+        await gs.write_queue.flush()
+    assert gs.write_queue.depth == 1
+
+    sheets.error_rate = 0.0
+    await gs.write_queue.flush()
+    assert gs.write_queue.depth == 0
+    assert len(partition(sheets)) == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_lost_response_does_not_duplicate_rows(sheets):
+    await gs.append_feedback_to_sheet(1, "user", "Другое", "текст")
+
+    original = sheets.append_rows
+
+    async def append_then_timeout(title, rows):
+        await original(title, rows)
+        raise SheetsApiError(503, "Timeout")
+
+    sheets.append_rows = append_then_timeout
+    with pytest.raises(SheetsApiError):
+        await gs.write_queue.flush()
+
+    sheets.append_rows = original
+    await gs.write_queue.flush()
+
+    assert len(partition(sheets)) == 2
+    assert await gs.row_index.get(1) is not None
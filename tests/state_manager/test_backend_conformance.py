@@ -0,0 +1,182 @@
+"""
+Общие тесты хранилищ StateManager: каждый тест выполняется на MemoryBackend и, если задан
+REDIS_TEST_URL (например redis://localhost:6379/15 — база будет очищена), на настоящем Redis.
+Обе раскладки данных: отдельные ключи и сводный хэш user:{id} с эмуляцией TTL полей.
+"""
+import asyncio
+import json
+import os
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+
+from src.services import redis_scripts
+from src.services.redis_scripts import ADMIT_BLOCKED, ADMIT_LOCKED, ADMIT_OK
+from src.services.state_backend import MemoryBackend
+from src.services.state_layout import UserHashLayout
+from src.services.state_manager import StateManager, state_cache
+from src.utils import config
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL")
+
+
+@pytest_asyncio.fixture(params=[
+    ("memory", None), ("memory", "native"), ("memory", "emulated"), ("redis", None), ("redis", "emulated"),
+], ids=lambda p: f"{p[0]}-{p[1] or 'keys'}")
+async def backend(request, monkeypatch):
+    kind, field_ttl = request.param
+    if kind == "redis":
+        if not REDIS_TEST_URL:
+            pytest.skip("REDIS_TEST_URL не задан")
+        client = redis.Redis.from_url(REDIS_TEST_URL, decode_responses=True)
+        await client.flushdb()
+    else:
+        client = MemoryBackend()
+
+    monkeypatch.setattr("src.services.state_manager.redis_client", client)
+    monkeypatch.setattr(redis_scripts, "redis_client", client)
+    for name, script in redis_scripts.SCRIPTS.items():
+        monkeypatch.setattr(redis_scripts, name, client.register_script(script.script))
+    monkeypatch.setattr("src.services.state_manager.layout", UserHashLayout(field_ttl) if field_ttl else None)
+    await redis_scripts.load_scripts()
+    yield client
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_state_round_trip(backend):
+    sm = StateManager(user_id=1)
+    await sm.save_state(menu_message_id=10, is_named=True, skipped=None)
+    assert await sm.get_state() == {"menu_message_id": "10", "is_named": True}
+    assert await sm.get_state_field("is_named") is True
+
+    await sm.delete_state_field("is_named")
+    assert await sm.get_state() == {"menu_message_id": "10"}
+
+
+@pytest.mark.asyncio
+async def test_flags_expire(backend):
+    sm = StateManager(user_id=2)
+    await sm.set_feedback_type("Другое", expire=1)
+    await sm.lock_user(expire=1)
+    await sm.block_user(expire=1)
+    await sm.set_admin_reply_target(5, expire=100)
+    assert await sm.get_feedback_type() == "Другое"
+    assert await sm.is_blocked() and not await sm.can_create_feedback()
+
+    await asyncio.sleep(1.1)
+    assert await sm.get_feedback_type() is None
+    assert not await sm.is_blocked() and await sm.can_create_feedback()
+    assert await sm.get_admin_reply_target() == 5
+
+
+@pytest.mark.asyncio
+async def test_permanent_flags_outlive_idle_state(backend, monkeypatch):
+    monkeypatch.setattr(config, "USER_STATE_TTL", 1)
+    sm = StateManager(user_id=4)
+    await sm.block_user()
+    await sm.set_admin_reply_target(6, expire=100)
+    await sm.lock_user(expire=100)
+    await sm.save_state(menu_message_id=1)
+
+    await asyncio.sleep(1.1)
+    assert await sm.get_state() == {}
+    assert await sm.is_blocked() and await sm.admit() == ADMIT_BLOCKED
+    assert await sm.get_admin_reply_target() == 6
+
+
+@pytest.mark.asyncio
+async def test_admission(backend):
+    sm = StateManager(user_id=3)
+    assert await sm.admit() == ADMIT_OK
+    assert await sm.admit(acquire=True) == ADMIT_OK
+    assert await sm.admit(acquire=True) == ADMIT_LOCKED
+
+    await sm.block_user()
+    assert await sm.admit() == ADMIT_BLOCKED
+    await sm.unblock_user()
+    await sm.unlock_user()
+    assert await sm.admit() == ADMIT_OK
+
+
+@pytest.mark.asyncio
+async def test_pipeline_survives_script_cache_loss(backend):
+    # Как после перезапуска Redis: SHA из load_scripts сервер уже не знает
+    await backend.script_flush()
+    async with redis_scripts.ScriptPipeline(backend) as pipe:
+        pipe.rpush("events:{5}", "before")
+        redis_scripts.queue(
+            pipe, redis_scripts.nav_push, ["nav_stack:{5}"],
+            [json.dumps({"screen": "faq", "params": {}}), 5, 60, json.dumps({"screen": "main", "params": {}})]
+        )
+        pipe.rpush("events:{6}", "other user")
+        pipe.delete("nav_stack:{5}")
+        assert await pipe.execute() == [1, 2, 1, 1]
+
+    # Выполненные команды не повторяются; DEL после скрипта того же пользователя — снова после него
+    assert await backend.lrange("events:{5}", 0, -1) == ["before"]
+    assert await backend.lrange("events:{6}", 0, -1) == ["other user"]
+    assert not await backend.exists("nav_stack:{5}")
+
+
+@pytest.mark.asyncio
+async def test_navigation(backend, monkeypatch):
+    monkeypatch.setattr(config, "NAV_STACK_MAX_DEPTH", 3)
+    sm = StateManager(user_id=4)
+    assert await sm.current_nav() == {"screen": "main", "params": {}}
+
+    for screen in ("a", "b", "c"):
+        await sm.push_nav(screen, {"n": screen})
+    # Глубина ограничена, корень остаётся
+    assert [e["screen"] for e in await sm.get_nav_stack()] == ["main", "b", "c"]
+
+    assert await sm.pop_nav() == {"screen": "b", "params": {"n": "b"}}
+    await sm.push_nav("c")
+    await sm.goto_nav("b", {"n": 2})
+    assert await sm.get_nav_stack() == [{"screen": "main", "params": {}}, {"screen": "b", "params": {"n": 2}}]
+    await sm.goto_nav("x")
+    assert await sm.current_nav() == {"screen": "x", "params": {}}
+
+    await sm.reset_nav()
+    assert await sm.go_back() == ("main", {})
+
+
+@pytest.mark.asyncio
+async def test_batch_and_clear_state(backend):
+    sm = StateManager(user_id=5)
+    async with sm.batch() as batch:
+        batch.save_state(type="Другое").set_feedback_type("Другое").set_admin_reply_target(9).lock_user()
+        batch.user(6).block_user()
+
+    checks = await (
+        sm.batch().get_state().get_feedback_type().is_blocked().can_create_feedback()
+        .user(6).is_blocked().execute()
+    )
+    assert checks["state"] == {"type": "Другое"}
+    assert checks["feedback_type"] == "Другое"
+    assert checks["can_create_feedback"] is False
+    # Имена результатов общие, поэтому is_blocked — последнего в очереди (пользователь 6)
+    assert checks["is_blocked"] is True
+
+    await sm.push_nav("feedback")
+    await sm.clear_state()
+    assert await sm.get_state() == {}
+    assert await sm.get_feedback_type() is None
+    assert await sm.get_admin_reply_target() is None
+    # Лок обращения и навигация clear_state не трогает
+    assert await sm.can_create_feedback() is False
+    assert (await sm.current_nav())["screen"] == "feedback"
+
+
+@pytest.mark.asyncio
+async def test_state_cache_flushes_on_exit(backend):
+    sm = StateManager(user_id=7)
+    await sm.save_state(menu_message_id=1)
+    async with state_cache():
+        await sm.touch()
+        await sm.save_state(last_image="menu")
+        assert await sm.get_state() == {"menu_message_id": "1", "last_image": "menu"}
+        assert await backend.hget(sm.state_key, "last_image") is None
+    assert await backend.hget(sm.state_key, "last_image") == "menu"
+    assert 0 < await backend.ttl(sm.state_key) <= config.USER_STATE_TTL
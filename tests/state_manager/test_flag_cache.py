@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.services.flag_cache import FlagCache
+from src.services.redis_scripts import ADMIT_OK
+from src.services.state_manager import StateManager
+
+
+def enabled_cache() -> FlagCache:
+    cache = FlagCache(ttl=60, max_size=100)
+    cache.enabled = True
+    return cache
+
+
+@pytest.mark.asyncio
+@patch("src.services.state_manager.redis_client", new_callable=AsyncMock)
+async def test_absent_admin_reply_target_is_served_until_keyspace_event(mock_redis):
+    cache = enabled_cache()
+    mock_redis.get.return_value = None
+    with patch("src.services.state_manager.flag_cache", cache):
+        sm = StateManager(user_id=7)
+        assert await sm.get_admin_reply_target() is None
+        assert await sm.get_admin_reply_target() is None
+        assert mock_redis.get.await_count == 1
+
+        # Другой процесс бота выставил флаг — пришло уведомление keyspace
+        cache._on_message({"type": "pmessage", "channel": "__keyspace@0__:admin_replying:{7}", "data": "set"})
+        mock_redis.get.return_value = "42"
+        assert await sm.get_admin_reply_target() == 42
+        assert mock_redis.get.await_count == 2
+
+
+def test_answer_read_before_invalidation_is_not_remembered():
+    cache = enabled_cache()
+    version = cache.version
+    cache.invalidate("blocked:{7}")  # уведомление пришло, пока запрос был в пути
+    cache.remember_absent("blocked:{7}", None, version)
+    assert not cache.known_absent("blocked:{7}")
+
+    cache._on_message({"type": "pmessage", "channel": "__keyspace@0__:blocked:{7}", "data": "del"})
+    cache.remember_absent("blocked:{7}", None, cache.version)
+    assert cache.known_absent("blocked:{7}")
+
+
+def test_invalidation_of_another_key_keeps_the_answer():
+    cache = enabled_cache()
+    version = cache.version
+    # Пока запрос про blocked:{7} был в пути, пришли уведомления о других пользователях
+    cache.invalidate("blocked:{8}")
+    cache.invalidate("user:{9}")
+    cache.remember_absent("blocked:{7}", None, version)
+    assert cache.known_absent("blocked:{7}")
+
+    cache.clear()
+    cache.remember_absent("blocked:{7}", None, version)
+    assert not cache.known_absent("blocked:{7}")
+
+
+@pytest.mark.asyncio
+@patch("src.services.state_manager.redis_scripts.admission", new_callable=AsyncMock)
+async def test_admit_precheck_uses_cache_and_acquire_invalidates_lock(mock_admission):
+    cache = enabled_cache()
+    mock_admission.return_value = ADMIT_OK
+    with patch("src.services.state_manager.flag_cache", cache):
+        sm = StateManager(user_id=7)
+        assert await sm.admit() == ADMIT_OK
+        assert await sm.admit() == ADMIT_OK
+        assert mock_admission.await_count == 1
+
+        await sm.admit(acquire=True)
+        assert not cache.known_absent(sm.lock_key)
+        assert cache.known_absent(sm.blocked_key)
@@ -0,0 +1,57 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.services.state_manager import NAV_ROOT_JSON, StateManager
+from src.utils import config
+
+
+@pytest.mark.asyncio
+@patch("src.services.redis_scripts.nav_push", new_callable=AsyncMock)
+async def test_push_nav_is_one_script_call_with_depth_and_ttl(mock_push):
+    sm = StateManager(user_id=42)
+    mock_push.return_value = 2
+    await sm.push_nav("identity_choice", {"category": "Другое"})
+
+    mock_push.assert_awaited_once_with(
+        keys=[sm.nav_stack_key],
+        args=[
+            json.dumps({"screen": "identity_choice", "params": {"category": "Другое"}}),
+            config.NAV_STACK_MAX_DEPTH, config.NAV_STACK_TTL, NAV_ROOT_JSON
+        ]
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.services.redis_scripts.nav_pop", new_callable=AsyncMock)
+async def test_go_back_returns_new_top(mock_pop):
+    sm = StateManager(user_id=42)
+    mock_pop.return_value = json.dumps({"screen": "identity_choice", "params": {"category": "Другое"}})
+
+    assert await sm.go_back() == ("identity_choice", {"category": "Другое"})
+    mock_pop.assert_awaited_once_with(keys=[sm.nav_stack_key], args=[config.NAV_STACK_TTL, NAV_ROOT_JSON])
+
+
+@pytest.mark.asyncio
+@patch("src.services.redis_scripts.nav_goto", new_callable=AsyncMock)
+async def test_goto_nav_replaces_params_only_when_given(mock_goto):
+    sm = StateManager(user_id=42)
+    await sm.goto_nav("main")
+    assert mock_goto.await_args.kwargs["args"][2] == "0"
+
+    await sm.goto_nav("feedback_prompt", {"feedback_type": "Другое"})
+    assert mock_goto.await_args.kwargs["args"][:3] == [
+        "feedback_prompt",
+        json.dumps({"screen": "feedback_prompt", "params": {"feedback_type": "Другое"}}),
+        "1",
+    ]
+
+
+@pytest.mark.asyncio
+@patch("src.services.state_manager.redis_client", new_callable=AsyncMock)
+async def test_read_nav_stack_skips_broken_entries(mock_redis):
+    sm = StateManager(user_id=42)
+    mock_redis.lrange.return_value = []
+    assert await sm.get_nav_stack() == [{"screen": "main", "params": {}}]
+
+    mock_redis.lrange.return_value = ['{"screen": "main", "params": {}}', "not json"]
+    assert await sm.get_nav_stack() == [{"screen": "main", "params": {}}]
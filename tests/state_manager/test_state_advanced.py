@@ -85,3 +85,15 @@ def test_synonyms_point_to_correct_methods():
     assert sm.unlock_feedback == sm.unlock_user
     assert sm.can_create_new == sm.can_create_feedback
     assert sm.can_create_new_feedback == sm.can_create_feedback
+
+@pytest.mark.asyncio
+@patch("src.services.redis_scripts.admission", new_callable=AsyncMock)
+async def test_admit_runs_script_with_lock_flag(mock_script):
+    sm = StateManager(user_id=42)
+    mock_script.return_value = "ok"
+    assert await sm.admit(acquire=True, expire=120) == "ok"
+    mock_script.assert_awaited_once_with(keys=[sm.blocked_key, sm.lock_key], args=["1", 120])
+
+    mock_script.return_value = b"blocked"
+    assert await sm.admit() == "blocked"
+    assert mock_script.await_args.kwargs["args"][0] == "0"
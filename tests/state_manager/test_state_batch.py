@@ -0,0 +1,73 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.services.state_manager import StateManager
+
+
+def make_redis(results):
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=results)
+    pipe.reset = AsyncMock()
+    redis = MagicMock()
+    redis.pipeline.return_value = pipe
+    return redis, pipe
+
+
+@pytest.mark.asyncio
+async def test_batch_reads_are_sent_in_one_pipeline():
+    redis, pipe = make_redis([1, 0, [json.dumps({"screen": "main", "params": {}})]])
+    with patch("src.services.state_manager.redis_client", redis):
+        sm = StateManager(user_id=42)
+        checks = await sm.batch().is_blocked().can_create_feedback().get_nav_stack().execute()
+
+    pipe.exists.assert_any_call(sm.blocked_key)
+    pipe.exists.assert_any_call(sm.lock_key)
+    pipe.lrange.assert_called_once_with(sm.nav_stack_key, 0, -1)
+    pipe.execute.assert_awaited_once()
+    assert checks == {
+        "is_blocked": True,
+        "can_create_feedback": True,
+        "nav_stack": [{"screen": "main", "params": {}}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_clear_feedback_state_is_one_round_trip():
+    redis, pipe = make_redis([1, 1, 1])
+    with patch("src.services.state_manager.redis_client", redis):
+        sm = StateManager(user_id=42)
+        await sm.clear_feedback_state()
+
+    pipe.hdel.assert_called_once_with(sm.state_key, "prompt_message_id", "type", "is_named")
+    pipe.delete.assert_any_call(sm.feedback_type_key)
+    pipe.delete.assert_any_call(sm.lock_key)
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_batch_for_other_user_shares_pipeline():
+    redis, pipe = make_redis([1, 1])
+    with patch("src.services.state_manager.redis_client", redis):
+        admin = StateManager(user_id=1)
+        async with admin.batch() as batch:
+            batch.user(2).unlock_user()
+            batch.delete_state_fields("admin_replying_to")
+
+    pipe.delete.assert_any_call(StateManager(2).lock_key)
+    pipe.delete.assert_any_call(admin.admin_replying_key)
+    redis.pipeline.assert_called_once()
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_batch_is_discarded_on_error():
+    redis, pipe = make_redis([])
+    with patch("src.services.state_manager.redis_client", redis):
+        sm = StateManager(user_id=42)
+        with pytest.raises(RuntimeError):
+            async with sm.batch() as batch:
+                batch.lock_user()
+                raise RuntimeError("boom")
+
+    pipe.execute.assert_not_awaited()
+    pipe.reset.assert_awaited_once()
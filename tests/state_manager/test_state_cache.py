@@ -0,0 +1,66 @@
+import pytest
+from unittest.mock import patch
+from src.middlewares.state_cache import StateCacheMiddleware
+from src.services.state_backend import MemoryBackend
+from src.services.state_manager import StateManager, state_cache
+
+
+class CountingRedis(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.hgetall_calls = 0
+
+    def _cmd_hgetall(self, key):
+        self.hgetall_calls += 1
+        return super()._cmd_hgetall(key)
+
+
+@pytest.mark.asyncio
+async def test_reads_come_from_one_snapshot_and_writes_are_flushed_once():
+    redis = CountingRedis()
+    await redis.hset("user_state:{1}", mapping={"menu_message_id": "10"})
+
+    with patch("src.services.state_manager.redis_client", redis):
+        sm = StateManager(user_id=1)
+        async with state_cache():
+            assert (await sm.get_state())["menu_message_id"] == "10"
+            await sm.save_state(prompt_message_id=11)
+            assert await sm.get_state_field("prompt_message_id") == "11"
+            assert (await StateManager(user_id=1).get_state())["prompt_message_id"] == "11"
+            assert await redis.hget("user_state:{1}", "prompt_message_id") is None
+
+        assert redis.hgetall_calls == 1
+        assert await redis.hgetall("user_state:{1}") == {"menu_message_id": "10", "prompt_message_id": "11"}
+
+
+@pytest.mark.asyncio
+async def test_clear_and_delete_inside_cache_are_applied_in_order():
+    redis = CountingRedis()
+    await redis.hset("user_state:{1}", mapping={"type": "Другое", "is_named": "true"})
+
+    with patch("src.services.state_manager.redis_client", redis):
+        sm = StateManager(user_id=1)
+        async with state_cache():
+            await sm.save_state(stale=1)
+            await sm.clear_state()
+            await sm.save_state(menu_message_id=5, type="Другое")
+            await sm.delete_state_field("type")
+            assert await sm.get_state() == {"menu_message_id": "5"}
+
+        assert redis.hgetall_calls == 0
+        assert await redis.hgetall("user_state:{1}") == {"menu_message_id": "5"}
+
+
+@pytest.mark.asyncio
+async def test_middleware_flushes_after_handler():
+    redis = CountingRedis()
+
+    async def handler(event, data):
+        await StateManager(user_id=7).save_state(menu_message_id=1)
+        assert not await redis.exists("user_state:{7}")
+        return "done"
+
+    with patch("src.services.state_manager.redis_client", redis):
+        assert await StateCacheMiddleware()(handler, object(), {}) == "done"
+
+    assert await redis.hgetall("user_state:{7}") == {"menu_message_id": "1"}
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.services import redis_scripts
+from src.services.state_layout import FEEDBACK_LOCK_FIELD, FEEDBACK_TYPE_FIELD, UserHashLayout
+from src.services.state_manager import USER_STATE_KEY, StateManager
+from src.utils import config
+
+
+def make_redis(results):
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=results)
+    redis = MagicMock()
+    redis.pipeline.return_value = pipe
+    return redis, pipe
+
+
+@pytest.mark.asyncio
+async def test_emulated_field_ttl_goes_through_scripts():
+    # Время истечения пишут и сверяют скрипты — по часам сервера, а не бота
+    redis, pipe = make_redis([1, None])
+    with patch("src.services.state_manager.redis_client", redis), \
+            patch("src.services.state_manager.layout", UserHashLayout("emulated")):
+        sm = StateManager(user_id=42)
+        checks = await sm.batch().lock_user(expire=120).can_create_feedback().execute()
+
+    assert [c.args for c in pipe.execute_command.call_args_list] == [
+        ("EVALSHA", redis_scripts.hash_set.sha, 1, "user:{42}", FEEDBACK_LOCK_FIELD, "1", 120, config.USER_STATE_TTL, "0"),
+        ("EVALSHA", redis_scripts.hash_get.sha, 1, "user:{42}", FEEDBACK_LOCK_FIELD, "0"),
+    ]
+    pipe.hset.assert_not_called()
+    assert checks == {"can_create_feedback": True}
+
+
+@pytest.mark.asyncio
+async def test_block_stays_a_separate_key():
+    # У хэша user:{id} TTL простоя — бессрочная блокировка не должна пропасть вместе с ним
+    redis, pipe = make_redis([True, 1])
+    with patch("src.services.state_manager.redis_client", redis), \
+            patch("src.services.state_manager.layout", UserHashLayout("native")):
+        sm = StateManager(user_id=42)
+        checks = await sm.batch().block_user().is_blocked().execute()
+
+    pipe.set.assert_called_once_with("blocked:{42}", "1")
+    pipe.exists.assert_called_once_with("blocked:{42}")
+    pipe.expire.assert_not_called()
+    assert checks == {"is_blocked": True}
+
+
+@pytest.mark.asyncio
+async def test_native_field_ttl_uses_hexpire():
+    redis, pipe = make_redis(None)
+    pipe.execute.side_effect = [[1, 1, 1], ["Другое"]]
+    with patch("src.services.state_manager.redis_client", redis), \
+            patch("src.services.state_manager.layout", UserHashLayout("native")):
+        sm = StateManager(user_id=42)
+        await sm.set_feedback_type("Другое", expire=300)
+        assert await sm.get_feedback_type() == "Другое"
+
+    pipe.hset.assert_called_once_with("user:{42}", FEEDBACK_TYPE_FIELD, "Другое")
+    pipe.hexpire.assert_called_once_with("user:{42}", 300, FEEDBACK_TYPE_FIELD)
+    pipe.hget.assert_called_once_with("user:{42}", FEEDBACK_TYPE_FIELD)
+
+
+@pytest.mark.asyncio
+@patch("src.services.state_manager.redis_client", new_callable=AsyncMock)
+async def test_get_state_hides_service_fields(mock_redis):
+    mock_redis.hgetall.return_value = {
+        "menu_message_id": "5", FEEDBACK_LOCK_FIELD: "1", "~nav": "[]", "is_named": "true"
+    }
+    with patch("src.services.state_manager.layout", UserHashLayout("native")):
+        sm = StateManager(user_id=42)
+        assert await sm.get_state() == {"menu_message_id": "5", "is_named": True}
+
+    mock_redis.hgetall.assert_awaited_once_with("user:{42}")
+
+
+def test_all_user_keys_share_one_cluster_slot():
+    from redis.crc import key_slot
+
+    sm = StateManager(user_id=42)
+    keys = [
+        sm.user_key, sm.state_key, sm.feedback_type_key, sm.blocked_key, sm.lock_key,
+        sm.admin_replying_key, sm.nav_stack_key, USER_STATE_KEY.format(user_id=42),
+    ]
+    assert {key_slot(key.encode()) for key in keys} == {key_slot(b"42")}
@@ -0,0 +1,45 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.middlewares.state_cache import StateCacheMiddleware
+from src.services.redis_sweeper import RedisSweeper
+from src.services.state_backend import MemoryBackend
+from src.services.state_manager import StateManager
+from src.utils import config
+
+
+@pytest.mark.asyncio
+async def test_update_refreshes_state_and_nav_ttl():
+    redis = MemoryBackend()
+    await redis.hset("user_state:{5}", mapping={"menu_message_id": "1"})
+    await redis.hset("nav_stack:{5}", mapping={"legacy": "1"})
+
+    async def handler(event, data):
+        await StateManager(user_id=5).save_state(last_image="menu")
+
+    with patch("src.services.state_manager.redis_client", redis):
+        await StateCacheMiddleware()(handler, object(), {"event_from_user": SimpleNamespace(id=5)})
+
+    assert await redis.ttl("user_state:{5}") == config.USER_STATE_TTL
+    assert await redis.ttl("nav_stack:{5}") == config.NAV_STACK_TTL
+    assert await redis.hget("user_state:{5}", "last_image") == "menu"
+
+
+@pytest.mark.asyncio
+async def test_sweeper_reports_families_and_expires_orphans():
+    redis = MemoryBackend()
+    for user_id in range(3):
+        await redis.hset(f"user_state:{{{user_id}}}", mapping={"menu_message_id": "1"})
+    await redis.expire("user_state:{0}", 60)
+    await redis.hset("sheet_row_index", mapping={"1": "Лист1!2"})
+
+    with patch("src.services.redis_sweeper.redis_client", redis):
+        report = await RedisSweeper(batch=2, samples=1).sweep()
+
+    assert report.scanned == 4
+    user_state = report.families["user_state"]
+    assert (user_state.keys, user_state.sampled, user_state.no_ttl, user_state.expired) == (3, 1, 2, 2)
+    assert user_state.estimated_bytes == 3 * user_state.sampled_bytes
+    assert await redis.ttl("user_state:{1}") == config.USER_STATE_TTL
+    assert report.families["sheets"].no_ttl == 0
+    assert await redis.ttl("sheet_row_index") == -1
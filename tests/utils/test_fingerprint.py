@@ -0,0 +1,22 @@
+from src.keyboards.main_menu import get_main_keyboard
+from src.utils.fingerprint import fingerprint, keyboard_fingerprint, screen_fingerprint
+
+
+def test_fingerprint_is_short_and_stable():
+    assert fingerprint("Привет") == fingerprint("Привет")
+    assert fingerprint("Привет") != fingerprint("Привет!")
+    assert len(fingerprint("x" * 4000)) == 16
+    assert fingerprint("") == ""
+
+
+def test_keyboard_fingerprint_follows_buttons():
+    assert keyboard_fingerprint(get_main_keyboard()) == keyboard_fingerprint(get_main_keyboard())
+    assert keyboard_fingerprint(get_main_keyboard()) != keyboard_fingerprint(get_main_keyboard("Другое"))
+    assert keyboard_fingerprint(None) == ""
+
+
+def test_screen_fingerprint_keeps_image_path():
+    screen = screen_fingerprint("текст", "assets/images/start.png", get_main_keyboard())
+    assert screen["last_image"] == "assets/images/start.png"
+    assert screen["last_text"] == fingerprint("текст")
+    assert screen["last_keyboard"] == keyboard_fingerprint(get_main_keyboard())
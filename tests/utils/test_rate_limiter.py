@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from src.utils.rate_limiter import TokenBucket, RateLimitExceeded
+
+
+@pytest.mark.asyncio
+async def test_burst_is_served_without_waiting():
+    bucket = TokenBucket(rate_per_minute=60, capacity=3)
+    waits = [await bucket.acquire() for _ in range(3)]
+    assert waits == [0.0, 0.0, 0.0]
+    assert bucket.stats.acquired == 3
+    assert bucket.stats.waited == 0
+
+
+@pytest.mark.asyncio
+async def test_request_over_limit_waits_instead_of_failing():
+    bucket = TokenBucket(rate_per_minute=600, capacity=1)  # 10 токенов в секунду
+    await bucket.acquire()
+    wait = await bucket.acquire()
+    assert 0 < wait <= 0.15
+    assert bucket.stats.waited == 1
+    assert bucket.stats.max_wait == pytest.approx(wait)
+
+
+@pytest.mark.asyncio
+async def test_request_is_rejected_when_wait_exceeds_max_wait():
+    bucket = TokenBucket(rate_per_minute=1, capacity=1, max_wait=1)
+    await bucket.acquire()
+    with pytest.raises(RateLimitExceeded):
+        await bucket.acquire()
+    assert bucket.stats.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_queued_callers_count_the_queue_against_max_wait():
+    bucket = TokenBucket(rate_per_minute=600, capacity=1, max_wait=0.3)  # 10 токенов в секунду
+    results = await asyncio.gather(*(bucket.acquire() for _ in range(20)), return_exceptions=True)
+
+    waits = [r for r in results if not isinstance(r, Exception)]
+    # Без ожидания — 1 токен, дальше по 0.1 с на место в очереди: глубже 0.3 с не ждёт никто
+    assert 3 <= len(waits) <= 4
+    assert bucket.stats.rejected == 20 - len(waits)
+    assert all(isinstance(r, RateLimitExceeded) for r in results[len(waits):])
+    assert max(waits) <= 0.3 + 0.05
+    assert bucket.stats.max_wait == pytest.approx(max(waits))
+    assert bucket.stats.max_wait >= 0.15